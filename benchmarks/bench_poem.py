@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+"""Latency benchmarks for the poem shim and CLI.
+
+Every scenario runs against a throwaway HOME populated with fake Poetry
+venvs whose bin/poetry is a tiny shell script, and against a local HTTP
+stand-in for the package index, so results do not depend on the network
+or on what is installed on the machine.
+
+Cold runs import poem from sources with no compiled bytecode; warm runs
+reuse bytecode written by a priming run. Results are written to
+benchmarks/results/<poem version>.json and compared against the most
+recent previous result file.
+
+Usage:
+    python benchmarks/bench_poem.py [--repeat N] [--quick] [--compare FILE]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+sys.path.insert(0, SRC_DIR)
+
+from poem import __version__  # noqa: E402
+from poem.settings import reset_settings  # noqa: E402
+
+INSTALLED_COUNTS = (1, 10, 100)
+# A regression is reported when a median grows by more than this fraction
+REGRESSION_THRESHOLD = 0.10
+# Settings that would point poem away from the fake homes
+RELOCATING_VARIABLES = ("POEM_HOME", "POEM_CONFIG_DIR", "POEM_CACHE_DIR",
+                        "POEM_STORE", "XDG_CONFIG_HOME", "XDG_CACHE_HOME")
+
+
+def _make_fake_home(root: str, versions: int) -> str:
+    """Create a HOME with fake poetry venvs and a global version pin."""
+    home = os.path.join(root, f"home-{versions}")
+    for index in range(versions):
+        version = f"1.{index}.0"
+        bin_dir = os.path.join(home, ".poetry", "venv", version, "bin")
+        os.makedirs(bin_dir, exist_ok=True)
+        poetry = os.path.join(bin_dir, "poetry")
+        with open(poetry, "w") as f:
+            f.write(f"#!/bin/sh\necho 'Poetry (version {version})'\n")
+        os.chmod(poetry, 0o755)
+
+    config_dir = os.path.join(home, ".config", "poem")
+    os.makedirs(config_dir, exist_ok=True)
+    with open(os.path.join(config_dir, "global-version"), "w") as f:
+        f.write("1.0.0")
+    return home
+
+
+class _IndexHandler(BaseHTTPRequestHandler):
+    """Serve a PEP 691 project page with a few hundred poetry releases."""
+
+    body = json.dumps({
+        "meta": {"api-version": "1.1"},
+        "name": "poetry",
+        "files": [{"filename": f"poetry-1.{minor}.{patch}-py3-none-any.whl"}
+                  for minor in range(30) for patch in range(10)],
+    }).encode("utf-8")
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.pypi.simple.v1+json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextlib.contextmanager
+def _index_server():
+    """Run the local index stand-in for the duration of the block."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _IndexHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/simple"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextlib.contextmanager
+def _patched_environ(**values: str):
+    """Temporarily set environment variables for in-process scenarios.
+
+    poem reads its settings once per process, so they are reloaded on the
+    way in and out.
+    """
+    saved = {key: os.environ.get(key) for key in values}
+    os.environ.update(values)
+    reset_settings()
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        reset_settings()
+
+
+def _summarize(samples: List[float]) -> Dict[str, float]:
+    """Reduce timing samples (seconds) to milliseconds statistics."""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "runs": len(ordered),
+        "min_ms": ordered[0] * 1000,
+        "median_ms": statistics.median(ordered) * 1000,
+        "p95_ms": p95 * 1000,
+    }
+
+
+def _time_call(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Time an in-process call, discarding its stdout."""
+    samples = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+    return _summarize(samples)
+
+
+def _copy_sources(destination: str) -> str:
+    """Copy the poem sources without bytecode, returning the new src dir."""
+    src_copy = os.path.join(destination, "src")
+    shutil.copytree(SRC_DIR, src_copy,
+                    ignore=shutil.ignore_patterns("__pycache__", "*.pyc"))
+    return src_copy
+
+
+def _time_process(command: List[str], env: Dict[str, str], cwd: str,
+                  repeat: int, cold: bool, scratch: str) -> Dict[str, float]:
+    """Time a subprocess end to end with cold or primed poem bytecode.
+
+    Cold runs import poem from a fresh copy of the sources with no
+    __pycache__, as on a freshly provisioned machine. The standard library
+    keeps its installed bytecode in both cases.
+    """
+    samples = []
+    env = dict(env)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    warm_src = _copy_sources(tempfile.mkdtemp(dir=scratch))
+    if not cold:
+        subprocess.run(command, env=dict(env, PYTHONPATH=warm_src),
+                       cwd=cwd, capture_output=True)
+
+    for _ in range(repeat):
+        src = _copy_sources(tempfile.mkdtemp(dir=scratch)) if cold else warm_src
+        start = time.perf_counter()
+        subprocess.run(command, env=dict(env, PYTHONPATH=src),
+                       cwd=cwd, capture_output=True)
+        samples.append(time.perf_counter() - start)
+    return _summarize(samples)
+
+
+def run_benchmarks(repeat: int) -> Dict[str, Dict[str, float]]:
+    """Run every scenario and return statistics keyed by scenario name."""
+    from poem import cli, core
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name in RELOCATING_VARIABLES:
+        os.environ.pop(name, None)
+    with tempfile.TemporaryDirectory(prefix="poem-bench-") as scratch:
+        homes = {count: _make_fake_home(scratch, count)
+                 for count in INSTALLED_COUNTS}
+        home = homes[INSTALLED_COUNTS[0]]
+        env = dict(os.environ, HOME=home, PYTHONPATH=SRC_DIR)
+        env.pop("POEM_INDEX_URL", None)
+
+        largest_home = homes[INSTALLED_COUNTS[-1]]
+        processes = {
+            "shim": ([sys.executable, "-m", "poem.shim", "--version"], home),
+            "current": ([sys.executable, "-m", "poem.cli", "current"], home),
+            "which": ([sys.executable, "-m", "poem.cli", "which"], home),
+            f"list-{INSTALLED_COUNTS[-1]}": (
+                [sys.executable, "-m", "poem.cli", "list"], largest_home),
+        }
+        for name, (command, process_home) in processes.items():
+            for cold in (True, False):
+                label = f"{name}.{'cold' if cold else 'warm'}"
+                results[label] = _time_process(
+                    command, dict(env, HOME=process_home), scratch, repeat,
+                    cold, scratch)
+                print(f"{label:32} {results[label]['median_ms']:8.2f} ms")
+
+        # The shim as installed by `poem init`: an isolated, precompiled bundle
+        from poem.directories import install_shims
+        with _patched_environ(HOME=home):
+            install_shims()
+        shim = os.path.join(home, ".poem", "shims", "poetry")
+        label = "shim-bundle.warm"
+        results[label] = _time_process(
+            [shim, "--version"], env, scratch, repeat, False, scratch)
+        print(f"{label:32} {results[label]['median_ms']:8.2f} ms")
+
+        # A nested call from inside `poetry run`, which reuses the parent's
+        # resolution from the environment
+        from poem.shim import _resolution_key
+        previous_cwd = os.getcwd()
+        os.chdir(scratch)
+        try:
+            with _patched_environ(HOME=home, PWD=scratch):
+                nested_env = dict(env, PWD=scratch, POEM_RESOLVED_VERSION="1.0.0",
+                                  POEM_RESOLVED_BIN=core.get_poetry_bin("1.0.0"),
+                                  POEM_RESOLVED_KEY=_resolution_key())
+        finally:
+            os.chdir(previous_cwd)
+        label = "shim-bundle.nested"
+        results[label] = _time_process(
+            [shim, "--version"], nested_env, scratch, repeat, False, scratch)
+        print(f"{label:32} {results[label]['median_ms']:8.2f} ms")
+
+        for count, count_home in homes.items():
+            with _patched_environ(HOME=count_home):
+                label = f"list.installed-{count}"
+                results[label] = _time_call(
+                    lambda: cli.main(["list"]), repeat)
+                print(f"{label:32} {results[label]['median_ms']:8.2f} ms")
+
+        # Resolution only reads .poetry-version in the working directory
+        project_dir = os.path.join(scratch, "project")
+        os.makedirs(project_dir, exist_ok=True)
+        with open(os.path.join(project_dir, ".poetry-version"), "w") as f:
+            f.write("1.0.0")
+        previous_cwd = os.getcwd()
+        os.chdir(project_dir)
+        try:
+            with _patched_environ(HOME=home):
+                label = "resolve.local-pin"
+                results[label] = _time_call(core._get_active_version, repeat)
+            print(f"{label:32} {results[label]['median_ms']:8.2f} ms")
+        finally:
+            os.chdir(previous_cwd)
+
+        cache_dir = os.path.join(scratch, "cache")
+        with _index_server() as index_url, \
+                _patched_environ(HOME=home, POEM_INDEX_URL=index_url,
+                                 POEM_CACHE_DIR=cache_dir):
+
+            def fetch_cold():
+                for root, dirs, files in os.walk(cache_dir, topdown=False):
+                    for name in files:
+                        os.unlink(os.path.join(root, name))
+                core.fetch_pypi_versions()
+
+            results["remote.cold"] = _time_call(fetch_cold, repeat)
+            results["remote.warm"] = _time_call(core.fetch_pypi_versions, repeat)
+            for label in ("remote.cold", "remote.warm"):
+                print(f"{label:32} {results[label]['median_ms']:8.2f} ms")
+
+    return results
+
+
+def _latest_result(exclude: str) -> Optional[str]:
+    """Find the most recently written result file other than exclude."""
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    candidates = [os.path.join(RESULTS_DIR, name) for name in os.listdir(RESULTS_DIR)
+                  if name.endswith(".json")]
+    candidates = [path for path in candidates
+                  if os.path.abspath(path) != os.path.abspath(exclude)]
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline_file: str) -> int:
+    """Print median changes against a baseline file.
+
+    Returns:
+        The number of scenarios that regressed beyond the threshold.
+    """
+    with open(baseline_file, "r") as f:
+        baseline = json.load(f)["results"]
+
+    print(f"\nCompared with {os.path.relpath(baseline_file, ROOT_DIR)}:")
+    regressions = 0
+    for label, stats in current.items():
+        if label not in baseline:
+            continue
+        before = baseline[label]["median_ms"]
+        after = stats["median_ms"]
+        change = (after - before) / before if before else 0.0
+        marker = ""
+        if change > REGRESSION_THRESHOLD:
+            marker = "  REGRESSION"
+            regressions += 1
+        print(f"{label:32} {before:8.2f} -> {after:8.2f} ms ({change:+.0%}){marker}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks, save the results and compare with a baseline.
+
+    Returns:
+        1 if any scenario regressed against the baseline, otherwise 0.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="Runs per scenario")
+    parser.add_argument("--quick", action="store_true",
+                        help="Run each scenario 3 times")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, f"{__version__}.json"),
+                        help="Where to write the results")
+    parser.add_argument("--compare", help="Result file to compare against "
+                        "(default: the most recent other file in benchmarks/results)")
+    args = parser.parse_args(argv)
+
+    repeat = 3 if args.quick else args.repeat
+    results = run_benchmarks(repeat)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({
+            "poem_version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "results": results,
+        }, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    baseline_file = args.compare or _latest_result(args.output)
+    if baseline_file and compare(results, baseline_file):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+"""Concurrency stress test for the poem shim and state-changing commands.
+
+Runs many `poetry` invocations through the installed shim while other
+threads keep installing and uninstalling versions and switching the global
+version, all against a throwaway HOME. Installs go through poem's real
+install path (install marker, per-version lock, manifest) with a fake
+installer that builds the venv slowly; uninstall and global run the CLI.
+
+Each fake bin/poetry checks the version it belongs to before answering, so
+the harness can tell whether the shim ever ran a version that was half
+installed or half removed. Projects without a .poetry-version must always
+resolve the global version, so a torn global-version read shows up as a
+failed run. Throughput and shim latency percentiles are reported; the exit
+status is 1 if any run was incorrect.
+
+Usage:
+    python benchmarks/stress_poem.py [--shims N] [--duration S] [--churn K]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+sys.path.insert(0, SRC_DIR)
+
+# Always installed; the global version is switched among these
+STABLE_VERSIONS = ("1.0.0", "1.1.0", "1.2.0")
+# Modules in each fake venv; a version is complete only with all of them
+PAYLOAD_FILES = 50
+# Exit codes of the fake poetry when its version is not intact
+EXIT_VANISHED = 96
+EXIT_TORN = 97
+EXIT_HALF_INSTALLED = 98
+# Settings that would point poem away from the fake home
+RELOCATING_VARIABLES = ("POEM_HOME", "POEM_CONFIG_DIR", "POEM_CACHE_DIR",
+                        "POEM_STORE", "XDG_CONFIG_HOME", "XDG_CACHE_HOME",
+                        "POEM_RESOLVED_VERSION", "POEM_RESOLVED_BIN", "POEM_RESOLVED_KEY",
+                        "POEM_AUTO_INSTALL", "POEM_LOCK_RESOLUTION")
+
+# Written into each version by the fake installer, or directly for stable
+# versions; {version_dir} is the directory the version was installed in
+FAKE_POETRY = """#!/bin/sh
+d="{version_dir}"
+set -- "$d"/venv/lib/*.py
+if [ "$#" -ne {payload} ] || [ ! -e "$1" ]; then
+  if [ -d "$d/venv" ]; then echo "torn {version}"; exit {torn}; fi
+  echo "vanished {version}"; exit {vanished}
+fi
+if [ -e "$d/.poem-installing" ]; then echo "half-installed {version}"; exit {half}; fi
+echo "Poetry (version {version})"
+"""
+
+# Stands in for install.python-poetry.org: builds the venv one file at a
+# time, then writes bin/poetry, printing the installer's progress lines
+FAKE_INSTALLER = """import os, sys, time
+home, version = os.environ["POETRY_HOME"], os.environ["POETRY_VERSION"]
+print(f"Installing Poetry ({{version}}): Creating environment", flush=True)
+lib = os.path.join(home, "venv", "lib")
+os.makedirs(lib, exist_ok=True)
+os.makedirs(os.path.join(home, "venv", "bin"), exist_ok=True)
+print(f"Installing Poetry ({{version}}): Installing Poetry", flush=True)
+for index in range({payload}):
+    with open(os.path.join(lib, f"module{{index:03}}.py"), "w") as f:
+        f.write("VALUE = 1\\n")
+    time.sleep(0.002)
+print(f"Installing Poetry ({{version}}): Creating script", flush=True)
+script = os.path.join(home, "venv", "bin", "poetry")
+with open(script, "w") as f:
+    f.write({template!r}.format(version_dir=home, version=version))
+os.chmod(script, 0o755)
+os.makedirs(os.path.join(home, "bin"), exist_ok=True)
+os.symlink(script, os.path.join(home, "bin", "poetry"))
+print(f"Installing Poetry ({{version}}): Done", flush=True)
+"""
+
+
+def _fake_poetry(version_dir: str, version: str) -> str:
+    """Render the fake poetry script of a version."""
+    return FAKE_POETRY.format(version_dir=version_dir, version=version,
+                              payload=PAYLOAD_FILES, torn=EXIT_TORN,
+                              vanished=EXIT_VANISHED, half=EXIT_HALF_INSTALLED)
+
+
+def _make_version(home: str, version: str) -> None:
+    """Lay out a complete fake version, as the fake installer would."""
+    version_dir = os.path.join(home, ".poetry", "venv", version)
+    lib = os.path.join(version_dir, "venv", "lib")
+    os.makedirs(lib)
+    for index in range(PAYLOAD_FILES):
+        with open(os.path.join(lib, f"module{index:03}.py"), "w") as f:
+            f.write("VALUE = 1\n")
+    bin_dir = os.path.join(version_dir, "bin")
+    os.makedirs(bin_dir)
+    poetry = os.path.join(bin_dir, "poetry")
+    with open(poetry, "w") as f:
+        f.write(_fake_poetry(version_dir, version))
+    os.chmod(poetry, 0o755)
+
+
+def _make_home(root: str, churn: List[str]) -> Dict[str, str]:
+    """Create the fake HOME, the fake installer and one project per pin.
+
+    Returns:
+        A mapping of each project directory to the version pinned in it,
+        or "" for the project that follows the global version.
+    """
+    home = os.path.join(root, "home")
+    for version in STABLE_VERSIONS:
+        _make_version(home, version)
+    config_dir = os.path.join(home, ".config", "poem")
+    os.makedirs(config_dir)
+    with open(os.path.join(config_dir, "global-version"), "w") as f:
+        f.write(STABLE_VERSIONS[0])
+
+    with open(os.path.join(root, "installer.py"), "w") as f:
+        f.write(FAKE_INSTALLER.format(payload=PAYLOAD_FILES,
+                                      template=_fake_poetry("{version_dir}", "{version}")))
+
+    projects = {}
+    for pin in ("",) + STABLE_VERSIONS[-1:] + tuple(churn):
+        project = os.path.join(root, "projects", pin or "global")
+        os.makedirs(project)
+        if pin:
+            with open(os.path.join(project, ".poetry-version"), "w") as f:
+                f.write(pin)
+        projects[project] = pin
+    return projects
+
+
+def _install_worker(version: str, installer: str) -> int:
+    """Install a version through poem's install path with the fake installer.
+
+    Runs in a child process started by the harness.
+    """
+    from poem import core
+
+    core._download_installer = lambda: installer
+    core._incompatible_versions = lambda versions: {}
+    core._ensure_installed(version)
+    return 0
+
+
+class Stats:
+    """Counters shared by the harness threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.outcomes: Dict[str, int] = {}
+        self.mutations: Dict[str, int] = {}
+        self.violations: List[str] = []
+
+    def record(self, outcome: str, latency: float, violation: Optional[str] = None) -> None:
+        with self.lock:
+            self.latencies.append(latency)
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if violation:
+                self.violations.append(violation)
+
+    def mutated(self, kind: str, violation: Optional[str] = None) -> None:
+        with self.lock:
+            self.mutations[kind] = self.mutations.get(kind, 0) + 1
+            if violation:
+                self.violations.append(violation)
+
+
+def _classify(pin: str, returncode: int, output: str) -> Tuple[str, Optional[str]]:
+    """Judge one shim run in a project pinned to pin ("" for global).
+
+    Returns:
+        The outcome and, if the run was incorrect, a description.
+    """
+    if returncode == 0:
+        version = output.strip().rsplit(" ", 1)[-1].rstrip(")")
+        expected = (pin,) if pin else STABLE_VERSIONS
+        if version in expected:
+            return "ok", None
+        return "wrong-version", f"{pin or 'global'}: ran poetry {version}"
+    if returncode == EXIT_TORN:
+        return "torn", f"{pin}: ran a half-removed version"
+    if returncode == EXIT_HALF_INSTALLED:
+        return "half-installed", f"{pin}: ran a half-installed version"
+    if pin in STABLE_VERSIONS or not pin:
+        # Always installed, so any failure means a torn read or a bug
+        return "failed", f"{pin or 'global'}: exit {returncode}: {output.strip()[:200]}"
+    # A churned version may be missing, or vanish between resolution and exec
+    return "not-installed", None
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))]
+
+
+def run_stress(shims: int, duration: float, churn: int, seed: int = 0) -> Dict:
+    """Run the stress test and return its report."""
+    random.seed(seed)
+    churn_versions = [f"2.{index}.0" for index in range(churn)]
+    with tempfile.TemporaryDirectory(prefix="poem-stress-") as scratch:
+        projects = _make_home(scratch, churn_versions)
+        home = os.path.join(scratch, "home")
+        installer = os.path.join(scratch, "installer.py")
+        env = dict(os.environ, HOME=home, PYTHONPATH=SRC_DIR)
+        for name in RELOCATING_VARIABLES:
+            env.pop(name, None)
+        env["POEM_CACHE_DIR"] = os.path.join(scratch, "cache")
+
+        # The shim as installed by `poem init`
+        subprocess.run([sys.executable, "-m", "poem.cli", "init"], env=env,
+                       check=True, capture_output=True)
+        shim = os.path.join(home, ".poem", "shims", "poetry")
+
+        stats = Stats()
+        deadline = time.monotonic() + duration
+        neutral = os.path.join(scratch, "projects", "global")
+
+        def call_shims() -> None:
+            project_list = sorted(projects)
+            while time.monotonic() < deadline:
+                project = random.choice(project_list)
+                started = time.perf_counter()
+                result = subprocess.run([shim, "--version"], cwd=project,
+                                        env=dict(env, PWD=project),
+                                        capture_output=True, text=True)
+                latency = time.perf_counter() - started
+                outcome, violation = _classify(projects[project], result.returncode,
+                                               result.stdout + result.stderr)
+                stats.record(outcome, latency, violation)
+
+        def poem(*args: str) -> subprocess.CompletedProcess:
+            return subprocess.run([sys.executable, "-m", "poem.cli", *args], cwd=neutral,
+                                  env=dict(env, PWD=neutral), capture_output=True, text=True)
+
+        def churn_version(version: str) -> None:
+            while time.monotonic() < deadline:
+                result = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--install-worker", version,
+                     "--installer", installer],
+                    cwd=neutral, env=env, capture_output=True, text=True)
+                stats.mutated("install", None if result.returncode == 0 else
+                              f"install {version} failed: {result.stderr.strip()[-200:]}")
+                time.sleep(random.uniform(0, 0.05))
+                result = poem("uninstall", version)
+                stats.mutated("uninstall", None if result.returncode == 0 else
+                              f"uninstall {version} failed: {result.stderr.strip()[-200:]}")
+                time.sleep(random.uniform(0, 0.05))
+
+        def switch_global() -> None:
+            while time.monotonic() < deadline:
+                result = poem("global", random.choice(STABLE_VERSIONS))
+                stats.mutated("global", None if result.returncode == 0 else
+                              f"global failed: {result.stderr.strip()[-200:]}")
+
+        threads = [threading.Thread(target=call_shims) for _ in range(shims)]
+        threads += [threading.Thread(target=churn_version, args=(version,))
+                    for version in churn_versions]
+        threads.append(threading.Thread(target=switch_global))
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+    ordered = sorted(stats.latencies)
+    return {
+        "shims": shims,
+        "duration": round(elapsed, 3),
+        "runs": len(ordered),
+        "throughput": round(len(ordered) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {label: round(_percentile(ordered, q) * 1000, 2) if ordered else None
+                       for label, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99),
+                                        ("max", 1.0))},
+        "outcomes": dict(sorted(stats.outcomes.items())),
+        "mutations": dict(sorted(stats.mutations.items())),
+        "violations": stats.violations,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the stress test, print its report and fail on incorrect runs."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shims", type=int, default=16,
+                        help="Concurrent shim callers")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="Seconds to run")
+    parser.add_argument("--churn", type=int, default=2,
+                        help="Versions repeatedly installed and uninstalled")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    parser.add_argument("--install-worker", metavar="VERSION", help=argparse.SUPPRESS)
+    parser.add_argument("--installer", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.install_worker:
+        return _install_worker(args.install_worker, args.installer)
+
+    report = run_stress(args.shims, args.duration, args.churn, seed=args.seed)
+    latency = report["latency_ms"]
+    print(f"{report['runs']} shim runs in {report['duration']:.1f}s with "
+          f"{report['shims']} callers: {report['throughput']:.1f} runs/s")
+    print(f"shim latency p50 {latency['p50']} ms, p90 {latency['p90']} ms, "
+          f"p99 {latency['p99']} ms, max {latency['max']} ms")
+    print("outcomes: " + ", ".join(f"{name} {count}"
+                                   for name, count in report["outcomes"].items()))
+    print("mutations: " + ", ".join(f"{name} {count}"
+                                    for name, count in report["mutations"].items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if report["violations"]:
+        print(f"\n{len(report['violations'])} incorrect run(s):", file=sys.stderr)
+        for violation in report["violations"][:20]:
+            print(f"  {violation}", file=sys.stderr)
+        return 1
+    print("No incorrect runs.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
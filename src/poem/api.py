@@ -0,0 +1,642 @@
+"""Library interface to poem.
+
+The functions here never print or exit: they return plain data (lists,
+dicts and strings that serialize to JSON as they are) and report problems
+by raising PoemError subclasses, so long-running tools can embed poem
+instead of starting a process for every query. Every CLI command is a thin
+layer over these functions, rendering their result as text or, with
+--json, as it is:
+
+    from poem import api
+    api.resolve()["version"]
+"""
+
+import os
+import shutil
+from typing import Any, Callable, Dict, List, Optional
+
+from poem.core import (
+    check_endpoints,
+    fetch_pypi_versions,
+    get_config_dir,
+    get_global_version_file,
+    get_installed_locations,
+    get_pinned_version,
+    get_poetry_bin,
+    get_poetry_home,
+    get_store_dir,
+    get_system_version,
+    get_version_dir,
+    install_versions,
+    is_installed,
+    is_prerelease,
+    load_release_index,
+    lock_compatible,
+    query_releases,
+    read_lock_metadata,
+    read_manifest,
+    remove_version_dir,
+    version_key,
+    write_version_file,
+)
+from poem.bundle import export_bundle, import_bundle
+from poem.cache import cache_info as _cache_info, clear_cache, prune_cache
+from poem.directories import install_shims, refresh_shim_bundle
+from poem.errors import InstallError, PoemError, RemoteError, VersionNotInstalledError
+from poem.execute import run_versions, select_versions
+from poem.fetch import DEFAULT_CONCURRENCY
+from poem.hook import render_env, render_hook
+from poem.http import HTTPError
+from poem.mirror import DEFAULT_HOST, DEFAULT_PORT
+from poem.mirror import serve_mirror as _serve_mirror
+from poem.plugins import plugins_add as _plugins_add
+from poem.plugins import plugins_remove as _plugins_remove
+from poem.plugins import plugins_sync as _plugins_sync
+from poem.plugins import read_plugins
+from poem.stats import collect_stats
+from poem.store import store_install as _store_install
+from poem.store import store_list as _store_list
+from poem.store import store_uninstall as _store_uninstall
+from poem.sync import sync_versions
+from poem.upgrade import upgrade_version
+from poem.verify import verify_versions
+
+
+def resolve(cwd: Optional[str] = None) -> Dict[str, Any]:
+    """Resolve the Poetry version that applies in a directory.
+
+    A .poetry-version file wins over the global version; without either,
+    the poetry found on PATH is reported with source "default". With
+    POEM_LOCK_RESOLUTION set, a poetry.lock is consulted in between.
+
+    Args:
+        cwd: The directory to resolve in (default: the working directory)
+
+    Returns:
+        A dict with "version", "source" ("local", "lock", "global" or "default"),
+        "bin" (the poetry executable) and "installed".
+
+    Raises:
+        PoemError: If no version is pinned and poetry is not on PATH.
+    """
+    pinned = get_pinned_version(cwd)
+    if pinned:
+        version, source = pinned
+        poetry_bin = get_poetry_bin(version)
+        return {"version": version, "source": source, "bin": poetry_bin,
+                "installed": os.path.exists(poetry_bin)}
+
+    poetry_bin = shutil.which("poetry")
+    version = get_system_version() if poetry_bin else None
+    if version is None:
+        raise PoemError("No poetry version is pinned and poetry is not on PATH")
+    return {"version": version, "source": "default", "bin": poetry_bin,
+            "installed": True}
+
+
+def installed() -> List[Dict[str, Any]]:
+    """List the installed Poetry versions, oldest first.
+
+    Returns:
+        One dict per version with "version", "path", "shared" (True when it
+        lives in the shared store) and "manifest" (the install manifest).
+    """
+    store = get_store_dir()
+    return [
+        {
+            "version": version,
+            "path": path,
+            "shared": bool(store) and path.startswith(store + os.sep),
+            "manifest": read_manifest(version, os.path.dirname(os.path.dirname(path))),
+        }
+        for version, path in sorted(get_installed_locations().items(),
+                                    key=lambda item: version_key(item[0]))
+    ]
+
+
+def install(versions: List[str], jobs: int = DEFAULT_CONCURRENCY,
+            compile_bytecode: bool = True, force: bool = False,
+            home: Optional[str] = None) -> List[str]:
+    """Install Poetry versions concurrently.
+
+    Args:
+        versions: The versions to install
+        jobs: The maximum number of installs running at the same time
+        compile_bytecode: If True, precompile each new venv
+        force: If True, reinstall versions that are already installed
+        home: The home to install into (default: the user's poetry home)
+
+    Returns:
+        The versions that were installed; versions already present are
+        skipped unless force is set.
+
+    Raises:
+        InstallError: If any version fails to install.
+        RemoteError: If the installer cannot be downloaded.
+    """
+    installed_versions = install_versions(versions, jobs=jobs,
+                                          compile_bytecode=compile_bytecode,
+                                          force=force, home=home)
+    # The shims run a copy of poem, brought up to date by installs and upgrades
+    refresh_shim_bundle()
+    return installed_versions
+
+
+def uninstall(version: str, cwd: Optional[str] = None) -> str:
+    """Remove a Poetry version from the user's poetry home.
+
+    Args:
+        version: The version to remove
+        cwd: The directory whose pinned version is protected
+
+    Returns:
+        The directory that was removed.
+
+    Raises:
+        VersionNotInstalledError: If the version is not in the user's home.
+        PoemError: If the version is the one pinned for cwd, or removal fails.
+    """
+    pinned = get_pinned_version(cwd)
+    if pinned and pinned[0] == version:
+        raise PoemError(
+            f"Poetry {version} is the active ({pinned[1]}) version")
+
+    version_dir = get_version_dir(version, home=get_poetry_home())
+    if not os.path.exists(version_dir):
+        if os.path.exists(get_version_dir(version)):
+            raise VersionNotInstalledError(
+                version, f"Poetry {version} is installed in the shared store; "
+                         f"remove it with: poem store uninstall {version}")
+        raise VersionNotInstalledError(version)
+
+    try:
+        remove_version_dir(version_dir)
+    except OSError as e:
+        raise PoemError(f"Failed to uninstall poetry {version}: {str(e)}") from e
+    return version_dir
+
+
+def remote_versions(include_prereleases: bool = True) -> List[str]:
+    """Fetch the released Poetry versions from the package index.
+
+    Args:
+        include_prereleases: If False, leave out alphas, betas and rcs
+
+    Returns:
+        Version strings sorted from oldest to newest.
+
+    Raises:
+        RemoteError: If the index cannot be reached or parsed.
+    """
+    try:
+        versions = fetch_pypi_versions()
+    except (OSError, HTTPError, ValueError) as e:
+        raise RemoteError(f"Failed to fetch poetry releases: {str(e)}") from e
+    if not include_prereleases:
+        versions = [version for version in versions if not is_prerelease(version)]
+    return versions
+
+
+def releases(latest: bool = False, since: Optional[str] = None, stable: bool = False,
+             python: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Query the Poetry release index.
+
+    Args:
+        latest: If True, return only the newest matching release
+        since: A date (YYYY-MM-DD) or version; return only releases after it
+        stable: If True, leave out pre- and development releases
+        python: A Python version (e.g. "3.11") the releases must support
+
+    Returns:
+        Release records with "version", "requires_python", "prerelease"
+        and "uploaded", sorted from oldest to newest.
+
+    Raises:
+        RemoteError: If the index cannot be reached or parsed.
+        ValueError: If since is neither a date nor a version, or is a date
+            but the index publishes no upload times.
+    """
+    try:
+        index = load_release_index()
+    except (OSError, HTTPError, ValueError) as e:
+        raise RemoteError(f"Failed to fetch poetry releases: {str(e)}") from e
+    return query_releases(index, latest=latest, since=since, stable=stable, python=python)
+
+
+def set_global(version: str) -> str:
+    """Set the global default Poetry version.
+
+    Returns:
+        The global version file that was written.
+
+    Raises:
+        VersionNotInstalledError: If the version is not installed.
+    """
+    if not is_installed(version):
+        raise VersionNotInstalledError(version)
+    global_version_file = get_global_version_file()
+    write_version_file(global_version_file, version)
+    return global_version_file
+
+
+def use(version: str) -> Dict[str, Any]:
+    """Get what a shell needs to run an installed Poetry version directly.
+
+    Returns:
+        A dict with the "version", its poetry "bin" and the "path" directory
+        to put first on PATH.
+
+    Raises:
+        VersionNotInstalledError: If the version is not installed.
+    """
+    if not is_installed(version):
+        raise VersionNotInstalledError(version)
+    poetry_bin = get_poetry_bin(version)
+    return {"version": version, "bin": poetry_bin, "path": os.path.dirname(poetry_bin)}
+
+
+def set_local(version: str, cwd: Optional[str] = None) -> str:
+    """Pin a Poetry version for a project directory.
+
+    Returns:
+        The .poetry-version file that was written.
+    """
+    local_version_file = os.path.join(cwd or os.getcwd(), ".poetry-version")
+    write_version_file(local_version_file, version)
+    return local_version_file
+
+
+def diagnose(network: bool = True) -> Dict[str, Any]:
+    """Collect the facts `poem doctor` reports.
+
+    Args:
+        network: If True, probe the remote endpoints poem depends on
+
+    Returns:
+        A dict describing configuration, installed versions, the PATH
+        entries that look like Poetry installs, the active
+        version (None if there is none), the Poetry release that wrote the
+        poetry.lock in the working directory and whether the active version
+        is compatible with it (None without a lock file), and endpoint
+        reachability.
+    """
+    versions = {}
+    for source, version_file in (("global", get_global_version_file()),
+                                 ("local", ".poetry-version")):
+        versions[source] = None
+        if os.path.exists(version_file):
+            with open(version_file, "r") as f:
+                versions[source] = f.read().strip()
+
+    try:
+        active: Optional[Dict[str, Any]] = resolve()
+    except PoemError:
+        active = None
+
+    lock = read_lock_metadata("poetry.lock")
+    if lock:
+        lock["compatible"] = bool(active) and lock_compatible(active["version"], lock)
+
+    return {
+        "config_dir": get_config_dir(),
+        "global_version": versions["global"],
+        "local_version": versions["local"],
+        "poetry_home": get_poetry_home(),
+        "store": get_store_dir(),
+        "installed": installed(),
+        "poetry_path_dirs": [
+            path for path in os.environ.get("PATH", "").split(os.pathsep)
+            if "poetry" in path.lower() and os.path.exists(path)],
+        "active": active,
+        "lock": lock,
+        "network": [
+            {"name": name, "reachable": error is None,
+             "elapsed_ms": round(elapsed * 1000), "error": error}
+            for name, elapsed, error in (check_endpoints() if network else [])
+        ],
+    }
+
+
+def sync(path: str = ".", dry_run: bool = False,
+         jobs: int = DEFAULT_CONCURRENCY) -> Dict[str, Any]:
+    """Install every Poetry version pinned in a directory tree.
+
+    Args:
+        path: The root of the tree to scan
+        dry_run: If True, only work out what is missing
+        jobs: The maximum number of installs running at the same time
+
+    Returns:
+        A dict with the scanned "root", the "pinned" versions (each mapped
+        to the projects pinning it), the "missing" versions, those
+        "installed" by this call, and the "invalid" pins that are not
+        version numbers (each mapped to its projects), which are skipped.
+
+    Raises:
+        PoemError: If path is not a directory.
+        InstallError: If a missing version fails to install.
+    """
+    return sync_versions(path, dry_run=dry_run, jobs=jobs)
+
+
+def bundle_export(versions: List[str], output: str,
+                  jobs: int = DEFAULT_CONCURRENCY) -> Dict[str, Any]:
+    """Write installed Poetry versions into a bundle.
+
+    Args:
+        versions: The versions to export (default: every installed version)
+        output: The bundle file to write, or "-" for stdout
+        jobs: The maximum number of versions compressed at the same time
+
+    Returns:
+        A dict with the "exported" versions and the "output" written.
+
+    Raises:
+        VersionNotInstalledError: If a requested version is not installed.
+        PoemError: If the bundle cannot be written.
+    """
+    return {"exported": export_bundle(versions, output, jobs=jobs), "output": output}
+
+
+def bundle_import(source: str, force: bool = False,
+                  jobs: int = DEFAULT_CONCURRENCY) -> Dict[str, Any]:
+    """Install the Poetry versions from a bundle.
+
+    Args:
+        source: The bundle file to read, or "-" for stdin
+        force: If True, replace versions that are already installed
+        jobs: The maximum number of versions extracted at the same time
+
+    Returns:
+        A dict with the "imported" versions, those "skipped" as already
+        installed and "warnings" about versions that may not run here.
+
+    Raises:
+        PoemError: If the bundle cannot be read or installed.
+    """
+    return import_bundle(source, force=force, jobs=jobs)
+
+
+def store_install(versions: List[str], store: Optional[str] = None,
+                  jobs: int = DEFAULT_CONCURRENCY) -> Dict[str, Any]:
+    """Install Poetry versions into the shared store.
+
+    Returns:
+        A dict with the "store", the versions "installed" and those
+        "skipped" as already in the store.
+
+    Raises:
+        PoemError: If no store is configured.
+        InstallError: If a version fails to install.
+    """
+    return _store_install(versions, store=store, jobs=jobs)
+
+
+def store_uninstall(versions: List[str], store: Optional[str] = None) -> Dict[str, Any]:
+    """Remove Poetry versions from the shared store.
+
+    Returns:
+        A dict with the "store", the versions "removed" and those "skipped"
+        as not in the store.
+
+    Raises:
+        PoemError: If no store is configured, or a version cannot be removed.
+    """
+    return _store_uninstall(versions, store=store)
+
+
+def store_list(store: Optional[str] = None) -> Dict[str, Any]:
+    """List the Poetry versions in the shared store.
+
+    Returns:
+        A dict with the "store" and its "versions", oldest first.
+
+    Raises:
+        PoemError: If no store is configured.
+    """
+    return _store_list(store=store)
+
+
+def verify(versions: Optional[List[str]] = None, repair: bool = False,
+           jobs: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Check installed Poetry versions for missing or modified files.
+
+    Args:
+        versions: The versions to check (default: every installed version)
+        repair: If True, reinstall the distributions with problems
+        jobs: The number of hashing processes (default: one per CPU)
+
+    Returns:
+        One result per version with its "missing" and "corrupt" files;
+        versions a repair was attempted on also carry a "repair" dict.
+
+    Raises:
+        VersionNotInstalledError: If a requested version is not installed.
+    """
+    return verify_versions(versions or [], repair=repair, jobs=jobs)
+
+
+def upgrade(from_version: str, to_version: str, keep: bool = False,
+            update_pins: bool = True, compile_bytecode: bool = True) -> Dict[str, Any]:
+    """Upgrade an installed Poetry version by updating a copy of it.
+
+    Args:
+        from_version: The installed version to upgrade
+        to_version: The version to upgrade to
+        keep: If True, keep from_version installed
+        update_pins: If True, point the global and local version files
+            pinning from_version at to_version; turning it off requires keep
+        compile_bytecode: If True, precompile the upgraded venv
+
+    Returns:
+        The outcome; see poem.upgrade.upgrade_version.
+
+    Raises:
+        VersionNotInstalledError: If from_version is not installed.
+        PoemError: If the upgrade fails, or update_pins is off without keep.
+    """
+    result = upgrade_version(from_version, to_version, keep=keep,
+                             update_pins=update_pins, compile_bytecode=compile_bytecode)
+    refresh_shim_bundle()
+    return result
+
+
+def plugins_list() -> Dict[str, Any]:
+    """List the declared plugins.
+
+    Returns:
+        A dict with the declared plugin requirements under "plugins".
+    """
+    return {"plugins": read_plugins()}
+
+
+def plugins_add(requirements: List[str]) -> Dict[str, Any]:
+    """Declare plugins, replacing any entry for the same project.
+
+    Returns:
+        A dict with the declared plugin requirements under "plugins".
+    """
+    return {"plugins": _plugins_add(requirements)}
+
+
+def plugins_remove(names: List[str]) -> Dict[str, Any]:
+    """Stop declaring plugins.
+
+    Returns:
+        A dict with the declared plugin requirements under "plugins".
+
+    Raises:
+        PoemError: If a plugin is not declared.
+    """
+    return {"plugins": _plugins_remove(names)}
+
+
+def plugins_sync(versions: Optional[List[str]] = None, force: bool = False,
+                 jobs: int = DEFAULT_CONCURRENCY) -> Dict[str, Any]:
+    """Install the declared plugins into the installed versions.
+
+    Returns:
+        The outcome; see poem.plugins.plugins_sync.
+
+    Raises:
+        VersionNotInstalledError: If a requested version is not installed.
+    """
+    return _plugins_sync(versions, force=force, jobs=jobs)
+
+
+def cache_info() -> Dict[str, Any]:
+    """Measure the download cache.
+
+    Returns:
+        The measurements; see poem.cache.cache_info.
+    """
+    return _cache_info()
+
+
+def cache_prune(max_size: Optional[int] = None) -> Dict[str, Any]:
+    """Shrink the download cache to its budget.
+
+    Args:
+        max_size: The size to shrink to, in bytes (default: POEM_CACHE_SIZE)
+
+    Returns:
+        The outcome; see poem.cache.prune_cache.
+    """
+    return prune_cache(max_size)
+
+
+def cache_clear() -> Dict[str, Any]:
+    """Remove everything from the download cache.
+
+    Returns:
+        A dict with the "removed" file count and the bytes "freed".
+
+    Raises:
+        PoemError: If a file cannot be removed.
+    """
+    return clear_cache()
+
+
+def stats(textfile: Optional[str] = None) -> Dict[str, Any]:
+    """Summarize how often and how fast the shim runs each version.
+
+    Args:
+        textfile: A .prom file to write for Prometheus as well
+
+    Returns:
+        The summary; see poem.stats.aggregate.
+
+    Raises:
+        PoemError: If the textfile cannot be written.
+    """
+    return collect_stats(textfile=textfile)
+
+
+def select(specs: List[str], all_versions: bool = False) -> List[str]:
+    """Pick the installed versions matching version specs, oldest first.
+
+    A spec matches a version exactly or as a release prefix, so "1.8"
+    selects every installed 1.8.x.
+
+    Raises:
+        PoemError: If a spec matches nothing, or nothing is selected.
+    """
+    try:
+        versions = select_versions(specs, all_versions)
+    except ValueError as e:
+        raise PoemError(str(e)) from e
+    if not versions:
+        raise PoemError("No poetry versions selected. Pass versions or --all.")
+    return versions
+
+
+def run(versions: List[str], command: List[str], read_only: bool = False,
+        jobs: int = DEFAULT_CONCURRENCY,
+        timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Run a command against several installed Poetry versions concurrently.
+
+    Returns:
+        One dict per version with "version", "returncode" (None on
+        timeout), "duration" in seconds and the combined "output".
+
+    Raises:
+        PoemError: If no command is given.
+    """
+    if not command:
+        raise PoemError("No command given. Usage: poem exec <versions...|--all> -- <command>")
+    return run_versions(versions, command, read_only=read_only, jobs=jobs, timeout=timeout)
+
+
+def hook(shell: str, env: bool = False) -> Dict[str, Any]:
+    """Render the shell hook, or the PATH update it evaluates.
+
+    Args:
+        shell: One of "bash", "zsh" or "fish"
+        env: If True, render the PATH update for the working directory
+
+    Returns:
+        A dict with the "shell", the "script" and, for the PATH update, the
+        pinned version that is "not_installed" (None if there is none).
+    """
+    if not env:
+        return {"shell": shell, "script": render_hook(shell)}
+
+    pinned = get_pinned_version()
+    not_installed = None
+    if pinned and not os.path.exists(get_poetry_bin(pinned[0])):
+        not_installed = {"version": pinned[0], "source": pinned[1]}
+    return {"shell": shell, "script": render_env(shell), "not_installed": not_installed}
+
+
+def init(add_to_path: bool = False) -> Dict[str, Any]:
+    """Install the poetry shim.
+
+    Args:
+        add_to_path: If True, add the shim directory to PATH in the shell
+            profiles (or the registry on Windows)
+
+    Returns:
+        A dict with the "shim_dir", the "shim" and the places
+        "added_to_path" (None unless add_to_path is set).
+
+    Raises:
+        PoemError: If the shim does not run, or PATH cannot be updated.
+    """
+    return install_shims(add_to_path=add_to_path)
+
+
+def serve_mirror(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 cache_dir: Optional[str] = None,
+                 allowed_hosts: Optional[List[str]] = None,
+                 on_ready: Optional[Callable[[str, str], None]] = None) -> None:
+    """Serve the poem cache to other machines until interrupted.
+
+    Args:
+        on_ready: Called with the mirror's URL and cache directory once it
+            is listening
+
+    Raises:
+        PoemError: If the address cannot be bound.
+    """
+    _serve_mirror(host, port, cache_dir=cache_dir, allowed_hosts=allowed_hosts,
+                  on_ready=on_ready)
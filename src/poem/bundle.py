@@ -0,0 +1,252 @@
+"""Export installed Poetry versions to a portable archive and import them."""
+
+import json
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from poem import __version__
+from poem.core import (
+    _get_installed_versions,
+    _install_lock,
+    _relocate_version_dir,
+    _write_manifest_at,
+    get_poetry_home,
+    get_version_dir,
+    read_manifest,
+)
+from poem.errors import PoemError, VersionNotInstalledError
+from poem.fetch import DEFAULT_CONCURRENCY
+from poem.lock import LockTimeout
+from poem.trace import span
+
+BUNDLE_FORMAT = 1
+# First member of every bundle, describing the versions it carries
+BUNDLE_INDEX = "poem-bundle.json"
+
+
+def _compress_version(version: str, destination: str) -> str:
+    """Write one version directory to a gzip-compressed tar file."""
+    archive = os.path.join(destination, f"{version}.tar.gz")
+    with span("compress version", "fs", version=version):
+        with tarfile.open(archive, "w:gz", compresslevel=6) as tar:
+            tar.add(get_version_dir(version), arcname=version)
+    return archive
+
+
+def export_bundle(versions: List[str], output: str,
+                  jobs: int = DEFAULT_CONCURRENCY) -> List[str]:
+    """Write installed versions and their manifests into one archive.
+
+    The bundle is an uncompressed tar holding an index and one compressed
+    tar per version. Versions are compressed in parallel, and the layout
+    lets import decompress them in parallel too.
+
+    Args:
+        versions: The versions to export; all installed versions if empty
+        output: The bundle file to write ("-" for stdout)
+        jobs: The number of versions compressed at the same time
+
+    Returns:
+        The versions written to the bundle.
+
+    Raises:
+        VersionNotInstalledError: If a requested version is not installed.
+        PoemError: If no versions are installed, or the bundle cannot be
+            written.
+    """
+    installed = _get_installed_versions()
+    versions = list(dict.fromkeys(versions)) or sorted(installed)
+    missing = [version for version in versions if version not in installed]
+    if missing:
+        raise VersionNotInstalledError(
+            missing[0], f"Poetry version(s) not installed: {', '.join(missing)}")
+    if not versions:
+        raise PoemError("No poetry versions are installed")
+
+    index = {
+        "format": BUNDLE_FORMAT,
+        "poem_version": __version__,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "versions": {
+            version: {
+                "prefix": get_version_dir(version),
+                "manifest": read_manifest(version),
+            }
+            for version in versions
+        },
+    }
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="poem-bundle-") as scratch:
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+                archives = list(pool.map(
+                    lambda version: _compress_version(version, scratch), versions))
+
+            index_file = os.path.join(scratch, BUNDLE_INDEX)
+            with open(index_file, "w") as f:
+                json.dump(index, f, indent=2)
+
+            if output == "-":
+                bundle = tarfile.open(fileobj=sys.stdout.buffer, mode="w|")
+            else:
+                bundle = tarfile.open(output, "w")
+            with bundle:
+                bundle.add(index_file, arcname=BUNDLE_INDEX)
+                for archive in archives:
+                    bundle.add(archive, arcname=os.path.basename(archive))
+    except (OSError, tarfile.TarError) as e:
+        raise PoemError(f"Failed to export bundle: {str(e)}") from e
+    return versions
+
+
+def _check_base_interpreter(version_dir: str) -> Optional[str]:
+    """Get the base interpreter directory a venv expects, if it is missing."""
+    try:
+        with open(os.path.join(version_dir, "venv", "pyvenv.cfg"), "r") as f:
+            for line in f:
+                key, _, value = line.partition("=")
+                if key.strip() == "home" and not os.path.isdir(value.strip()):
+                    return value.strip()
+    except OSError:
+        pass
+    return None
+
+
+def _extract_version(archive: str, version: str, staging_root: str,
+                     info: Dict) -> str:
+    """Decompress one version into a staging directory and relocate it."""
+    with span("extract version", "fs", version=version):
+        with tarfile.open(archive, "r:gz") as tar:
+            tar.extractall(staging_root, filter="tar")
+    os.unlink(archive)
+
+    staged_dir = os.path.join(staging_root, version)
+    # Paths are rewritten to the final location; the directory is renamed
+    # there unchanged once every version has been extracted
+    _relocate_version_dir(staged_dir, info["prefix"],
+                          get_version_dir(version, home=get_poetry_home()))
+    return staged_dir
+
+
+def import_bundle(source: str, force: bool = False,
+                  jobs: int = DEFAULT_CONCURRENCY) -> Dict[str, List[str]]:
+    """Install the versions carried by a bundle.
+
+    The bundle is read as a stream ("-" reads stdin). Each version archive
+    is spooled to disk as it arrives and decompressed by a worker pool, so
+    reading the stream and extracting overlap. Versions are extracted next
+    to their final location and renamed into place once relocated, holding
+    the version's install lock so a shim waits for a replaced version
+    instead of installing it again; a replaced version is put back if its
+    replacement cannot be moved in.
+
+    Args:
+        source: The bundle file to read ("-" for stdin)
+        force: If True, replace versions that are already installed
+        jobs: The number of versions extracted at the same time
+
+    Returns:
+        The "imported" versions, those "skipped" as already installed, and
+        "warnings" about imported versions that may not run here.
+
+    Raises:
+        PoemError: If the bundle cannot be read or installed.
+    """
+    venv_root = os.path.join(get_poetry_home(), "venv")
+    os.makedirs(venv_root, exist_ok=True)
+    staging_root = tempfile.mkdtemp(prefix=".import-", dir=venv_root)
+
+    index: Optional[Dict] = None
+    futures = {}
+    imported = []
+    skipped = []
+    warnings = []
+    try:
+        if source == "-":
+            bundle = tarfile.open(fileobj=sys.stdin.buffer, mode="r|")
+        else:
+            bundle = tarfile.open(source, "r|")
+
+        with bundle, ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            for member in bundle:
+                if member.name == BUNDLE_INDEX:
+                    index = json.load(bundle.extractfile(member))
+                    if index.get("format") != BUNDLE_FORMAT:
+                        raise ValueError(
+                            f"Unsupported bundle format: {index.get('format')}")
+                    continue
+                if index is None or not member.name.endswith(".tar.gz"):
+                    raise ValueError(f"Unexpected bundle member: {member.name}")
+
+                version = member.name[:-len(".tar.gz")]
+                info = index["versions"].get(version)
+                if (info is None or version in (".", "..")
+                        or os.path.basename(version) != version):
+                    raise ValueError(f"Unexpected bundle member: {member.name}")
+                target_dir = get_version_dir(version, home=get_poetry_home())
+                if os.path.exists(target_dir) and not force:
+                    skipped.append(version)
+                    continue
+
+                archive = os.path.join(staging_root, member.name)
+                with open(archive, "wb") as f:
+                    shutil.copyfileobj(bundle.extractfile(member), f)
+                futures[version] = pool.submit(
+                    _extract_version, archive, version, staging_root, info)
+
+        for version, future in futures.items():
+            staged_dir = future.result()
+            manifest = index["versions"][version].get("manifest") or {}
+            manifest["imported_at"] = datetime.now(
+                timezone.utc).isoformat(timespec="seconds")
+            manifest["imported_from"] = index["versions"][version]["prefix"]
+            _write_manifest_at(staged_dir, manifest)
+
+            target_dir = get_version_dir(version, home=get_poetry_home())
+            with _install_lock(version):
+                if not _swap_version_dir(staged_dir, target_dir, force,
+                                         os.path.join(staging_root, f"{version}.old")):
+                    skipped.append(version)
+                    continue
+            imported.append(version)
+
+            base = _check_base_interpreter(target_dir)
+            if base:
+                warnings.append(f"poetry {version} expects a Python installation "
+                                f"in {base}, which does not exist on this machine")
+    except (OSError, ValueError, KeyError, tarfile.TarError, LockTimeout) as e:
+        raise PoemError(f"Failed to import bundle: {str(e)}") from e
+    finally:
+        shutil.rmtree(staging_root, ignore_errors=True)
+
+    return {"imported": imported, "skipped": skipped, "warnings": warnings}
+
+
+def _swap_version_dir(staged_dir: str, target_dir: str, force: bool, old_dir: str) -> bool:
+    """Move a staged version into place, setting any existing install aside.
+
+    The caller holds the version's install lock. If the staged version
+    cannot be moved in, the existing install is moved back.
+
+    Returns:
+        False if the version was installed meanwhile and force is not set.
+    """
+    if not os.path.exists(target_dir):
+        os.rename(staged_dir, target_dir)
+        return True
+    if not force:
+        return False
+
+    os.rename(target_dir, old_dir)
+    try:
+        os.rename(staged_dir, target_dir)
+    except OSError:
+        os.rename(old_dir, target_dir)
+        raise
+    return True
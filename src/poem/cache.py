@@ -0,0 +1,304 @@
+"""A size-bounded cache for everything poem downloads.
+
+The poem cache holds release listings (index/), the installer script
+(downloads/), plugin wheels (wheels/) and mirrored release files
+(artifacts/). It is kept under a byte budget, POEM_CACHE_SIZE, by evicting
+the least recently used files first; cache hits refresh a file's access
+time, so eviction does not depend on the filesystem's atime policy.
+Temporary files left by interrupted downloads, and installer scripts
+that versions of poem without a cache left in the system temp directory,
+are removed once they are old enough that no running process can still
+be using them.
+"""
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+from time import time
+from typing import Dict, List, Optional, Tuple
+
+from poem.errors import PoemError
+from poem.settings import get_settings
+
+# Default for POEM_CACHE_SIZE
+DEFAULT_CACHE_SIZE = 2 * 1024 ** 3
+# Temporary files younger than this may still be written by a running download
+TEMP_GRACE_SECONDS = 3600
+# Automatic pruning after downloads runs at most this often
+PRUNE_INTERVAL = 600
+# Touched whenever the cache has been pruned
+PRUNE_STAMP = ".last-prune"
+
+_SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+# Names of the NamedTemporaryFile(suffix=".py") installers of earlier poem versions
+_LEGACY_INSTALLER_NAME = re.compile(r"^tmp[a-z0-9_]{8}\.py$")
+# Opening of the Poetry installer script, checked before one is removed
+_INSTALLER_SIGNATURE = b"This script will install Poetry"
+
+
+def _get_cache_dir() -> str:
+    """Get the poem cache directory (POEM_CACHE_DIR, or the XDG cache)."""
+    return get_settings().cache_dir
+
+
+def parse_size(value: str) -> int:
+    """Parse a byte size such as "500M", "2G", "1.5GiB" or "1048576".
+
+    Raises:
+        ValueError: If the size cannot be parsed.
+    """
+    text = value.strip().lower()
+    for suffix in ("ib", "b"):
+        if text.endswith(suffix):
+            text = text[:-len(suffix)]
+            break
+    unit = text[-1:] if text[-1:] in _SIZE_UNITS else ""
+    number = text[:-1] if unit else text
+    try:
+        size = float(number) * _SIZE_UNITS[unit]
+    except ValueError:
+        raise ValueError(f"Invalid size: {value!r}") from None
+    if size < 0:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(size)
+
+
+def format_size(size: int) -> str:
+    """Format a byte count for people, e.g. "1.5 GiB"."""
+    if size < 1024:
+        return f"{size} B"
+    for unit in ("KiB", "MiB"):
+        size /= 1024
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+    return f"{size / 1024:.1f} GiB"
+
+
+def get_cache_budget() -> int:
+    """Get the cache's byte budget from POEM_CACHE_SIZE (default 2 GiB)."""
+    value = os.environ.get("POEM_CACHE_SIZE")
+    if not value:
+        return DEFAULT_CACHE_SIZE
+    try:
+        return parse_size(value)
+    except ValueError as e:
+        print(f"Warning: ignoring POEM_CACHE_SIZE: {str(e)}", file=sys.stderr)
+        return DEFAULT_CACHE_SIZE
+
+
+def touch(path: str) -> None:
+    """Mark a cached file as used now, keeping its modification time.
+
+    The modification time tells when a file was downloaded and decides
+    whether it is fresh; the access time orders eviction.
+    """
+    try:
+        os.utime(path, (time(), os.stat(path).st_mtime))
+    except OSError:
+        pass
+
+
+def _is_temp_file(name: str) -> bool:
+    """Check whether a cache file is a download that was never completed."""
+    return name.endswith((".tmp", ".partial"))
+
+
+def _scan(cache_dir: str) -> Tuple[List[Tuple[float, str, int]], List[Tuple[float, str, int]]]:
+    """List the files of the cache.
+
+    Returns:
+        The cached files and the temporary files, each as (access time or,
+        for temporary files, modification time, path, size) tuples.
+    """
+    files = []
+    temp_files = []
+    for root, _, names in os.walk(cache_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if root == cache_dir and name == PRUNE_STAMP:
+                continue
+            try:
+                info = os.lstat(path)
+            except OSError:
+                continue
+            if _is_temp_file(name):
+                temp_files.append((info.st_mtime, path, info.st_size))
+            else:
+                files.append((info.st_atime, path, info.st_size))
+    return files, temp_files
+
+
+def _legacy_installers(temp_dir: str) -> List[Tuple[float, str, int]]:
+    """List the installer scripts earlier poem versions left in a temp directory.
+
+    Returns:
+        (modification time, path, size) tuples of the files named like a
+        NamedTemporaryFile that start like the Poetry installer.
+    """
+    installers = []
+    try:
+        entries = list(os.scandir(temp_dir))
+    except OSError:
+        return []
+    for entry in entries:
+        if not _LEGACY_INSTALLER_NAME.match(entry.name):
+            continue
+        try:
+            info = entry.stat(follow_symlinks=False)
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            with open(entry.path, "rb") as f:
+                head = f.read(1024)
+        except OSError:
+            continue
+        if _INSTALLER_SIGNATURE in head:
+            installers.append((info.st_mtime, entry.path, info.st_size))
+    return installers
+
+
+def _remove_empty_dirs(cache_dir: str) -> None:
+    """Remove directories left empty by eviction, keeping the cache root."""
+    for root, dirs, files in os.walk(cache_dir, topdown=False):
+        if root != cache_dir and not dirs and not files:
+            try:
+                os.rmdir(root)
+            except OSError:
+                pass
+
+
+def _prune(cache_dir: str, budget: int, grace: float = TEMP_GRACE_SECONDS) -> Dict:
+    """Remove stale temporary files, then evict the least recently used files.
+
+    Returns:
+        A dict with the "removed" file count, the bytes "freed", the
+        "temp_files" among the removed files, and the remaining "size".
+    """
+    files, temp_files = _scan(cache_dir)
+    result = {"removed": 0, "freed": 0, "temp_files": 0, "size": 0}
+    now = time()
+    # Only stale installers are taken; they are not part of the cache's size
+    installers = [entry for entry in _legacy_installers(tempfile.gettempdir())
+                  if now - entry[0] >= grace]
+    for modified, path, size in temp_files + installers:
+        if now - modified < grace:
+            result["size"] += size
+            continue
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        result["removed"] += 1
+        result["temp_files"] += 1
+        result["freed"] += size
+
+    total = result["size"] + sum(size for _, _, size in files)
+    for _, path, size in sorted(files):
+        if total <= budget:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        result["removed"] += 1
+        result["freed"] += size
+    result["size"] = total
+
+    _remove_empty_dirs(cache_dir)
+    try:
+        with open(os.path.join(cache_dir, PRUNE_STAMP), "w"):
+            pass
+    except OSError:
+        pass
+    return result
+
+
+def prune_if_due(cache_dir: Optional[str] = None) -> None:
+    """Keep a cache within its budget after a download, at most every PRUNE_INTERVAL.
+
+    Never raises; a failed prune is retried after the next download.
+
+    Args:
+        cache_dir: The cache to prune (default: the poem cache)
+    """
+    cache_dir = cache_dir or _get_cache_dir()
+    try:
+        if time() - os.path.getmtime(os.path.join(cache_dir, PRUNE_STAMP)) < PRUNE_INTERVAL:
+            return
+    except OSError:
+        if not os.path.isdir(cache_dir):
+            return
+    try:
+        _prune(cache_dir, get_cache_budget())
+    except OSError:
+        pass
+
+
+def cache_info() -> Dict:
+    """Measure the cache and each area in it.
+
+    Returns:
+        A dict with the cache "path", its "budget" and "size" in bytes, the
+        number of "files", the "temp_files" waiting to be cleaned up, and
+        the size of each top-level "areas" directory.
+    """
+    cache_dir = _get_cache_dir()
+    files, temp_files = _scan(cache_dir) if os.path.isdir(cache_dir) else ([], [])
+    areas: Dict[str, int] = {}
+    for _, path, size in files + temp_files:
+        area = os.path.relpath(path, cache_dir).split(os.sep)[0]
+        areas[area] = areas.get(area, 0) + size
+    result = {
+        "path": cache_dir,
+        "budget": get_cache_budget(),
+        "size": sum(areas.values()),
+        "files": len(files),
+        "temp_files": len(temp_files),
+        "areas": dict(sorted(areas.items())),
+    }
+    return result
+
+
+def prune_cache(budget: Optional[int] = None) -> Dict:
+    """Clean up unfinished downloads and evict files until the cache fits its budget.
+
+    Args:
+        budget: The size to shrink the cache to, in bytes (default:
+            POEM_CACHE_SIZE)
+
+    Returns:
+        The outcome (see _prune), with the "budget" that was applied.
+    """
+    cache_dir = _get_cache_dir()
+    budget = get_cache_budget() if budget is None else budget
+    if not os.path.isdir(cache_dir):
+        return {"removed": 0, "freed": 0, "temp_files": 0, "size": 0, "budget": budget}
+    return dict(_prune(cache_dir, budget), budget=budget)
+
+
+def clear_cache() -> Dict:
+    """Remove everything from the cache.
+
+    Returns:
+        A dict with the "removed" file count and the bytes "freed".
+
+    Raises:
+        PoemError: If a file cannot be removed.
+    """
+    cache_dir = _get_cache_dir()
+    files, temp_files = _scan(cache_dir) if os.path.isdir(cache_dir) else ([], [])
+    result = {"removed": len(files) + len(temp_files),
+              "freed": sum(size for _, _, size in files + temp_files)}
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.unlink(path)
+            except OSError as e:
+                raise PoemError(f"Failed to remove {path}: {str(e)}") from e
+    return result
@@ -1,26 +1,21 @@
 """CLI module for the poem package."""
 
 import argparse
-import sys
-from typing import List, Optional
-
-from poem import __version__
-from poem.core import (
-    list_versions,
-    switch_version,
-    get_current_version,
-    install_version,
-    uninstall_version,
-    set_global_version,
-    set_local_version,
-    get_remote_versions,
-    get_current_version_with_source,
-    which_poetry,
-    doctor,
-)
+import json
 import logging
+import platform
+import sys
+from typing import Any, Dict, List, Optional, Tuple
 
-from poem.directories import install_shims
+from poem import __version__, api, trace
+from poem.cache import format_size, parse_size
+from poem.core import format_timings
+from poem.execute import FAILURE_TAIL_LINES
+from poem.fetch import DEFAULT_CONCURRENCY
+from poem.hook import SUPPORTED_SHELLS
+from poem.mirror import DEFAULT_HOST, DEFAULT_PORT
+from poem.stats import QUANTILES
+from poem.verify import affected_dists, has_problems
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -38,22 +33,51 @@ def create_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--debug", action="store_true", help="Enable debug output"
     )
+    parser.add_argument(
+        "--trace", action="store_true",
+        help="Print a timing summary of resolution, file, subprocess and HTTP work"
+    )
+    parser.add_argument(
+        "--trace-file", metavar="FILE",
+        help="Write timings as Chrome trace JSON to FILE"
+    )
+
+    # Every command accepts --json
+    json_parent = argparse.ArgumentParser(add_help=False)
+    json_parent.add_argument(
+        "--json", action="store_true",
+        help="Print the result as JSON; progress messages go to stderr"
+    )
 
     subparsers = parser.add_subparsers(dest="command", help="Command to run")
 
     # List command
     list_parser = subparsers.add_parser(
-        "list", help="List installed poetry versions"
+        "list", parents=[json_parent], help="List installed poetry versions"
     )
 
     # ls-remote command
-    subparsers.add_parser(
-        "ls-remote", help="List available poetry versions from GitHub releases"
+    ls_remote_parser = subparsers.add_parser(
+        "ls-remote", parents=[json_parent], help="List available poetry versions from the package index"
+    )
+    ls_remote_parser.add_argument(
+        "--latest", action="store_true", help="Show only the newest matching version"
+    )
+    ls_remote_parser.add_argument(
+        "--since", metavar="DATE|VERSION",
+        help="Show only versions uploaded on or after a date (YYYY-MM-DD) or newer than a version"
+    )
+    ls_remote_parser.add_argument(
+        "--stable", action="store_true", help="Leave out pre- and development releases"
+    )
+    ls_remote_parser.add_argument(
+        "--python", metavar="VERSION",
+        help="Show only versions supporting this Python version (e.g. 3.11)"
     )
 
     # Use command
     use_parser = subparsers.add_parser(
-        "use", help="Switch to a specific poetry version for the current shell session"
+        "use", parents=[json_parent], help="Switch to a specific poetry version for the current shell session"
     )
     use_parser.add_argument(
         "version", help="Version to use (e.g. 1.1.0)"
@@ -61,28 +85,60 @@ def create_parser() -> argparse.ArgumentParser:
 
     # Current command
     subparsers.add_parser(
-        "current", help="Show the active poetry version and its source"
+        "current", parents=[json_parent], help="Show the active poetry version and its source"
     )
 
     # Install command
     install_parser = subparsers.add_parser(
-        "install", help="Install a specific poetry version"
+        "install", parents=[json_parent], help="Install a specific poetry version"
+    )
+    install_parser.add_argument(
+        "version", nargs="+", help="Version(s) to install (e.g. 1.1.0)"
     )
     install_parser.add_argument(
-        "version", help="Version to install (e.g. 1.1.0)"
+        "-j", "--jobs", type=int, default=DEFAULT_CONCURRENCY,
+        help="Number of versions to install at the same time"
+    )
+    install_parser.add_argument(
+        "--no-compile", action="store_true",
+        help="Skip precompiling the installed venv to bytecode"
     )
 
     # Uninstall command
     uninstall_parser = subparsers.add_parser(
-        "uninstall", help="Remove an installed poetry version"
+        "uninstall", parents=[json_parent], help="Remove an installed poetry version"
     )
     uninstall_parser.add_argument(
         "version", help="Version to uninstall (e.g. 1.1.0)"
     )
 
+    # Upgrade command
+    upgrade_parser = subparsers.add_parser(
+        "upgrade", parents=[json_parent],
+        help="Upgrade an installed poetry version by updating a copy of it"
+    )
+    upgrade_parser.add_argument(
+        "from_version", metavar="from", help="Installed version to upgrade (e.g. 1.8.2)"
+    )
+    upgrade_parser.add_argument(
+        "to_version", metavar="to", help="Version to upgrade to (e.g. 1.8.3)"
+    )
+    upgrade_parser.add_argument(
+        "--keep", action="store_true", help="Keep the old version installed"
+    )
+    upgrade_parser.add_argument(
+        "--no-pin", action="store_true",
+        help="Leave the global and local version files pointing at the old version "
+             "(requires --keep)"
+    )
+    upgrade_parser.add_argument(
+        "--no-compile", action="store_true",
+        help="Skip precompiling the upgraded venv to bytecode"
+    )
+
     # Global command
     global_parser = subparsers.add_parser(
-        "global", help="Set a global default poetry version"
+        "global", parents=[json_parent], help="Set a global default poetry version"
     )
     global_parser.add_argument(
         "version", help="Version to set as global default (e.g. 1.1.0)"
@@ -90,7 +146,7 @@ def create_parser() -> argparse.ArgumentParser:
 
     # Local command
     local_parser = subparsers.add_parser(
-        "local", help="Set a local project poetry version (.poetry-version)"
+        "local", parents=[json_parent], help="Set a local project poetry version (.poetry-version)"
     )
     local_parser.add_argument(
         "version", help="Version to set for this directory (e.g. 1.1.0)"
@@ -98,10 +154,10 @@ def create_parser() -> argparse.ArgumentParser:
 
     # Which command
     which_parser = subparsers.add_parser(
-        "which", help="Show the path to the active Poetry binary"
+        "which", parents=[json_parent], help="Show the path to the active Poetry binary"
     )
     init_parser = subparsers.add_parser(
-        "init", help="Initialize poem by installing shims for Poetry"
+        "init", parents=[json_parent], help="Initialize poem by installing shims for Poetry"
     )
     init_parser.add_argument(
         "--add-to-path", action="store_true", help="Add shims to PATH automatically"
@@ -109,7 +165,233 @@ def create_parser() -> argparse.ArgumentParser:
 
     # Doctor command
     subparsers.add_parser(
-        "doctor", help="Diagnose setup issues (shims, PATH, install dirs)"
+        "doctor", parents=[json_parent], help="Diagnose setup issues (shims, PATH, install dirs)"
+    )
+
+    # Sync command
+    sync_parser = subparsers.add_parser(
+        "sync", parents=[json_parent], help="Install every poetry version pinned under a directory tree"
+    )
+    sync_parser.add_argument(
+        "path", nargs="?", default=".", help="Root of the tree to scan (default: .)"
+    )
+    sync_parser.add_argument(
+        "--dry-run", action="store_true", help="Print the plan without installing"
+    )
+    sync_parser.add_argument(
+        "-j", "--jobs", type=int, default=DEFAULT_CONCURRENCY,
+        help="Number of versions to install at the same time"
+    )
+
+    # Bundle command
+    bundle_parser = subparsers.add_parser(
+        "bundle", help="Export or import installed poetry versions as one archive"
+    )
+    bundle_subparsers = bundle_parser.add_subparsers(
+        dest="bundle_command", required=True)
+    export_parser = bundle_subparsers.add_parser(
+        "export", parents=[json_parent], help="Write installed versions into a bundle"
+    )
+    export_parser.add_argument(
+        "versions", nargs="*", help="Versions to export (default: all installed)"
+    )
+    export_parser.add_argument(
+        "-o", "--output", default="poem-bundle.tar",
+        help="Bundle file to write, or - for stdout (default: poem-bundle.tar)"
+    )
+    export_parser.add_argument(
+        "-j", "--jobs", type=int, default=DEFAULT_CONCURRENCY,
+        help="Number of versions to compress at the same time"
+    )
+    import_parser = bundle_subparsers.add_parser(
+        "import", parents=[json_parent], help="Install the versions from a bundle"
+    )
+    import_parser.add_argument(
+        "bundle", help="Bundle file to read, or - for stdin"
+    )
+    import_parser.add_argument(
+        "--force", action="store_true", help="Replace versions that are already installed"
+    )
+    import_parser.add_argument(
+        "-j", "--jobs", type=int, default=DEFAULT_CONCURRENCY,
+        help="Number of versions to extract at the same time"
+    )
+
+    # Store command
+    store_parser = subparsers.add_parser(
+        "store", help="Manage the shared install store (POEM_STORE) for all users"
+    )
+    store_subparsers = store_parser.add_subparsers(
+        dest="store_command", required=True)
+    store_install_parser = store_subparsers.add_parser(
+        "install", parents=[json_parent], help="Install versions into the shared store"
+    )
+    store_install_parser.add_argument(
+        "versions", nargs="+", help="Versions to install (e.g. 1.8.3)"
+    )
+    store_install_parser.add_argument(
+        "-j", "--jobs", type=int, default=DEFAULT_CONCURRENCY,
+        help="Number of versions to install at the same time"
+    )
+    store_uninstall_parser = store_subparsers.add_parser(
+        "uninstall", parents=[json_parent], help="Remove versions from the shared store"
+    )
+    store_uninstall_parser.add_argument(
+        "versions", nargs="+", help="Versions to remove (e.g. 1.8.3)"
+    )
+    store_subparsers.add_parser(
+        "list", parents=[json_parent], help="List the versions in the shared store"
+    )
+    for store_subparser in store_subparsers.choices.values():
+        store_subparser.add_argument(
+            "--store", help="Store directory (default: POEM_STORE)"
+        )
+
+    # Plugins command
+    plugins_parser = subparsers.add_parser(
+        "plugins", help="Keep the same Poetry plugins in every installed version"
+    )
+    plugins_subparsers = plugins_parser.add_subparsers(
+        dest="plugins_command", required=True)
+    plugins_sync_parser = plugins_subparsers.add_parser(
+        "sync", parents=[json_parent], help="Install the declared plugins into installed versions"
+    )
+    plugins_sync_parser.add_argument(
+        "versions", nargs="*", help="Versions to sync (default: all installed)"
+    )
+    plugins_sync_parser.add_argument(
+        "--force", action="store_true", help="Reinstall in versions that are up to date"
+    )
+    plugins_sync_parser.add_argument(
+        "-j", "--jobs", type=int, default=DEFAULT_CONCURRENCY,
+        help="Number of versions to sync at the same time"
+    )
+    plugins_add_parser = plugins_subparsers.add_parser(
+        "add", parents=[json_parent], help="Declare plugins to install in every version"
+    )
+    plugins_add_parser.add_argument(
+        "requirements", nargs="+", help="Plugin requirements (e.g. poetry-plugin-export>=1.6)"
+    )
+    plugins_remove_parser = plugins_subparsers.add_parser(
+        "remove", parents=[json_parent], help="Stop declaring plugins"
+    )
+    plugins_remove_parser.add_argument(
+        "names", nargs="+", help="Plugin names to remove"
+    )
+    plugins_subparsers.add_parser(
+        "list", parents=[json_parent], help="List the declared plugins"
+    )
+
+    # Verify command
+    verify_parser = subparsers.add_parser(
+        "verify", parents=[json_parent],
+        help="Check installed versions for missing or modified files"
+    )
+    verify_parser.add_argument(
+        "versions", nargs="*", help="Versions to check (default: all installed)"
+    )
+    verify_parser.add_argument(
+        "--repair", action="store_true",
+        help="Reinstall the distributions with missing or modified files"
+    )
+    verify_parser.add_argument(
+        "-j", "--jobs", type=int,
+        help="Number of hashing processes (default: one per CPU)"
+    )
+
+    # Stats command
+    stats_parser = subparsers.add_parser(
+        "stats", parents=[json_parent], help="Summarize how often and how fast the shim runs each version"
+    )
+    stats_parser.add_argument(
+        "--textfile", metavar="FILE",
+        help="Also write the summary for the Prometheus textfile collector (e.g. poem.prom)"
+    )
+
+    # Cache command
+    cache_parser = subparsers.add_parser(
+        "cache", help="Inspect and trim the download cache"
+    )
+    cache_subparsers = cache_parser.add_subparsers(
+        dest="cache_command", required=True)
+    cache_subparsers.add_parser(
+        "info", parents=[json_parent], help="Show the size of the cache and its areas"
+    )
+    prune_parser = cache_subparsers.add_parser(
+        "prune", parents=[json_parent],
+        help="Remove unfinished downloads and the least recently used files over budget"
+    )
+    prune_parser.add_argument(
+        "--max-size", type=parse_size, metavar="SIZE",
+        help="Shrink the cache to this size, e.g. 500M (default: POEM_CACHE_SIZE or 2G)"
+    )
+    cache_subparsers.add_parser(
+        "clear", parents=[json_parent], help="Remove everything from the cache"
+    )
+
+    # Exec command
+    exec_parser = subparsers.add_parser(
+        "exec", parents=[json_parent], help="Run a command with several poetry versions in parallel",
+        usage="poem exec [options] (versions... | --all) -- command..."
+    )
+    exec_parser.add_argument(
+        "versions", nargs="*",
+        help="Versions to run against; a prefix such as 1.8 selects every 1.8.x"
+    )
+    exec_parser.add_argument(
+        "-a", "--all", action="store_true", help="Run against every installed version"
+    )
+    exec_parser.add_argument(
+        "--read-only", action="store_true",
+        help="Run in the current directory instead of a copy per version"
+    )
+    exec_parser.add_argument(
+        "-j", "--jobs", type=int, default=DEFAULT_CONCURRENCY,
+        help=f"Maximum number of versions running at once (default: {DEFAULT_CONCURRENCY})"
+    )
+    exec_parser.add_argument(
+        "--timeout", type=float, help="Stop a version's command after this many seconds"
+    )
+    exec_parser.add_argument(
+        "--show-output", action="store_true",
+        help="Print the output of every version, not only failed ones"
+    )
+
+    # Mirror command
+    mirror_parser = subparsers.add_parser(
+        "mirror", help="Serve the poem download cache to other machines"
+    )
+    mirror_subparsers = mirror_parser.add_subparsers(
+        dest="mirror_command", required=True)
+    serve_parser = mirror_subparsers.add_parser(
+        "serve", parents=[json_parent], help="Run a caching mirror of the installer, GitHub and the index"
+    )
+    serve_parser.add_argument(
+        "--host", default=DEFAULT_HOST,
+        help=f"Address to listen on (default: {DEFAULT_HOST})"
+    )
+    serve_parser.add_argument(
+        "--port", type=int, default=DEFAULT_PORT,
+        help=f"Port to listen on (default: {DEFAULT_PORT})"
+    )
+    serve_parser.add_argument(
+        "--cache-dir", help="Cache directory to serve (default: the poem cache)"
+    )
+    serve_parser.add_argument(
+        "--allow-host", action="append", default=[], metavar="HOST[:PORT]",
+        help="Also mirror this upstream host; give the port unless it is 443 (repeatable)"
+    )
+
+    # Hook command
+    hook_parser = subparsers.add_parser(
+        "hook", parents=[json_parent], help="Print a shell hook that switches poetry versions on cd"
+    )
+    hook_parser.add_argument(
+        "shell", choices=SUPPORTED_SHELLS, help="Shell to generate the hook for"
+    )
+    hook_parser.add_argument(
+        "--env", action="store_true",
+        help="Print the PATH update for the current directory instead"
     )
 
     return parser
@@ -120,45 +402,611 @@ def main(args: Optional[List[str]] = None) -> int:
     if args is None:
         args = sys.argv[1:]
 
+    # Everything after "--" is the command run by "poem exec"
+    command: List[str] = []
+    if "--" in args:
+        split = args.index("--")
+        args, command = args[:split], args[split + 1:]
+
     parser = create_parser()
     parsed_args = parser.parse_args(args)
+    if command and parsed_args.command != "exec":
+        parser.error("unrecognized arguments: -- " + " ".join(command))
+    parsed_args.exec_command = command
 
     if parsed_args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
         logger.debug("Debug mode enabled")
 
+    if parsed_args.trace or parsed_args.trace_file:
+        trace.enable(parsed_args.trace_file)
+
     if not parsed_args.command:
         parser.print_help()
         return 1
 
-    if parsed_args.command == "list":
-        list_versions(installed_only=True)  # Always show installed versions
-    elif parsed_args.command == "ls-remote":
-        get_remote_versions()
-    elif parsed_args.command == "use":
-        switch_version(parsed_args.version)
-    elif parsed_args.command == "current":
-        get_current_version_with_source()
-    elif parsed_args.command == "install":
-        install_version(parsed_args.version)
-    elif parsed_args.command == "uninstall":
-        uninstall_version(parsed_args.version)
-    elif parsed_args.command == "global":
-        set_global_version(parsed_args.version)
-    elif parsed_args.command == "local":
-        set_local_version(parsed_args.version)
-    elif parsed_args.command == "which":
-        which_poetry()
-    elif parsed_args.command == "doctor":
-        doctor()
-    elif parsed_args.command == "init":
-        install_shims()
+    with trace.span(parsed_args.command, "cli"):
+        return _run(parsed_args)
+
+
+def _run(parsed_args: argparse.Namespace) -> int:
+    """Run a command through the library API and print its result.
+
+    Without --json the handlers print text as they go. With --json nothing
+    but the result, or {"error": ..., "type": ...} on failure, is written to
+    stdout as one JSON document; the mirror, which runs until interrupted,
+    announces its address instead. File system errors the API lets through
+    are reported the same way, and an interrupt exits with 130.
+    """
+    handler = _COMMANDS[parsed_args.command]
+    try:
+        result, code = handler(parsed_args)
+    except (api.PoemError, ValueError, OSError) as e:
+        if not parsed_args.json:
+            _print_error(e)
+            return 1
+        result, code = {"error": str(e), "type": type(e).__name__}, 1
+    except KeyboardInterrupt:
+        if not parsed_args.json:
+            print("Interrupted", file=sys.stderr)
+            return 130
+        result, code = {"error": "Interrupted", "type": "KeyboardInterrupt"}, 130
+
+    if parsed_args.json and result is not None:
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return code
+
+
+def _print_error(error: Exception) -> None:
+    if isinstance(error, api.InstallError):
+        for version, reason in error.failures.items():
+            print(f"Failed to install poetry {version}: {reason}", file=sys.stderr)
     else:
-        print(f"Unknown command: {parsed_args.command}")
-        parser.print_help()
-        return 1
+        print(f"Error: {str(error)}", file=sys.stderr)
+
+
+def _install(parsed_args: argparse.Namespace, versions: List[str],
+             jobs: int = DEFAULT_CONCURRENCY, compile_bytecode: bool = True) -> List[str]:
+    """Install versions through the API, reporting each one in text mode."""
+    text = not parsed_args.json
+    if text:
+        present = {entry["version"] for entry in api.installed()}
+        pending = [version for version in dict.fromkeys(versions) if version not in present]
+        if pending:
+            print(f"Installing poetry {', '.join(pending)}...")
+
+    try:
+        installed = api.install(versions, jobs=jobs, compile_bytecode=compile_bytecode)
+    except api.InstallError as e:
+        if text:
+            _print_installed(e.installed)
+        raise
+    if text:
+        _print_installed(installed)
+    return installed
+
+
+def _print_installed(versions: List[str]) -> None:
+    manifests = {entry["version"]: entry["manifest"] for entry in api.installed()}
+    for version in versions:
+        timings = manifests.get(version, {}).get("timings")
+        print(f"Successfully installed poetry {version}"
+              + (f" ({format_timings(timings)})" if timings else ""))
+
+
+def _list(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    versions = api.installed()
+    if parsed_args.json:
+        return versions, 0
+
+    if not versions:
+        print("No poetry versions are installed.")
+        return versions, 0
+    print("Installed poetry versions:")
+    for entry in versions:
+        print(f"- {entry['version']}" + (" (shared store)" if entry["shared"] else ""))
+    return versions, 0
+
+
+def _ls_remote(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    releases = api.releases(latest=parsed_args.latest, since=parsed_args.since,
+                            stable=parsed_args.stable, python=parsed_args.python)
+    if parsed_args.json:
+        return releases, 0
+
+    if not releases:
+        print("No poetry versions match.")
+    for release in reversed(releases):
+        uploaded = (release["uploaded"] or "")[:10] or "-"
+        requires_python = release["requires_python"] or "any"
+        flags = "  (prerelease)" if release["prerelease"] else ""
+        print(f"{release['version']:12} {uploaded:10}  python {requires_python}{flags}")
+    return releases, 0
+
+
+def _current(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    active = api.resolve()
+    if not parsed_args.json:
+        print(f"Current poetry version: {active['version']} (from {active['source']})")
+    return active, 0
+
+
+def _which(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    active = api.resolve()
+    if not parsed_args.json:
+        print(active["bin"])
+        if not active["installed"]:
+            print(f"poem: poetry {active['version']} ({active['source']}) is not "
+                  f"installed, run: poem install {active['version']}", file=sys.stderr)
+    return active, 0
+
+
+def _use(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    version = parsed_args.version
+    _install(parsed_args, [version])
+    result = api.use(version)
+    if parsed_args.json:
+        return result, 0
+
+    print(f"To use poetry version {version} in your current shell, run:")
+    if platform.system() == "Windows":
+        print(f"    $env:PATH=\"{result['path']};$env:PATH\"  # PowerShell")
+        print(f"    SET PATH={result['path']};%PATH%  # Command Prompt")
+    else:
+        print(f"    export PATH=\"{result['path']}:$PATH\"")
+    print(f"\nPoetry version {version} is ready to use.")
+    return result, 0
+
+
+def _install_command(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    installed = _install(parsed_args, parsed_args.version, jobs=parsed_args.jobs,
+                         compile_bytecode=not parsed_args.no_compile)
+    skipped = [version for version in dict.fromkeys(parsed_args.version)
+               if version not in installed]
+    if not parsed_args.json:
+        for version in skipped:
+            print(f"Poetry version {version} is already installed.")
+    return {"installed": installed, "skipped": skipped}, 0
+
+
+def _uninstall(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    path = api.uninstall(parsed_args.version)
+    if not parsed_args.json:
+        print(f"Successfully uninstalled poetry {parsed_args.version}")
+    return {"uninstalled": parsed_args.version, "path": path}, 0
+
+
+def _upgrade(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    if not parsed_args.json:
+        print(f"Upgrading poetry {parsed_args.from_version} to {parsed_args.to_version}...")
+    result = api.upgrade(parsed_args.from_version, parsed_args.to_version,
+                         keep=parsed_args.keep, update_pins=not parsed_args.no_pin,
+                         compile_bytecode=not parsed_args.no_compile)
+    if parsed_args.json:
+        return result, 0
+
+    for version_file in result["pins"]:
+        print(f"Updated {version_file} to {result['to']}")
+    for warning in result["warnings"]:
+        print(f"Warning: {warning}", file=sys.stderr)
+    print(f"Upgraded poetry {result['from']} to {result['to']} in {result['duration']:.1f}s "
+          f"({len(result['changed'])} distribution(s) changed)")
+    return result, 0
+
+
+def _global(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    _install(parsed_args, [parsed_args.version])
+    result = {"version": parsed_args.version, "file": api.set_global(parsed_args.version)}
+    if not parsed_args.json:
+        print(f"Set global poetry version to {parsed_args.version}")
+        print("This setting will apply to new shell sessions.")
+    return result, 0
+
+
+def _local(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    result = {"version": parsed_args.version, "file": api.set_local(parsed_args.version)}
+    if not parsed_args.json:
+        print(f"Set local poetry version to {parsed_args.version}")
+        print("This setting will apply when you're in this directory.")
+    return result, 0
+
+
+def _doctor(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    report = api.diagnose()
+    if parsed_args.json:
+        return report, 0
+
+    print("Poetry Version Manager (PVM) Doctor")
+    print("===================================")
+
+    print("\n## PVM Configuration")
+    print(f"Config directory: {report['config_dir']}")
+    print(f"Global version: {report['global_version']}" if report["global_version"]
+          else "No global version set")
+    print(f"Local version: {report['local_version']}" if report["local_version"]
+          else "No local version file (.poetry-version) found")
+
+    print("\n## Poetry Installation")
+    print(f"Poetry home: {report['poetry_home']}")
+    local = [entry["version"] for entry in report["installed"] if not entry["shared"]]
+    print(f"Installed versions: {', '.join(local) if local else 'None'}")
+    if report["store"]:
+        shared = [entry["version"] for entry in report["installed"] if entry["shared"]]
+        print(f"Shared store: {report['store']}")
+        print(f"Store versions: {', '.join(shared) if shared else 'None'}")
+
+    print("\n## Environment")
+    for path in report["poetry_path_dirs"]:
+        print(f"Poetry directory in PATH: {path}")
+    if not report["poetry_path_dirs"]:
+        print("✗ No Poetry directory found in PATH")
+
+    print("\n## Active Poetry")
+    active = report["active"]
+    if active is None:
+        print("✗ No poetry version is pinned and poetry is not on PATH")
+    else:
+        print(f"Active version: {active['version']} (from {active['source']})")
+        print(f"✓ {active['bin']}" if active["installed"]
+              else f"✗ poetry {active['version']} is not installed")
+
+    lock = report["lock"]
+    if lock:
+        written_by = (f"Poetry {lock['generated_by']}" if lock["generated_by"]
+                      else f"lock-version {lock['lock_version']}")
+        if active is None:
+            print(f"poetry.lock was written by {written_by}")
+        elif lock["compatible"]:
+            print(f"✓ poetry.lock was written by {written_by}, compatible with "
+                  f"{active['version']}")
+        else:
+            print(f"✗ poetry.lock was written by {written_by}; running poetry "
+                  f"{active['version']} here may rewrite it. Pin a matching version with "
+                  f"poem local, or set POEM_LOCK_RESOLUTION=1")
+
+    print("\n## Network")
+    for endpoint in report["network"]:
+        if endpoint["reachable"]:
+            print(f"✓ {endpoint['name']} reachable ({endpoint['elapsed_ms']} ms)")
+        else:
+            print(f"✗ {endpoint['name']} unreachable: {endpoint['error']}")
+    return report, 0
+
+
+def _sync(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    # The plan is printed before anything is installed
+    plan = api.sync(parsed_args.path, dry_run=True)
+    text = not parsed_args.json
+    if text:
+        _print_sync_plan(plan)
+    if plan["missing"] and not parsed_args.dry_run:
+        plan["installed"] = _install(parsed_args, plan["missing"], jobs=parsed_args.jobs)
+    elif plan["missing"] and text:
+        print(f"Would install: {', '.join(plan['missing'])}")
+    return plan, 0
+
+
+def _print_sync_plan(plan: Dict[str, Any]) -> None:
+    for version, dirs in plan["invalid"].items():
+        print(f"Ignoring invalid version {version!r} pinned in: {', '.join(dirs)}",
+              file=sys.stderr)
+    pins = plan["pinned"]
+    if not pins:
+        print(f"No .poetry-version files found under {plan['root']}")
+        return
+
+    projects = sum(len(dirs) for dirs in pins.values())
+    print(f"Found {len(pins)} pinned poetry versions in {projects} projects "
+          f"under {plan['root']}:")
+    for version, dirs in pins.items():
+        state = "missing" if version in plan["missing"] else "installed"
+        count = len(dirs)
+        print(f"  {version:12} {state:10} ({count} project{'s' if count != 1 else ''})")
+    if not plan["missing"]:
+        print("All pinned versions are installed.")
+
+
+def _bundle(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    text = not parsed_args.json
+    if parsed_args.bundle_command == "export":
+        output = parsed_args.output
+        if output == "-" and parsed_args.json:
+            raise ValueError("--json cannot be combined with -o -, "
+                             "which writes the bundle to stdout")
+        # Progress goes to stderr so the bundle itself can be piped to stdout
+        if text:
+            print(f"Exporting poetry {', '.join(parsed_args.versions) or 'installed versions'}...",
+                  file=sys.stderr)
+        result = api.bundle_export(parsed_args.versions, output, jobs=parsed_args.jobs)
+        if text and output != "-":
+            print(f"Wrote {len(result['exported'])} version(s) to {output}",
+                  file=sys.stderr)
+        return result, 0
+
+    result = api.bundle_import(parsed_args.bundle, force=parsed_args.force,
+                               jobs=parsed_args.jobs)
+    if text:
+        for version in result["imported"]:
+            print(f"Imported poetry {version}")
+        for warning in result["warnings"]:
+            print(f"Warning: {warning}", file=sys.stderr)
+        for version in result["skipped"]:
+            print(f"Poetry {version} is already installed, skipped (use --force to replace)")
+    return result, 0
+
+
+def _store(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    text = not parsed_args.json
+    if parsed_args.store_command == "install":
+        result = api.store_install(parsed_args.versions, store=parsed_args.store,
+                                   jobs=parsed_args.jobs)
+        if text:
+            for version in result["installed"]:
+                print(f"Installed poetry {version} into the shared store")
+            for version in result["skipped"]:
+                print(f"Poetry {version} is already in the shared store")
+            print(f"Shared store {result['store']} is ready for all users")
+    elif parsed_args.store_command == "uninstall":
+        result = api.store_uninstall(parsed_args.versions, store=parsed_args.store)
+        if text:
+            for version in result["skipped"]:
+                print(f"Poetry {version} is not in the shared store.")
+            for version in result["removed"]:
+                print(f"Removed poetry {version} from the shared store")
+    else:
+        result = api.store_list(store=parsed_args.store)
+        if text and not result["versions"]:
+            print(f"No poetry versions in the shared store {result['store']}.")
+        elif text:
+            print(f"Poetry versions in the shared store {result['store']}:")
+            for version in result["versions"]:
+                print(f"- {version}")
+    return result, 0
+
+
+def _plugins(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    text = not parsed_args.json
+    if parsed_args.plugins_command == "sync":
+        return _plugins_sync(parsed_args)
+    elif parsed_args.plugins_command == "add":
+        result = api.plugins_add(parsed_args.requirements)
+        if text:
+            for requirement in parsed_args.requirements:
+                print(f"Added plugin {requirement}")
+            print("Run 'poem plugins sync' to install it in every version.")
+    elif parsed_args.plugins_command == "remove":
+        result = api.plugins_remove(parsed_args.names)
+        if text:
+            print(f"Removed plugin(s) {', '.join(sorted(parsed_args.names))}")
+            print("Run 'poem plugins sync' to uninstall them from every version.")
+    else:
+        result = api.plugins_list()
+        if text and not result["plugins"]:
+            print("No plugins declared.")
+        elif text:
+            for requirement in result["plugins"]:
+                print(f"- {requirement}")
+    return result, 0
+
+
+def _plugins_sync(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    result = api.plugins_sync(parsed_args.versions, force=parsed_args.force,
+                              jobs=parsed_args.jobs)
+    if not parsed_args.json:
+        if result["up_to_date"]:
+            print(f"Plugins up to date in poetry {', '.join(result['up_to_date'])}")
+        for warning in result["warnings"]:
+            print(f"Warning: {warning}", file=sys.stderr)
+        for version in result["synced"]:
+            print(f"Synced plugins in poetry {version}")
+        for version, reason in result["failed"].items():
+            print(f"Failed to sync plugins in poetry {version}: {reason}", file=sys.stderr)
+    return result, int(bool(result["failed"]))
+
+
+def _verify(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    results = api.verify(parsed_args.versions, repair=parsed_args.repair,
+                         jobs=parsed_args.jobs)
+    code = int(has_problems(results))
+    if parsed_args.json:
+        return results, code
+
+    for result in results:
+        repair = result.get("repair")
+        if repair and repair["error"]:
+            print(f"Failed to repair poetry {result['version']}: {repair['error']}",
+                  file=sys.stderr)
+        elif repair:
+            print(f"Repaired poetry {result['version']}: {', '.join(repair['distributions'])}")
+        _print_verify_result(result)
+    if code:
+        print("Some problems could not be repaired." if parsed_args.repair else
+              "Run 'poem verify --repair' to reinstall the affected distributions.",
+              file=sys.stderr)
+    return results, code
+
+
+def _print_verify_result(result: Dict[str, Any]) -> None:
+    problems = result["missing"] + result["corrupt"]
+    if not problems:
+        print(f"poetry {result['version']}: OK ({result['checked']} files)")
+        return
+
+    print(f"poetry {result['version']}: {len(problems)} problem(s) in "
+          f"{len(affected_dists(result))} distribution(s)")
+    for kind in ("missing", "corrupt"):
+        for problem in result[kind]:
+            print(f"  {kind:8} {problem['dist']} {problem['dist_version']}: "
+                  f"{problem['path']}")
+
+
+def _stats(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    summary = api.stats(textfile=parsed_args.textfile)
+    if parsed_args.json:
+        return summary, 0
+
+    if not summary["invocations"]:
+        print(f"No shim runs recorded in {summary['stats_dir']}.")
+    else:
+        print(f"{summary['invocations']} shim runs, {summary['failures']} failed")
+        print(f"{'version':12} {'runs':>7} {'failed':>7} {'p50 ms':>8} {'p90 ms':>8} "
+              f"{'p99 ms':>8}  sources")
+        for version, stats in summary["versions"].items():
+            # Versions seen only in rotated-out logs have counts but no quantiles
+            quantiles = " ".join(f"{value:8.2f}" if value is not None else f"{'-':>8}"
+                                 for value in (stats["resolve_ms"][str(q)] for q in QUANTILES))
+            sources = ", ".join(f"{source} {count}" for source, count
+                                in sorted(stats["sources"].items()))
+            print(f"{version:12} {stats['invocations']:7} {stats['failures']:7} "
+                  f"{quantiles}  {sources}")
+    if parsed_args.textfile:
+        print(f"Wrote {parsed_args.textfile}")
+    return summary, 0
+
+
+def _cache(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    text = not parsed_args.json
+    if parsed_args.cache_command == "prune":
+        result = api.cache_prune(parsed_args.max_size)
+        if text:
+            print(f"Removed {result['removed']} file(s) ({result['temp_files']} unfinished), "
+                  f"freed {format_size(result['freed'])}; cache is "
+                  f"{format_size(result['size'])} of {format_size(result['budget'])}")
+    elif parsed_args.cache_command == "clear":
+        result = api.cache_clear()
+        if text:
+            print(f"Removed {result['removed']} file(s), freed {format_size(result['freed'])}")
+    else:
+        result = api.cache_info()
+        if text:
+            print(f"Cache: {result['path']}")
+            print(f"Size: {format_size(result['size'])} of {format_size(result['budget'])} "
+                  f"in {result['files']} files")
+            for area, size in result["areas"].items():
+                print(f"  {area:12} {format_size(size):>10}")
+            if result["temp_files"]:
+                print(f"{result['temp_files']} temporary file(s) from unfinished downloads")
+    return result, 0
+
+
+def _exec(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    versions = api.select(parsed_args.versions, parsed_args.all)
+    command = parsed_args.exec_command
+    text = not parsed_args.json
+    if text and command:
+        print(f"Running '{' '.join(command)}' with poetry {', '.join(versions)}...")
+    results = api.run(versions, command, read_only=parsed_args.read_only,
+                      jobs=parsed_args.jobs, timeout=parsed_args.timeout)
+    if text:
+        _print_exec_results(results, show_output=parsed_args.show_output)
+    return results, int(any(result["returncode"] != 0 for result in results))
+
+
+def _print_exec_results(results: List[Dict[str, Any]], show_output: bool) -> None:
+    for result in results:
+        if show_output or result["returncode"] != 0:
+            lines = result["output"].rstrip().splitlines()
+            if not show_output:
+                lines = lines[-FAILURE_TAIL_LINES:]
+            print(f"\n==> poetry {result['version']}")
+            for line in lines:
+                print(line)
+
+    print(f"\n{'version':12} {'status':10} {'exit':>5} {'seconds':>8}  last line")
+    for result in results:
+        returncode = result["returncode"]
+        status = "ok" if returncode == 0 else ("timeout" if returncode is None else "failed")
+        lines = result["output"].strip().splitlines()
+        last_line = lines[-1][:60] if lines else ""
+        print(f"{result['version']:12} {status:10} "
+              f"{'-' if returncode is None else returncode:>5} "
+              f"{result['duration']:8.2f}  {last_line}")
+
+
+def _mirror(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    def on_ready(url: str, cache_dir: str) -> None:
+        # The mirror runs until interrupted, so its address is announced here
+        if parsed_args.json:
+            print(json.dumps({"url": url, "cache_dir": cache_dir}), flush=True)
+        else:
+            print(f"Serving poem mirror on {url}/ (cache: {cache_dir})")
+            print(f"Point clients at it with POEM_MIRROR_URL={url}", flush=True)
+
+    api.serve_mirror(parsed_args.host, parsed_args.port, cache_dir=parsed_args.cache_dir,
+                     allowed_hosts=parsed_args.allow_host, on_ready=on_ready)
+    return None, 0
+
+
+def _hook(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    result = api.hook(parsed_args.shell, env=parsed_args.env)
+    if not parsed_args.json:
+        missing = result.get("not_installed")
+        if missing:
+            print(f"poem: poetry {missing['version']} ({missing['source']}) is not "
+                  f"installed, run: poem install {missing['version']}", file=sys.stderr)
+        sys.stdout.write(result["script"])
+    return result, 0
+
+
+def _init(parsed_args: argparse.Namespace) -> Tuple[Any, int]:
+    text = not parsed_args.json
+    if text:
+        print("Installing poem shims for Poetry...")
+    result = api.init(add_to_path=parsed_args.add_to_path)
+    if not text:
+        return result, 0
+
+    shim_dir = result["shim_dir"]
+    print(f"Created shim at: {result['shim']}")
+    print("✓ Shim self-check passed")
+    windows = platform.system() == "Windows"
+    if result["added_to_path"]:
+        for location in result["added_to_path"]:
+            print(f"Added poem shim path to {location}")
+        print("Please restart your terminal to pick up the new PATH.")
+        return result, 0
+    if result["added_to_path"] is not None and windows:
+        print(f"{shim_dir} is already in your PATH")
+        return result, 0
+    if result["added_to_path"] is not None:
+        print("Could not automatically update your shell profile.")
+
+    print("\nTo complete installation manually:")
+    print("1. Add the shim directory to your PATH")
+    if windows:
+        print(f"   In PowerShell: $env:PATH=\"{shim_dir};$env:PATH\"")
+        print(f"   In Command Prompt: SET PATH={shim_dir};%PATH%")
+    else:
+        print(f"   export PATH=\"{shim_dir}:$PATH\"")
+    print("2. Add this to your shell profile for permanent installation")
+    return result, 0
+
 
-    return 0
+_COMMANDS = {
+    "list": _list,
+    "ls-remote": _ls_remote,
+    "use": _use,
+    "current": _current,
+    "install": _install_command,
+    "uninstall": _uninstall,
+    "upgrade": _upgrade,
+    "global": _global,
+    "local": _local,
+    "which": _which,
+    "init": _init,
+    "doctor": _doctor,
+    "sync": _sync,
+    "bundle": _bundle,
+    "store": _store,
+    "plugins": _plugins,
+    "verify": _verify,
+    "stats": _stats,
+    "cache": _cache,
+    "exec": _exec,
+    "mirror": _mirror,
+    "hook": _hook,
+}
 
 
 if __name__ == "__main__":
@@ -1,437 +1,1174 @@
 """Core functionality for managing poetry versions."""
 
-import threading
-import itertools
-import http.client
+import html
 import logging
 import os
 import platform
 import subprocess
 import sys
 import json
+import re
+import signal
+import threading
+import warnings
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import datetime, timezone
 from pathlib import Path
-from time import time, sleep
-from typing import List, Optional, Tuple, Dict
+from time import monotonic, time, sleep
+from typing import Callable, List, Optional, Tuple, Dict
+
+from poem.cache import prune_if_due, touch
+from poem.errors import InstallError, RemoteError
+from poem.fetch import DEFAULT_CONCURRENCY, FetchEngine
+from poem.http import HTTP, HTTPClient, HTTPError
+from poem.lock import file_lock
+# Version resolution lives in poem.resolve so the shim can skip this
+# module; its names stay importable from here
+from poem.resolve import (
+    INSTALLING_MARKER,
+    LOCK_HEADER_BYTES,
+    LOCK_TRAILER_BYTES,
+    LOCK_VERSION_POETRY,
+    _VERSION_PATTERN,
+    _get_active_version,
+    _get_installed_versions,
+    _get_version_homes,
+    _lock_resolution_enabled,
+    _match_lock_version,
+    get_config_dir,
+    get_global_version_file,
+    get_installed_locations,
+    get_pinned_version,
+    get_poetry_bin,
+    get_poetry_home,
+    get_store_dir,
+    get_version_dir,
+    is_installed,
+    lock_compatible,
+    read_lock_metadata,
+    version_key,
+)
+from poem.settings import get_settings
+from poem.trace import span, traced
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INDEX_URL = "https://pypi.org/simple"
+INSTALLER_URL = "https://install.python-poetry.org"
+GITHUB_RELEASES_URL = "https://api.github.com/repos/python-poetry/poetry/releases"
+GITHUB_HEADERS = {
+    "User-Agent": "pvm-tool",
+    "Accept": "application/vnd.github.v3+json"
+}
+# Written into each version directory once an install has completed
+MANIFEST_FILE = "poem-manifest.json"
+# How long a version being removed is left to its own process before a
+# later removal sweeps it up
+REMOVING_GRACE_SECONDS = 3600
+# How long a cached release listing is served without asking the index again
+RELEASE_INDEX_MAX_AGE = 3600
+# The fields of each row of the compact release index, in order
+RELEASE_FIELDS = ("version", "requires_python", "prerelease", "uploaded")
+# How long the shim waits for another process installing the same version
+AUTO_INSTALL_TIMEOUT = 600
+# Defaults for POEM_INSTALL_TIMEOUT and POEM_INSTALL_STALL_TIMEOUT
+INSTALL_TIMEOUT = 1800
+INSTALL_STALL_TIMEOUT = 300
+# Lines of installer output included in error messages
+INSTALL_LOG_TAIL = 20
+# Steps printed by install.python-poetry.org, mapped to install phases
+INSTALLER_PHASES = {
+    "Creating environment": "venv",
+    "Installing Poetry": "dependencies",
+    "Creating script": "script",
+    "Done": "done",
+}
+_INSTALLER_STEP = re.compile(r"^Installing Poetry \([^)]*\): (.+?)\.*$")
+_ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+_REQUIRES_PYTHON_ATTR = re.compile(r'data-requires-python\s*=\s*"([^"]*)"')
+_SPECIFIER = re.compile(r"^(~=|===|==|!=|<=|>=|<|>)\s*(\d+(?:\.\d+)*)(\.\*)?")
+_DATE = re.compile(r"^\d{4}-\d{2}(-\d{2})?$")
+
+
+def _get_cache_dir() -> str:
+    """Get the poem cache directory (POEM_CACHE_DIR, or the XDG cache)."""
+    return get_settings().cache_dir
+
+
+def _get_index_url() -> str:
+    """Get the package index URL used to look up Poetry releases.
+
+    POEM_INDEX_URL takes precedence over the "index-url" file in the poem
+    configuration directory; both fall back to PyPI.
+    """
+    index_url = os.environ.get("POEM_INDEX_URL")
+    if not index_url:
+        index_url_file = os.path.join(get_config_dir(), "index-url")
+        if os.path.exists(index_url_file):
+            with open(index_url_file, "r") as f:
+                index_url = f.read().strip()
+    return (index_url or DEFAULT_INDEX_URL).rstrip("/")
 
-from poem.http import HTTP, HTTPClient
-from poem.spinner import Spinner
 
+def is_prerelease(version: str) -> bool:
+    """Check whether a version string is a pre- or development release."""
+    match = _VERSION_PATTERN.match(version.strip())
+    return bool(match and (match.group("pre") or match.group("dev") is not None))
 
-def _get_poetry_home() -> str:
-    """Get the poetry home directory."""
-    if platform.system() == "Windows":
-        return os.path.join(os.environ.get("APPDATA", ""), "pypoetry")
+
+def _version_from_filename(filename: str) -> Optional[str]:
+    """Extract the version from a Poetry wheel or sdist filename."""
+    if filename.endswith(".whl"):
+        parts = filename.split("-")
+        return parts[1] if len(parts) >= 5 else None
+    for extension in (".tar.gz", ".zip", ".tar.bz2"):
+        if filename.endswith(extension):
+            _, _, version = filename[:-len(extension)].rpartition("-")
+            return version or None
+    return None
+
+
+def _parse_release_index(body: bytes) -> List[Dict]:
+    """Parse a PEP 691 JSON or PEP 503 HTML project page into release records.
+
+    Each record holds the "version", its "requires_python" specifier,
+    whether it is a "prerelease", and when it was "uploaded" (the earliest
+    file's PEP 700 upload time, or None; HTML pages never carry it).
+    Versions whose files are all yanked are left out.
+
+    Returns:
+        Release records sorted from oldest to newest version.
+    """
+    text = body.decode("utf-8")
+    files = []
+    if text.lstrip().startswith("{"):
+        for entry in json.loads(text).get("files", []):
+            files.append((entry.get("filename", ""), bool(entry.get("yanked")),
+                          entry.get("requires-python"), entry.get("upload-time")))
     else:
-        return os.path.expanduser("~/.poetry")
+        for attrs, filename in re.findall(r"<a\b([^>]*)>([^<]+)</a>", text):
+            requires_python = _REQUIRES_PYTHON_ATTR.search(attrs)
+            files.append((filename.strip(), "data-yanked" in attrs,
+                          html.unescape(requires_python.group(1)) if requires_python else None,
+                          None))
+
+    releases: Dict[str, Dict] = {}
+    for filename, yanked, requires_python, uploaded in files:
+        version = _version_from_filename(filename)
+        if not version or yanked:
+            continue
+        release = releases.setdefault(version, {
+            "version": version,
+            "requires_python": None,
+            "prerelease": is_prerelease(version),
+            "uploaded": None,
+        })
+        if requires_python and not release["requires_python"]:
+            release["requires_python"] = requires_python
+        if uploaded and (release["uploaded"] is None or uploaded < release["uploaded"]):
+            release["uploaded"] = uploaded
+    return sorted(releases.values(), key=lambda release: version_key(release["version"]))
+
+
+class _ReleaseIndex(list):
+    """Release records sorted from oldest to newest, with their sort keys.
+
+    The keys are built once when the index is loaded, so every lookup and
+    --since filter can bisect without parsing each version again.
+    """
 
+    def __init__(self, releases: List[Dict]):
+        super().__init__(releases)
+        self.keys = [version_key(release["version"]) for release in self]
 
-def _run_command(command: List[str]) -> str:
-    """Run a command and return its output."""
+
+def _release_keys(releases: List[Dict]) -> List[tuple]:
+    """Get the sort keys of a release index, reusing those built at load time."""
+    if isinstance(releases, _ReleaseIndex):
+        return releases.keys
+    return [version_key(release["version"]) for release in releases]
+
+
+def _parse_simple_index(body: bytes) -> List[str]:
+    """Parse a PEP 691 JSON or PEP 503 HTML project page into versions.
+
+    Versions whose files are all yanked are left out.
+    """
+    return [release["version"] for release in _parse_release_index(body)]
+
+
+def load_release_index() -> List[Dict]:
+    """Load the Poetry release index, rebuilding it when the project page changes.
+
+    The project page is requested as PEP 691 JSON, with HTML as a fallback
+    for indexes that do not support it, and cached. The index built from
+    it is stored next to it as compact, version-sorted rows of
+    RELEASE_FIELDS; while the page is fresh only those rows are read,
+    skipping the parse of the full page.
+
+    Returns:
+        Release records sorted from oldest to newest; see _parse_release_index.
+    """
+    url = f"{_get_index_url()}/poetry/"
+    cache_file = HTTP.cache_path(
+        os.path.join(_get_cache_dir(), "index"), url)
+    index_file = f"{cache_file}.releases.json"
+    try:
+        page_mtime = os.path.getmtime(cache_file)
+        if (time() - page_mtime < RELEASE_INDEX_MAX_AGE
+                and os.path.getmtime(index_file) >= page_mtime):
+            with span("read release index", "fs", path=index_file), \
+                    open(index_file, "r") as f:
+                rows = json.load(f)
+            touch(index_file)
+            return _ReleaseIndex([dict(zip(RELEASE_FIELDS, row)) for row in rows])
+    except (OSError, ValueError):
+        pass
+
+    body = HTTP.get_cached(
+        url,
+        cache_file,
+        max_age=RELEASE_INDEX_MAX_AGE,
+        headers={
+            "User-Agent": "pvm-tool",
+            "Accept": "application/vnd.pypi.simple.v1+json, text/html;q=0.1",
+        },
+    )
+    releases = _ReleaseIndex(_parse_release_index(body))
+    tmp_file = f"{index_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, "w") as f:
+            json.dump([[release[field] for field in RELEASE_FIELDS] for release in releases],
+                      f, separators=(",", ":"))
+        os.replace(tmp_file, index_file)
+    except OSError:
+        # The index is only a shortcut; the page is parsed again next time
+        Path(tmp_file).unlink(missing_ok=True)
+    return releases
+
+
+def fetch_pypi_versions() -> List[str]:
+    """Fetch the released Poetry versions from the package index.
+
+    Returns:
+        Version strings sorted from oldest to newest.
+    """
+    return [release["version"] for release in load_release_index()]
+
+
+def _release_tuple(version: str) -> Tuple[int, ...]:
+    """Get the numeric release segment of a version, e.g. (3, 11) for "3.11"."""
+    match = re.match(r"\d+(?:\.\d+)*", version.strip())
+    return tuple(int(part) for part in match.group(0).split(".")) if match else ()
+
+
+def _python_satisfies(requires_python: Optional[str], python_version: str) -> bool:
+    """Check a Python version against a requires-python specifier set.
+
+    Supports the PEP 440 operators on release segments, including ==X.*
+    and !=X.* wildcards. Clauses that cannot be parsed are ignored, so a
+    quirk of the index never blocks an install.
+
+    Args:
+        requires_python: A specifier set such as ">=3.8,<4.0", or None
+        python_version: The Python version to check, e.g. "3.11"
+    """
+    if not requires_python:
+        return True
+    python = _release_tuple(python_version)
+    for clause in requires_python.split(","):
+        match = _SPECIFIER.match(clause.strip())
+        if not match:
+            continue
+        operator, spec, wildcard = match.groups()
+        target = _release_tuple(spec)
+        if wildcard:
+            padded = (python + (0,) * len(target))[:len(target)]
+            if (padded == target) != (operator == "=="):
+                return False
+            continue
+
+        width = max(len(python), len(target))
+        left = python + (0,) * (width - len(python))
+        right = target + (0,) * (width - len(target))
+        satisfied = {
+            ">=": left >= right,
+            ">": left > right,
+            "<=": left <= right,
+            "<": left < right,
+            "==": left == right,
+            "===": left == right,
+            "!=": left != right,
+            "~=": left >= right and python[:len(target) - 1] == target[:-1],
+        }[operator]
+        if not satisfied:
+            return False
+    return True
+
+
+def _find_release(releases: List[Dict], version: str) -> Optional[Dict]:
+    """Look up a version in a sorted release index by binary search."""
+    keys = _release_keys(releases)
+    key = version_key(version)
+    position = bisect_left(keys, key)
+    if position < len(keys) and keys[position] == key:
+        return releases[position]
+    return None
+
+
+def query_releases(releases: List[Dict], latest: bool = False, since: Optional[str] = None,
+                   stable: bool = False, python: Optional[str] = None) -> List[Dict]:
+    """Filter a sorted release index.
+
+    Args:
+        releases: Release records sorted from oldest to newest version
+        latest: If True, keep only the newest matching release
+        since: A date (YYYY-MM-DD or YYYY-MM) to keep releases uploaded on
+            or after it, or a version to keep releases newer than it
+        stable: If True, leave out pre- and development releases
+        python: A Python version (e.g. "3.11") the releases must support
+
+    Returns:
+        The matching release records, oldest first.
+
+    Raises:
+        ValueError: If since is neither a date nor a version, or is a date
+            but the index has no upload times (PEP 503 HTML pages).
+    """
+    if since and _DATE.match(since):
+        if releases and not any(release["uploaded"] for release in releases):
+            raise ValueError("The package index does not publish upload times, so "
+                             "--since cannot filter by date; pass a version instead")
+        releases = [release for release in releases
+                    if release["uploaded"] and release["uploaded"] >= since]
+    elif since:
+        if not _VERSION_PATTERN.match(since):
+            raise ValueError(f"--since expects a date (YYYY-MM-DD) or a version, got {since!r}")
+        releases = releases[bisect_right(_release_keys(releases), version_key(since)):]
+    if stable:
+        releases = [release for release in releases if not release["prerelease"]]
+    if python:
+        releases = [release for release in releases
+                    if _python_satisfies(release["requires_python"], python)]
+    if latest:
+        releases = releases[-1:]
+    return releases
+
+
+def _incompatible_versions(versions: List[str]) -> Dict[str, str]:
+    """Find the versions that cannot run on this Python, before downloading anything.
+
+    The installer builds each version's venv with the running interpreter,
+    so a release whose requires-python excludes it would only fail late.
+    If the release index cannot be loaded, nothing is rejected.
+
+    Returns:
+        A mapping of each rejected version to the reason.
+    """
     try:
+        releases = load_release_index()
+    except (OSError, HTTPError, ValueError) as e:
+        logger.debug(f"Release index unavailable, skipping compatibility check: {e}")
+        return {}
+
+    python = platform.python_version()
+    rejected = {}
+    for version in versions:
+        release = _find_release(releases, version)
+        if release and not _python_satisfies(release["requires_python"], python):
+            rejected[version] = (f"poetry {version} requires Python "
+                                 f"{release['requires_python']}, but poem runs on Python {python}")
+    return rejected
+
+
+def _run_command(command: List[str]) -> str:
+    """Run a command and return its output.
+
+    Raises:
+        subprocess.CalledProcessError: If the command fails.
+        FileNotFoundError: If the command does not exist.
+    """
+    with span(f"run {command[0]}", "subprocess", command=" ".join(command)):
         result = subprocess.run(
             command,
             check=True,
             capture_output=True,
             text=True,
         )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        print(f"Error: {e.stderr.strip()}", file=sys.stderr)
-        sys.exit(1)
+    return result.stdout.strip()
 
 
-def list_versions(installed_only: bool = False) -> None:
-    """List available poetry versions.
+def get_system_version() -> Optional[str]:
+    """Get the version of the poetry found on PATH, if any."""
+    try:
+        output = _run_command(["poetry", "--version"])
+    except (subprocess.SubprocessError, OSError):
+        return None
+    # Format: "Poetry version X.Y.Z" or "Poetry (version X.Y.Z)"
+    parts = output.rstrip(")").split()
+    return parts[-1] if parts else None
+
+
+def get_current_version() -> Optional[str]:
+    """Get the version of the poetry found on PATH, or None if there is none."""
+    return get_system_version()
+
+
+def _download_installer() -> str:
+    """Download the Poetry installer script into the poem cache.
+
+    A copy younger than RELEASE_INDEX_MAX_AGE is reused, so repeated
+    installs do not download it again.
+
+    Returns:
+        The path of the cached installer.
+    """
+    cache_file = HTTP.cache_path(
+        os.path.join(_get_cache_dir(), "downloads"), INSTALLER_URL)
+    HTTP.get_cached(
+        INSTALLER_URL,
+        cache_file,
+        max_age=RELEASE_INDEX_MAX_AGE,
+        headers={
+            "User-Agent": "pvm-tool",
+        },
+    )
+    return cache_file
+
+
+def _get_venv_python(version: str, home: Optional[str] = None) -> str:
+    """Get the interpreter of the virtual environment Poetry runs in."""
+    return _get_venv_python_at(get_version_dir(version, home))
+
+
+def _get_venv_python_at(version_dir: str) -> str:
+    """Get the interpreter of the virtual environment in a version directory."""
+    venv_dir = os.path.join(version_dir, "venv")
+    if platform.system() == "Windows":
+        return os.path.join(venv_dir, "Scripts", "python.exe")
+    else:
+        return os.path.join(venv_dir, "bin", "python")
+
+
+def read_manifest(version: str, home: Optional[str] = None) -> Dict:
+    """Read the install manifest of a version, or {} if there is none."""
+    return _read_manifest_at(get_version_dir(version, home))
+
+
+def _read_manifest_at(version_dir: str) -> Dict:
+    """Read the install manifest in a version directory, or {} if there is none."""
+    manifest_file = os.path.join(version_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_file, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(version: str, manifest: Dict, home: Optional[str] = None) -> None:
+    """Atomically replace the install manifest of a version."""
+    _write_manifest_at(get_version_dir(version, home), manifest)
+
+
+def _write_manifest_at(version_dir: str, manifest: Dict) -> None:
+    """Atomically replace the install manifest in a version directory."""
+    manifest_file = os.path.join(version_dir, MANIFEST_FILE)
+    tmp_file = f"{manifest_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, manifest_file)
+
+
+def _precompile_version(version: str, home: Optional[str] = None) -> Dict:
+    """Compile every module in a version's virtual environment to bytecode.
+
+    compileall runs under the venv's own interpreter, so the bytecode matches
+    the Python that Poetry runs with, and uses one worker per CPU.
+
+    Returns:
+        The bytecode entry recorded in the install manifest.
+    """
+    python = _get_venv_python(version, home)
+    venv_dir = os.path.dirname(os.path.dirname(python))
+
+    start = time()
+    with span("compile bytecode", "subprocess", version=version):
+        result = subprocess.run(
+            [python, "-m", "compileall", "-q", "-j", "0", venv_dir],
+            capture_output=True,
+            text=True,
+        )
+    return {
+        "compiled_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "duration": round(time() - start, 3),
+        "workers": os.cpu_count() or 1,
+        # compileall exits non-zero if any module failed to compile
+        "complete": result.returncode == 0,
+    }
+
+
+def _finalize_install(version: str, compile_bytecode: bool = True,
+                      home: Optional[str] = None,
+                      timings: Optional[Dict[str, float]] = None) -> Dict:
+    """Record a finished install in its manifest, precompiling it first.
+
+    A failure to precompile only costs first-run latency, so it is reported
+    as a warning rather than failing the install.
 
     Args:
-        installed_only: If True, only list installed versions
+        version: The installed version
+        compile_bytecode: If True, precompile the venv
+        home: The home the version was installed into
+        timings: The seconds spent in each install phase so far; the
+            bytecode compilation is added as "compile"
+
+    Returns:
+        The manifest that was written.
     """
-    if installed_only:
-        poetry_home = _get_poetry_home()
-        version_dir = os.path.join(poetry_home, "venv")
+    manifest = read_manifest(version, home)
+    manifest.update({
+        "version": version,
+        "installed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+    })
+
+    if compile_bytecode:
+        try:
+            manifest["bytecode"] = _precompile_version(version, home)
+        except OSError as e:
+            print(f"Warning: could not precompile poetry {version}: {str(e)}",
+                  file=sys.stderr)
+        else:
+            if not manifest["bytecode"]["complete"]:
+                print(f"Warning: some modules of poetry {version} could not be precompiled",
+                      file=sys.stderr)
+            if timings is not None:
+                timings = dict(timings, compile=manifest["bytecode"]["duration"])
 
-        if not os.path.exists(version_dir):
-            print("No poetry versions are installed.")
-            return
+    if timings is not None:
+        manifest["timings"] = timings
+    _write_manifest(version, manifest, home)
+    Path(get_version_dir(version, home), INSTALLING_MARKER).unlink(missing_ok=True)
+    return manifest
 
-        versions = [d for d in os.listdir(
-            version_dir) if os.path.isdir(os.path.join(version_dir, d))]
-        if not versions:
-            print("No poetry versions are installed.")
-            return
 
-        print("Installed poetry versions:")
-        for version in sorted(versions):
-            print(f"- {version}")
-    else:
-        # For available versions, we could query PyPI
-        print("Fetching available versions from PyPI...")
-        output = _run_command(["pip", "index", "versions", "poetry"])
-
-        # Parse and display versions
-        lines = output.split("\n")
-        for line in lines:
-            if "Available versions:" in line:
-                versions = line.split("Available versions:")[1].strip()
-                print(f"Available poetry versions: {versions}")
-                return
+def _relocate_version_dir(version_dir: str, old_prefix: str, new_prefix: str) -> int:
+    """Rewrite absolute paths after a version directory was moved.
+
+    Script shebangs, activate scripts and pyvenv.cfg embed the directory
+    they were installed to, and the installer links bin/poetry with an
+    absolute symlink. Files are rewritten through a temporary file and a
+    rename, so hardlinked copies sharing the old inode are left untouched.
 
-        print("Could not retrieve available versions. Check your internet connection.")
+    Returns:
+        The number of files and links that were updated.
+    """
+    if old_prefix == new_prefix:
+        return 0
+
+    scripts = "Scripts" if platform.system() == "Windows" else "bin"
+    candidates = [os.path.join(version_dir, "venv", "pyvenv.cfg")]
+    for directory in (os.path.join(version_dir, "bin"),
+                      os.path.join(version_dir, "venv", scripts)):
+        if os.path.isdir(directory):
+            candidates.extend(os.path.join(directory, name)
+                              for name in os.listdir(directory))
+
+    old_bytes = old_prefix.encode("utf-8")
+    new_bytes = new_prefix.encode("utf-8")
+    updated = 0
+    for path in candidates:
+        if os.path.islink(path):
+            target = os.readlink(path)
+            if target.startswith(old_prefix):
+                os.unlink(path)
+                os.symlink(new_prefix + target[len(old_prefix):], path)
+                updated += 1
+            continue
+        if not os.path.isfile(path) or os.path.getsize(path) > 1024 * 1024:
+            continue
+
+        with open(path, "rb") as f:
+            content = f.read()
+        # Only text files; compiled launchers are left alone
+        if b"\0" in content[:1024] or old_bytes not in content:
+            continue
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content.replace(old_bytes, new_bytes))
+        os.chmod(tmp_path, os.stat(path).st_mode)
+        os.replace(tmp_path, path)
+        updated += 1
+    return updated
+
+
+def _get_install_timeouts() -> Tuple[Optional[float], Optional[float]]:
+    """Get the overall and stall timeouts of an installer run.
+
+    POEM_INSTALL_TIMEOUT and POEM_INSTALL_STALL_TIMEOUT override the
+    defaults; 0 disables a timeout.
 
+    Returns:
+        The overall and stall timeouts in seconds, None when disabled
+    """
+    timeouts = []
+    for name, default in (("POEM_INSTALL_TIMEOUT", INSTALL_TIMEOUT),
+                          ("POEM_INSTALL_STALL_TIMEOUT", INSTALL_STALL_TIMEOUT)):
+        try:
+            value = float(os.environ.get(name, default))
+        except ValueError:
+            value = default
+        timeouts.append(value if value > 0 else None)
+    return timeouts[0], timeouts[1]
+
+
+def _get_install_log(version: str) -> str:
+    """Get the log file of the latest install of a version."""
+    # Kept out of the cache, whose pruning would evict it
+    return os.path.join(get_settings().log_dir, f"install-{version}.log")
+
+
+def _installer_phase(line: str) -> Optional[str]:
+    """Get the install phase an installer output line starts, if any."""
+    if line.startswith("Retrieving Poetry metadata"):
+        return "metadata"
+    match = _INSTALLER_STEP.search(line)
+    if match:
+        return INSTALLER_PHASES.get(match.group(1))
+    return None
+
+
+def _phase_durations(phases: List[Tuple[str, float]], total: float) -> Dict[str, float]:
+    """Turn the offsets at which phases started into durations, in order.
+
+    Time before the first recognized line is reported as "startup"; if the
+    installer output could not be parsed at all, everything is "installer".
+    """
+    if not phases:
+        return {"installer": round(total, 3)}
+    durations = {"startup": round(phases[0][1], 3)}
+    for (name, begin), (_, end) in zip(phases, phases[1:] + [("", total)]):
+        if name != "done":
+            durations[name] = round(durations.get(name, 0.0) + end - begin, 3)
+    return durations
 
-def get_current_version() -> Optional[str]:
-    """Get the current poetry version."""
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """Format an install timing breakdown for display."""
+    parts = [f"{name} {seconds:.1f}s" for name, seconds in timings.items()]
+    return f"{', '.join(parts)} (total {sum(timings.values()):.1f}s)"
+
+
+def _kill_process_tree(process: "subprocess.Popen") -> None:
+    """Kill a process and, on POSIX, the pip processes it started."""
     try:
-        output = _run_command(["poetry", "--version"])
-        version = output.split()[2]  # Format: "Poetry version X.Y.Z"
-        print(f"Current poetry version: {version}")
-        return version
-    except (subprocess.SubprocessError, FileNotFoundError):
-        print("Poetry is not installed or not in PATH", file=sys.stderr)
-        return None
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except OSError:
+        pass
 
 
-def install_version(version: str) -> None:
-    """Install a specific poetry version.
+def _run_installer(version: str, installer_path: str,
+                   home: Optional[str] = None) -> Dict[str, float]:
+    """Run the Poetry installer for a version into its own POETRY_HOME.
+
+    The installer output is written, timestamped, to a per-version log in
+    the poem home (see _get_install_log) and parsed into phases. The run
+    is killed if it exceeds the overall timeout or prints nothing for the
+    stall timeout (see _get_install_timeouts).
 
     Args:
-        version: The version to install (e.g., "1.1.0")
+        version: The version to install
+        installer_path: The downloaded installer script
+        home: The home to install into (default: the user's poetry home)
+
+    Returns:
+        The seconds spent in each installer phase, in order.
+
+    Raises:
+        subprocess.CalledProcessError: If the installer fails; its stderr
+            holds the end of the log.
+        RuntimeError: If the installer times out or stalls.
     """
-    print(f"Installing poetry version {version}...")
+    # Set the version environment variable for the installer
+    env = os.environ.copy()
+    env["POETRY_VERSION"] = version
+
+    # Set POETRY_HOME to our version-specific directory
+    env["POETRY_HOME"] = get_version_dir(version, home or get_poetry_home())
+
+    # Marks the version as incomplete until _finalize_install has run
+    os.makedirs(env["POETRY_HOME"], exist_ok=True)
+    Path(env["POETRY_HOME"], INSTALLING_MARKER).touch()
+
+    log_file = _get_install_log(version)
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    timeout, stall_timeout = _get_install_timeouts()
+    command = [sys.executable, installer_path]
+    phases: List[Tuple[str, float]] = []
+    tail: deque = deque(maxlen=INSTALL_LOG_TAIL)
+    started = monotonic()
+    last_output = [started]
+
+    with span("run installer", "subprocess", version=version), \
+            open(log_file, "w") as log:
+        process = subprocess.Popen(
+            command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            text=True, errors="replace",
+            # Its own process group, so a timeout also stops pip
+            start_new_session=os.name == "posix",
+        )
+
+        def pump() -> None:
+            for raw_line in process.stdout:
+                now = monotonic()
+                last_output[0] = now
+                line = _ANSI_ESCAPE.sub("", raw_line).rstrip()
+                log.write(f"[{now - started:8.2f}s] {line}\n")
+                log.flush()
+                tail.append(line)
+                phase = _installer_phase(line)
+                if phase and (not phases or phases[-1][0] != phase):
+                    phases.append((phase, now - started))
+
+        reader = threading.Thread(target=pump, daemon=True)
+        reader.start()
+        failure = None
+        while failure is None:
+            try:
+                process.wait(timeout=0.2)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            now = monotonic()
+            if timeout and now - started > timeout:
+                failure = f"timed out after {timeout:g}s"
+            elif stall_timeout and now - last_output[0] > stall_timeout:
+                failure = f"printed nothing for {stall_timeout:g}s"
+        if failure:
+            _kill_process_tree(process)
+            process.wait()
+        reader.join(timeout=5)
+        # A reader still blocked on a pipe held open by a stray child keeps it
+        if not reader.is_alive():
+            process.stdout.close()
+        total = monotonic() - started
+        if failure:
+            log.write(f"[{total:8.2f}s] poem: installer {failure}, killed\n")
+
+    phase = phases[-1][0] if phases else "startup"
+    output = "\n".join(tail)
+    if failure:
+        raise RuntimeError(f"Installer {failure} during {phase} (log: {log_file})\n{output}")
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(
+            process.returncode, command, output=output,
+            stderr=f"{output}\nFailed during {phase}; full log: {log_file}")
+    return _phase_durations(phases, total)
+
+
+@traced("install")
+def install_versions(versions: List[str], jobs: int = DEFAULT_CONCURRENCY,
+                     compile_bytecode: bool = True, force: bool = False,
+                     home: Optional[str] = None) -> List[str]:
+    """Install Poetry versions concurrently.
+
+    The installer script is downloaded once and shared by every install.
+
+    Args:
+        versions: The versions to install (e.g., ["1.7.1", "1.8.3"])
+        jobs: The maximum number of installs running at the same time
+        compile_bytecode: If True, precompile each new venv after installing
+        force: If True, reinstall versions that are already installed
+        home: The home to install into (default: the user's poetry home)
+
+    Returns:
+        The versions that were installed; versions already present are
+        skipped unless force is set.
+
+    Raises:
+        InstallError: If any version fails to install.
+        RemoteError: If the installer cannot be downloaded.
+    """
+    home = home or get_poetry_home()
+    pending = [version for version in dict.fromkeys(versions)
+               if force or not is_installed(version, home=home)]
+    if not pending:
+        return []
 
     try:
-        import tempfile
-        from pathlib import Path
-
-        # Download the installer script
-        installer_url = "https://install.python-poetry.org"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".py") as temp_file:
-            response = HTTP.get(
-                installer_url, headers={
-                    "User-Agent": "pvm-tool",
-                })
-            temp_file.write(response)
-            installer_path = temp_file.name
-
-        # Set the version environment variable for the installer
-        env = os.environ.copy()
-        env["POETRY_VERSION"] = version
-
-        # Set POETRY_HOME to our version-specific directory
-        poetry_home = _get_poetry_home()
-        version_specific_home = os.path.join(poetry_home, "venv", version)
-        env["POETRY_HOME"] = version_specific_home
-
-        # Run the installer
-        with Spinner() as _:
-            result = subprocess.run(
-                [sys.executable, installer_path],
-                env=env,
-                check=True,
-                text=True,
-            )
-
-        print(f"Successfully installed poetry {version}")
-
-        # Clean up the temporary file
-        Path(installer_path).unlink(missing_ok=True)
-
-    except Exception as e:
-        print(f"Failed to install poetry {version}: {str(e)}", file=sys.stderr)
-        sys.exit(1)
-
-
-def _get_config_dir() -> str:
-    """Get the poem configuration directory."""
-    if platform.system() == "Windows":
-        config_dir = os.path.join(os.environ.get("APPDATA", ""), "poem")
-    else:
-        config_dir = os.path.expanduser("~/.config/poem")
+        errors = _install_many(pending, jobs=jobs,
+                               compile_bytecode=compile_bytecode, home=home)
+    except (OSError, HTTPError) as e:
+        raise RemoteError(f"Failed to download the poetry installer: {str(e)}") from e
 
-    os.makedirs(config_dir, exist_ok=True)
-    return config_dir
+    done = [version for version, error in errors.items() if error is None]
+    failures = {version: error for version, error in errors.items() if error}
+    if failures:
+        raise InstallError(failures, done)
+    return done
 
 
-def _get_global_version_file() -> str:
-    """Get the global version file path."""
-    return os.path.join(_get_config_dir(), "global-version")
+def _install_lock(version: str, home: Optional[str] = None,
+                  timeout: float = AUTO_INSTALL_TIMEOUT,
+                  on_wait: Optional[Callable[[float, Optional[int]], None]] = None):
+    """Get the lock serialising every install of a version into a home.
 
+    The lock file is removed on release, so none are left in the home.
+    """
+    lock_file = os.path.join(home or get_poetry_home(), "venv", f".{version}.lock")
+    return file_lock(lock_file, timeout, on_wait=on_wait, remove=True)
 
-def _get_poetry_bin(version: str) -> str:
-    """Get the path to the Poetry binary for a specific version."""
-    poetry_home = _get_poetry_home()
-    if platform.system() == "Windows":
-        return os.path.join(poetry_home, "venv", version, "Scripts", "poetry.exe")
-    else:
-        return os.path.join(poetry_home, "venv", version, "bin", "poetry")
 
+def _install_many(versions: List[str], jobs: int = DEFAULT_CONCURRENCY,
+                  compile_bytecode: bool = True, home: Optional[str] = None,
+                  timeout: float = AUTO_INSTALL_TIMEOUT,
+                  on_wait: Optional[Callable[[str, float, Optional[int]], None]] = None,
+                  on_start: Optional[Callable[[str], None]] = None
+                  ) -> Dict[str, Optional[str]]:
+    """Install versions concurrently, sharing one installer download.
 
-def _get_active_version() -> Tuple[str, str]:
-    """Get the active Poetry version and its source.
+    Versions that cannot run on this Python are rejected up front; if none
+    are left, the installer is not downloaded at all. Each install holds
+    the version's install lock, and a version that another process
+    installed while this one waited for the lock is not installed again.
+
+    Args:
+        versions: The versions to install
+        jobs: The maximum number of installs running at the same time
+        compile_bytecode: If True, precompile each new venv
+        home: The home to install into (default: the user's poetry home)
+        timeout: Seconds to wait for another process's install of a version
+        on_wait: Called with the version, the seconds waited so far and the
+            holder's pid while another process holds a version's lock
+        on_start: Called with the version when its install really starts
 
     Returns:
-        A tuple containing the version and source ("local", "global", or "default")
-    """
-    # Check for local .poetry-version file
-    if os.path.exists(".poetry-version"):
-        with open(".poetry-version", "r") as f:
-            version = f.read().strip()
-            return version, "local"
-
-    # Check for global version
-    global_version_file = _get_global_version_file()
-    if os.path.exists(global_version_file):
-        with open(global_version_file, "r") as f:
-            version = f.read().strip()
-            return version, "global"
-
-    # Return the default system version
+        A mapping of each version to None if it installed, or to a
+        description of the failure.
+
+    Raises:
+        Exception: If the installer script cannot be downloaded.
+    """
+    errors: Dict[str, Optional[str]] = dict(_incompatible_versions(versions))
+    versions = [version for version in versions if version not in errors]
+    if not versions:
+        return errors
+
+    started = monotonic()
+    with span("download installer", "http"):
+        installer_path = _download_installer()
+    download = round(monotonic() - started, 3)
+
+    target = home or get_poetry_home()
+
+    def install(version: str) -> None:
+        was_installed = is_installed(version, home=target)
+        wait = (lambda waited, holder: on_wait(version, waited, holder)) if on_wait else None
+        with _install_lock(version, home=target, timeout=timeout, on_wait=wait):
+            if not was_installed and is_installed(version, home=target):
+                return
+            if on_start:
+                on_start(version)
+            timings = {"download": download}
+            timings.update(_run_installer(version, installer_path, home=home))
+            _finalize_install(version, compile_bytecode=compile_bytecode,
+                              home=target, timings=timings)
+
     try:
-        version = get_current_version()
-        if version:
-            return version, "default"
+        engine = FetchEngine(concurrency=jobs)
+        results = engine.map(install, versions, return_exceptions=True)
+    finally:
+        prune_if_due()
+
+    for version, result in zip(versions, results):
+        if isinstance(result, Exception):
+            detail = str(result)
+            stderr = getattr(result, "stderr", None)
+            if stderr:
+                detail = f"{detail}\n{stderr.strip()}"
+            errors[version] = detail
         else:
-            return "unknown", "unknown"
-    except:
-        return "unknown", "unknown"
+            errors[version] = None
+    return errors
 
 
-def switch_version(version: str) -> None:
-    """Switch to a specific poetry version.
+def _ensure_installed(version: str, timeout: float = AUTO_INSTALL_TIMEOUT) -> None:
+    """Install a version unless it is present, at most once across processes.
+
+    Callers racing to install the same version are serialised on its
+    install lock: the first one installs while the others wait, then find
+    the version installed and return. Progress is reported on stderr, keeping
+    stdout free for the command that needed the version.
 
     Args:
-        version: The version to switch to (e.g., "1.1.0")
+        version: The version to make available
+        timeout: Seconds to wait for another process's install to finish
+
+    Raises:
+        RuntimeError: If the install fails, or another install is still
+            running after timeout seconds.
     """
-    print(f"Switching to poetry version {version}...")
+    if is_installed(version):
+        return
 
-    # Check if the version is installed
-    poetry_home = _get_poetry_home()
-    version_dir = os.path.join(poetry_home, "venv", version)
+    def report_wait(version: str, waited: float, holder: Optional[int]) -> None:
+        by = f" (pid {holder})" if holder else ""
+        print(f"poem: waiting for another process{by} to install poetry {version}, "
+              f"{waited:.0f}s of at most {timeout:g}s", file=sys.stderr)
 
-    if not os.path.exists(version_dir):
-        print(f"Poetry version {version} is not installed. Installing now...")
-        install_version(version)
+    started = []
 
-    # Create a temporary script that modifies the current shell session
-    if platform.system() == "Windows":
-        # For Windows, we can export instructions
-        print(f"To use poetry version {version} in your current shell, run:")
-        poetry_path = os.path.dirname(_get_poetry_bin(version))
-        print(f"    $env:PATH=\"{poetry_path};$env:PATH\"  # PowerShell")
-        print(f"    SET PATH={poetry_path};%PATH%  # Command Prompt")
-    else:
-        # For Unix systems
-        print(f"To use poetry version {version} in your current shell, run:")
-        poetry_path = os.path.dirname(_get_poetry_bin(version))
-        print(f"    export PATH=\"{poetry_path}:$PATH\"")
+    def report_start(version: str) -> None:
+        started.append(time())
+        print(f"poem: installing poetry {version}...", file=sys.stderr)
 
-    print(f"\nPoetry version {version} is ready to use.")
+    # Whoever held the version's lock before us may have installed it already
+    error = _install_many([version], jobs=1, timeout=timeout,
+                          on_wait=report_wait, on_start=report_start)[version]
+    if error:
+        raise RuntimeError(f"Failed to install poetry {version}: {error}")
+    if started:
+        print(f"poem: installed poetry {version} in {time() - started[0]:.0f}s",
+              file=sys.stderr)
 
 
-def set_global_version(version: str) -> None:
-    """Set the global default Poetry version.
+def write_version_file(version_file: str, version: str) -> None:
+    """Replace a version file atomically, so a concurrent shim never reads it half-written."""
+    tmp_file = f"{version_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        f.write(version)
+    os.replace(tmp_file, version_file)
 
-    Args:
-        version: The version to set as global default
+
+def _sweep_removing_dirs(parent: str) -> None:
+    """Finish removals that failed or were interrupted part way.
+
+    Only directories renamed away more than REMOVING_GRACE_SECONDS ago are
+    swept, so a removal still running in another process is left alone.
     """
-    # Check if the version is installed
-    poetry_home = _get_poetry_home()
-    version_dir = os.path.join(poetry_home, "venv", version)
+    import shutil
 
-    if not os.path.exists(version_dir):
-        print(f"Poetry version {version} is not installed. Installing now...")
-        install_version(version)
+    now = time()
+    try:
+        entries = os.listdir(parent)
+    except OSError:
+        return
+    for entry in entries:
+        if not (entry.startswith(".") and ".removing-" in entry):
+            continue
+        path = os.path.join(parent, entry)
+        try:
+            if now - os.path.getmtime(path) < REMOVING_GRACE_SECONDS:
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def remove_version_dir(version_dir: str) -> None:
+    """Remove an installed version all at once.
+
+    The directory is first renamed to a hidden name, which takes the version
+    out of every listing in one step; a shim resolving at the same time
+    finds either the complete version or none at all, never one that is
+    half deleted. Hidden directories left by earlier removals that failed
+    are swept first (see _sweep_removing_dirs).
+
+    Raises:
+        OSError: If the directory cannot be renamed or removed.
+    """
+    import shutil
 
-    # Set the global version
-    with open(_get_global_version_file(), "w") as f:
-        f.write(version)
+    parent, name = os.path.split(version_dir.rstrip(os.sep))
+    _sweep_removing_dirs(parent)
+    trash_dir = os.path.join(parent, f".{name}.removing-{os.getpid()}")
+    os.rename(version_dir, trash_dir)
+    # Dates the rename, which the sweep of a later removal goes by
+    os.utime(trash_dir)
+    shutil.rmtree(trash_dir)
+
+
+def check_endpoints() -> List[Tuple[str, float, Optional[str]]]:
+    """Probe the remote endpoints poem depends on concurrently.
+
+    Returns:
+        A list of (name, elapsed seconds, error message or None) tuples.
+    """
+    endpoints = [
+        ("GitHub releases API", f"{GITHUB_RELEASES_URL}?per_page=1",
+         GITHUB_HEADERS),
+        ("Package index", f"{_get_index_url()}/poetry/",
+         {"User-Agent": "pvm-tool"}),
+        ("Poetry installer", INSTALLER_URL, {"User-Agent": "pvm-tool"}),
+    ]
+
+    def probe(endpoint: Tuple[str, str, dict]) -> Tuple[str, float, Optional[str]]:
+        name, url, headers = endpoint
+        start = time()
+        try:
+            HTTP.get(url, headers=headers, timeout=10)
+        except Exception as e:
+            return name, time() - start, str(e) or type(e).__name__
+        return name, time() - start, None
+
+    return FetchEngine(concurrency=len(endpoints)).map(probe, endpoints)
+
+
+# The functions below were poem's interface before poem.api. They print what
+# the matching command prints and are kept so existing callers keep working;
+# each one warns and runs through poem.api, raising its PoemError on failure.
+
+def _deprecated(name: str, replacement: str) -> None:
+    warnings.warn(f"poem.core.{name} is deprecated; use {replacement}",
+                  DeprecationWarning, stacklevel=3)
+
+
+def list_versions(installed_only: bool = False) -> None:
+    """Print the installed, or all released, Poetry versions.
+
+    Deprecated: use poem.api.installed or poem.api.remote_versions.
+    """
+    from poem import api
+
+    if not installed_only:
+        _deprecated("list_versions", "poem.api.remote_versions")
+        print(f"Available poetry versions: {', '.join(api.remote_versions())}")
+        return
 
+    _deprecated("list_versions", "poem.api.installed")
+    versions = api.installed()
+    if not versions:
+        print("No poetry versions are installed.")
+        return
+    print("Installed poetry versions:")
+    for entry in versions:
+        print(f"- {entry['version']}")
+
+
+def install_version(version: str) -> None:
+    """Install a Poetry version.
+
+    Deprecated: use poem.api.install.
+    """
+    from poem import api
+
+    _deprecated("install_version", "poem.api.install")
+    print(f"Installing poetry version {version}...")
+    api.install([version])
+    print(f"Successfully installed poetry {version}")
+
+
+def switch_version(version: str) -> None:
+    """Install a Poetry version if needed and print how to put it on PATH.
+
+    Deprecated: use poem.api.use.
+    """
+    from poem import api
+
+    _deprecated("switch_version", "poem.api.use")
+    api.install([version])
+    path = api.use(version)["path"]
+    print(f"To use poetry version {version} in your current shell, run:")
+    if platform.system() == "Windows":
+        print(f"    $env:PATH=\"{path};$env:PATH\"  # PowerShell")
+        print(f"    SET PATH={path};%PATH%  # Command Prompt")
+    else:
+        print(f"    export PATH=\"{path}:$PATH\"")
+
+
+def set_global_version(version: str) -> None:
+    """Install a Poetry version if needed and make it the global default.
+
+    Deprecated: use poem.api.set_global.
+    """
+    from poem import api
+
+    _deprecated("set_global_version", "poem.api.set_global")
+    api.install([version])
+    api.set_global(version)
     print(f"Set global poetry version to {version}")
-    print("This setting will apply to new shell sessions.")
 
 
 def set_local_version(version: str) -> None:
-    """Set the local project Poetry version.
+    """Pin a Poetry version for the working directory.
 
-    Args:
-        version: The version to set for the local project
+    Deprecated: use poem.api.set_local.
     """
-    # Create .poetry-version file
-    with open(".poetry-version", "w") as f:
-        f.write(version)
+    from poem import api
 
+    _deprecated("set_local_version", "poem.api.set_local")
+    api.set_local(version)
     print(f"Set local poetry version to {version}")
-    print("This setting will apply when you're in this directory.")
 
 
 def uninstall_version(version: str) -> None:
-    """Uninstall a specific Poetry version.
-
-    Args:
-        version: The version to uninstall
-    """
-    # Check if it's currently in use
-    active_version, source = _get_active_version()
-    if active_version == version:
-        print(
-            f"Warning: You're trying to uninstall the active poetry version ({version}).")
-        print(f"This version is set as your {source} version.")
-        return
-
-    # Check if the version is installed
-    poetry_home = _get_poetry_home()
-    version_dir = os.path.join(poetry_home, "venv", version)
+    """Remove a Poetry version.
 
-    if not os.path.exists(version_dir):
-        print(f"Poetry version {version} is not installed.")
-        return
+    Deprecated: use poem.api.uninstall.
+    """
+    from poem import api
 
-    # Remove the version directory
-    try:
-        import shutil
-        shutil.rmtree(version_dir)
-        print(f"Successfully uninstalled poetry {version}")
-    except Exception as e:
-        print(
-            f"Failed to uninstall poetry {version}: {str(e)}", file=sys.stderr)
-        sys.exit(1)
+    _deprecated("uninstall_version", "poem.api.uninstall")
+    api.uninstall(version)
+    print(f"Successfully uninstalled poetry {version}")
 
 
 def get_remote_versions() -> None:
-    """List available Poetry versions from GitHub releases."""
-    try:
-        print("Fetching available versions from GitHub...")
+    """Print the released Poetry versions.
 
-        with Spinner() as _:
-            releases = json.loads(HTTP.get(
-                "https://api.github.com/repos/python-poetry/poetry/releases", headers={
-                    "User-Agent": "pvm-tool",
-                    "Accept": "application/vnd.github.v3+json"
-                }).decode("utf-8"))
-
-        print("\r" + " " * 40 + "\r", end="")
-        print(
-            f"Available Poetry versions: {[release['tag_name'].lstrip('v') for release in releases]}")
+    Deprecated: use poem.api.remote_versions.
+    """
+    from poem import api
 
-    except Exception as e:
-        print(f"Failed to fetch remote versions: {str(e)}", file=sys.stderr)
-        print("Try using pip: pip index versions poetry")
+    _deprecated("get_remote_versions", "poem.api.remote_versions")
+    print(f"Available Poetry versions: {api.remote_versions()}")
 
 
 def get_current_version_with_source() -> str:
-    """Get the current Poetry version and its source.
+    """Print the active Poetry version and where it comes from.
+
+    Deprecated: use poem.api.resolve.
 
     Returns:
-        The current version string
+        The active version, or "unknown" if there is none.
     """
-    version, source = _get_active_version()
-    if version == "unknown":
-        print("Poetry is not installed or not in PATH")
-    else:
-        print(f"Current poetry version: {version} (from {source})")
-    return version
-
-
-def which_poetry() -> None:
-    """Show the path to the active Poetry binary."""
-    version, _ = _get_active_version()
-    if version == "unknown":
-        print("Poetry is not installed or not in PATH")
-        return
+    from poem import api
 
+    _deprecated("get_current_version_with_source", "poem.api.resolve")
     try:
-        poetry_bin = _get_poetry_bin(version)
-        if os.path.exists(poetry_bin):
-            print(poetry_bin)
-        else:
-            result = subprocess.run(
-                ["where" if platform.system() == "Windows" else "which", "poetry"],
-                capture_output=True,
-                text=True,
-            )
-            print(result.stdout.strip())
-    except:
-        print("Could not determine poetry path")
+        active = api.resolve()
+    except api.PoemError:
+        print("Poetry is not installed or not in PATH")
+        return "unknown"
+    print(f"Current poetry version: {active['version']} (from {active['source']})")
+    return active["version"]
 
 
-def doctor() -> None:
-    """Diagnose setup issues with Poetry installation."""
-    print("Poetry Version Manager (PVM) Doctor")
-    print("===================================")
-
-    # Check PVM configuration
-    print("\n## PVM Configuration")
-    config_dir = _get_config_dir()
-    print(f"Config directory: {config_dir}")
-    if os.path.exists(config_dir):
-        print("✓ Configuration directory exists")
-    else:
-        print("✗ Configuration directory does not exist")
-
-    # Check global version
-    global_version_file = _get_global_version_file()
-    if os.path.exists(global_version_file):
-        with open(global_version_file, "r") as f:
-            global_version = f.read().strip()
-        print(f"Global version: {global_version}")
-    else:
-        print("No global version set")
+def which_poetry() -> None:
+    """Print the path of the active poetry binary.
 
-    # Check local version
-    if os.path.exists(".poetry-version"):
-        with open(".poetry-version", "r") as f:
-            local_version = f.read().strip()
-        print(f"Local version: {local_version}")
-    else:
-        print("No local version file (.poetry-version) found")
-
-    # Check Poetry installation
-    print("\n## Poetry Installation")
-    poetry_home = _get_poetry_home()
-    print(f"Poetry home: {poetry_home}")
-
-    if os.path.exists(poetry_home):
-        print("✓ Poetry home directory exists")
-
-        venv_dir = os.path.join(poetry_home, "venv")
-        if os.path.exists(venv_dir):
-            print("✓ Poetry venv directory exists")
-            versions = [d for d in os.listdir(
-                venv_dir) if os.path.isdir(os.path.join(venv_dir, d))]
-            print(
-                f"Installed versions: {', '.join(versions) if versions else 'None'}")
-        else:
-            print("✗ Poetry venv directory does not exist")
-    else:
-        print("✗ Poetry home directory does not exist")
+    Deprecated: use poem.api.resolve.
+    """
+    from poem import api
 
-    # Check PATH
-    print("\n## Environment")
+    _deprecated("which_poetry", "poem.api.resolve")
     try:
-        path = os.environ.get("PATH", "")
-        paths = path.split(os.pathsep)
+        print(api.resolve()["bin"])
+    except api.PoemError:
+        print("Poetry is not installed or not in PATH")
 
-        # Check for poetry in PATH
-        poetry_in_path = False
-        for p in paths:
-            if "poetry" in p.lower() and os.path.exists(p):
-                poetry_in_path = True
-                print(f"Poetry directory in PATH: {p}")
 
-        if not poetry_in_path:
-            print("✗ No Poetry directory found in PATH")
+def doctor() -> None:
+    """Print the `poem doctor` report.
 
-        # Check active version
-        print("\n## Active Poetry")
-        version, source = _get_active_version()
-        print(f"Active version: {version} (from {source})")
+    Deprecated: use poem.api.diagnose.
+    """
+    from poem.cli import main
 
-        if version != "unknown":
-            try:
-                output = _run_command(["poetry", "--version"])
-                print(f"Poetry reports: {output}")
-                print("✓ Poetry is working correctly")
-            except:
-                print("✗ Error running poetry command")
-    except Exception as e:
-        print(f"Error during diagnosis: {str(e)}")
+    _deprecated("doctor", "poem.api.diagnose")
+    main(["doctor"])
@@ -1,110 +1,235 @@
-from poem.core import _get_active_version, _get_poetry_bin
+from poem.core import _get_active_version, get_global_version_file, get_poetry_bin
+from poem.errors import PoemError
+from poem.settings import get_settings
+import shlex
 import shutil
 from pathlib import Path
 import subprocess
 import sys
 import os
 import platform
+from typing import Dict, List, Optional
 
 UNIX_SHIM_PATH = "$HOME/.poem/shims"
 WINDOWS_SHIM_PATH = "%APPDATA%\\.poem\\shims"
+SHIM_BUNDLE_VERSION_FILE = "poem-version"
+
+# Nested calls reuse the version their parent shim resolved, without
+# starting Python, while $PWD and the version files are unchanged. The key
+# is built like poem.shim._resolution_key, from shell builtins only.
+_UNIX_SHIM = """\
+#!/bin/sh
+if [ -n "${POEM_RESOLVED_BIN-}" ] && [ -z "${POEM_SHIM_CHECK-}" ]; then
+  _poem_key="$PWD" _poem_v=""
+  if [ -f .poetry-version ]; then
+    IFS= read -r _poem_v < .poetry-version || true
+    _poem_key="$_poem_key|l:$_poem_v"
+  fi
+  if [ -f __GLOBAL__ ]; then
+    IFS= read -r _poem_v < __GLOBAL__ || true
+    _poem_key="$_poem_key|g:$_poem_v"
+  fi
+  if [ "$_poem_key" = "${POEM_RESOLVED_KEY-}" ] && [ -x "$POEM_RESOLVED_BIN" ]; then
+    exec "$POEM_RESOLVED_BIN" "$@"
+  fi
+fi
+exec __PYTHON__ -I -S __BUNDLE__ "$@"
+"""
 
 
 def _create_shim_directory() -> str:
     """Create and return the path to the shim directory."""
-    if platform.system() == "Windows":
-        shim_dir = os.path.join(os.environ.get(
-            "APPDATA", ""), ".poem", "shims")
+    settings = get_settings()
+    return settings.ensure_dir(settings.shim_dir)
+
+
+def _get_shim_bundle_dir() -> str:
+    """Get the directory holding the self-contained shim bundle."""
+    return get_settings().shim_bundle_dir
+
+
+def _build_shim_bundle() -> str:
+    """Build a self-contained, precompiled copy of the shim.
+
+    The poem package is copied into the bundle and compiled to unchecked-hash
+    bytecode for the current interpreter, so the shim can run with -I -S:
+    no site import, no .pth processing, no user environment and no source
+    compilation or mtime checks at startup. The bundle records the poem
+    version it was built from, and is built next to the old one and swapped
+    in with renames.
+
+    Returns:
+        The path of the bundle directory
+    """
+    import compileall
+    import inspect
+    import py_compile
+    import poem
+
+    bundle_dir = _get_shim_bundle_dir()
+    staging_dir = f"{bundle_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    package_dir = os.path.dirname(inspect.getfile(poem))
+    shutil.copytree(package_dir, os.path.join(staging_dir, "poem"),
+                    ignore=shutil.ignore_patterns("__pycache__", "*.pyc"))
+    with open(os.path.join(staging_dir, "__main__.py"), "w") as f:
+        f.write("from poem.shim import main\n\nmain()\n")
+    with open(os.path.join(staging_dir, SHIM_BUNDLE_VERSION_FILE), "w") as f:
+        f.write(poem.__version__)
+
+    compiled = compileall.compile_dir(
+        os.path.join(staging_dir, "poem"),
+        quiet=1,
+        invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+    )
+    if not compiled:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise RuntimeError("Failed to compile the shim bundle")
+
+    try:
+        if os.path.exists(bundle_dir):
+            old_dir = f"{bundle_dir}.old-{os.getpid()}"
+            os.rename(bundle_dir, old_dir)
+            os.rename(staging_dir, bundle_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.rename(staging_dir, bundle_dir)
+    except OSError:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    return bundle_dir
+
+
+def refresh_shim_bundle() -> bool:
+    """Rebuild the shim bundle if it was built by another poem version.
+
+    The shims run poem from the bundle, so without this an upgraded poem
+    would keep resolving versions with the code it was installed with. It
+    is called after installs and upgrades rather than on every command, to
+    keep read-only commands off the filesystem. Does nothing if the shims
+    were never installed. Never raises; a failed rebuild is retried on the
+    next install.
+
+    Returns:
+        True if the bundle was rebuilt
+    """
+    from poem import __version__
+
+    bundle_dir = _get_shim_bundle_dir()
+    try:
+        with open(os.path.join(bundle_dir, SHIM_BUNDLE_VERSION_FILE)) as f:
+            if f.read().strip() == __version__:
+                return False
+    except OSError:
+        if not os.path.isdir(bundle_dir):
+            return False
+    try:
+        _build_shim_bundle()
+    except (OSError, RuntimeError):
+        return False
+    return True
 
-    else:
-        shim_dir = os.path.expanduser("~/.poem/shims")
 
-    os.makedirs(shim_dir, exist_ok=True)
-    return shim_dir
+def _verify_shim(shim_path: str) -> Optional[str]:
+    """Run an installed shim in self-check mode.
 
+    Returns None if the shim started and reported the current poem version,
+    otherwise what went wrong.
+    """
+    from poem import __version__
+
+    command = [shim_path]
+    if platform.system() == "Windows":
+        command = ["cmd", "/c", shim_path]
 
-def _create_windows_shim() -> None:
+    try:
+        result = subprocess.run(
+            command,
+            env=dict(os.environ, POEM_SHIM_CHECK="1"),
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+    except (OSError, subprocess.SubprocessError) as e:
+        return f"Shim failed to run: {str(e)}"
+
+    if result.returncode != 0 or result.stdout.strip() != f"poem shim {__version__}":
+        output = (result.stderr or result.stdout).strip()
+        return f"Shim self-check failed: {output}"
+    return None
+
+
+def _create_windows_shim() -> str:
     """Create a Windows batch file shim for Poetry."""
     shim_dir = _create_shim_directory()
     shim_path = os.path.join(shim_dir, "poetry.bat")
-    poem_path = os.path.join(os.path.dirname(shim_dir), "shim.py")
+    bundle_dir = _build_shim_bundle()
 
     with open(shim_path, "w") as f:
         f.write("@echo off\r\n")
-        f.write("setlocal\r\n")
-        f.write("set POEM_EXEC_DIR=%~dp0\r\n")
-        f.write("python \"%POEM_EXEC_DIR%..\\poem.py\" %*\r\n")
-
-    # Get the absolute path to shim.py in the package
-    import inspect
-    from poem import shim  # Import your shim module
-    source_path = inspect.getfile(shim)
+        f.write(f"\"{sys.executable}\" -I -S \"{bundle_dir}\" %*\r\n")
+    return shim_path
 
-    # Copy it to the destination
-    shutil.copy(source_path, poem_path)
 
-    print(f"Created Windows shim at: {shim_path}")
-    print(f"Add '{shim_dir}' to your PATH to use poetry commands with poem")
-
-
-def _create_unix_shim() -> None:
+def _create_unix_shim() -> str:
     """Create a Unix shell script shim for Poetry."""
     shim_dir = _create_shim_directory()
     shim_path = os.path.join(shim_dir, "poetry")
-    poem_path = os.path.join(os.path.dirname(shim_dir), "shim.py")
+    bundle_dir = _build_shim_bundle()
 
     with open(shim_path, "w") as f:
-        f.write("#!/bin/sh\n")
-        f.write("POEM_EXEC_DIR=\"$(dirname \"$0\")\"\n")
-        f.write("exec python \"${POEM_EXEC_DIR}/../poem.py\" \"$@\"\n")
-
-    # Get the absolute path to shim.py in the package
-    import inspect
-    from poem import shim  # Import your shim module
-    source_path = inspect.getfile(shim)
-
-    # Copy it to the destination
-    shutil.copy(source_path, poem_path)
+        f.write(_UNIX_SHIM.replace("__GLOBAL__", shlex.quote(get_global_version_file()))
+                .replace("__PYTHON__", shlex.quote(sys.executable))
+                .replace("__BUNDLE__", shlex.quote(bundle_dir)))
 
     # Make the shim executable
     os.chmod(shim_path, 0o755)
-
-    print(f"Created Unix shim at: {shim_path}")
-    print(f"Add '{shim_dir}' to your PATH to use poetry commands with poem")
+    return shim_path
 
 
-def install_shims(add_to_path: bool = False) -> None:
+def install_shims(add_to_path: bool = False) -> Dict:
     """Install shims for transparent usage of Poetry through poem.
 
     Args:
         add_to_path: If True, attempts to add shims to PATH
-    """
-    print("Installing poem shims for Poetry...")
 
+    Returns:
+        A dict with the "shim_dir", the "shim" itself, and the places
+        "added_to_path" (None unless add_to_path is set).
+
+    Raises:
+        PoemError: If the installed shim does not run, or PATH cannot be
+            updated.
+    """
     if platform.system() == "Windows":
-        shim_dir = _create_windows_shim()
-        if add_to_path:
-            add_to_windows_path(shim_dir)
+        shim_path = _create_windows_shim()
     else:
-        shim_dir = _create_unix_shim()
-        if add_to_path:
-            add_to_unix_path(shim_dir)
+        shim_path = _create_unix_shim()
+    shim_dir = os.path.dirname(shim_path)
 
-    if not add_to_path:
-        print("\nTo complete installation manually:")
-        print("1. Add the shim directory to your PATH")
+    error = _verify_shim(shim_path)
+    if error:
+        raise PoemError(f"The shim was installed but does not run. {error}")
+
+    added_to_path = None
+    if add_to_path:
         if platform.system() == "Windows":
-            print(f"   In PowerShell: $env:PATH=\"{shim_dir};$env:PATH\"")
-            print(f"   In Command Prompt: SET PATH={shim_dir};%PATH%")
+            added_to_path = add_to_windows_path(shim_dir)
         else:
-            print(f"   export PATH=\"{shim_dir}:$PATH\"")
-        print("2. Add this to your shell profile for permanent installation")
+            added_to_path = add_to_unix_path(shim_dir)
+    return {"shim_dir": shim_dir, "shim": shim_path, "added_to_path": added_to_path}
 
 
-def add_to_windows_path(shim_dir: str) -> bool:
+def add_to_windows_path(shim_dir: str) -> List[str]:
     """Add shim directory to Windows PATH environment variable.
 
-    Returns True if successful, False otherwise.
+    Returns:
+        The registry key that was updated, or nothing if PATH already
+        holds the shim directory.
+
+    Raises:
+        PoemError: If the registry cannot be updated.
     """
     try:
         # For current session only
@@ -134,21 +259,21 @@ def add_to_windows_path(shim_dir: str) -> bool:
                     "Environment", SMTO_ABORTIFHUNG, 5000, 0
                 )
 
-                print(f"Added {shim_dir} to your PATH environment variable")
-                print("The change will take effect in new command prompts")
-                return True
+                return [r"HKEY_CURRENT_USER\Environment"]
             else:
-                print(f"{shim_dir} is already in your PATH")
-                return True
+                return []
     except Exception as e:
-        print(f"Failed to add {shim_dir} to PATH: {str(e)}")
-        return False
+        raise PoemError(f"Failed to add {shim_dir} to PATH: {str(e)}") from e
 
 
-def add_to_unix_path(shim_dir: str) -> bool:
+def add_to_unix_path(shim_dir: str) -> List[str]:
     """Add shim directory to Unix PATH environment variable.
 
-    Returns True if successful, False otherwise.
+    Returns:
+        The shell profiles that were updated; empty if none was found.
+
+    Raises:
+        PoemError: If a profile cannot be updated.
     """
     try:
         # For current session only
@@ -169,7 +294,7 @@ def add_to_unix_path(shim_dir: str) -> bool:
              "set -gx PATH {shim_dir} $PATH")
         ]
 
-        modified = False
+        modified = []
         for profile_path, line_template in shells_to_try:
             if os.path.exists(profile_path):
                 line = line_template.format(shim_dir=shim_dir)
@@ -180,19 +305,8 @@ def add_to_unix_path(shim_dir: str) -> bool:
                 if line not in content:
                     with open(profile_path, "a") as f:
                         f.write(f"\n# Added by poem\n{line}\n")
-                    print(f"Added poem shim path to {profile_path}")
-                    modified = True
-
-        if modified:
-            print("Please restart your terminal or run:")
-            print(f"export PATH=\"{shim_dir}:$PATH\"")
-            return True
-        else:
-            print("Could not automatically update your shell profile.")
-            print("Please manually add the following line to your shell profile:")
-            print(f"export PATH=\"{shim_dir}:$PATH\"")
-            return False
+                    modified.append(profile_path)
+        return modified
 
     except Exception as e:
-        print(f"Failed to add {shim_dir} to PATH: {str(e)}")
-        return False
+        raise PoemError(f"Failed to add {shim_dir} to PATH: {str(e)}") from e
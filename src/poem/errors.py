@@ -0,0 +1,38 @@
+"""Exceptions raised by poem's commands.
+
+They are re-exported by poem.api, which is where library users catch them.
+"""
+
+from typing import Dict, List, Optional
+
+
+class PoemError(Exception):
+    """Base class for errors raised by the poem library."""
+
+
+class VersionNotInstalledError(PoemError):
+    """Raised when an operation needs a version that is not installed."""
+
+    def __init__(self, version: str, message: Optional[str] = None):
+        super().__init__(message or f"Poetry version {version} is not installed")
+        self.version = version
+
+
+class InstallError(PoemError):
+    """Raised when one or more versions fail to install.
+
+    Attributes:
+        failures: A mapping of each failed version to the reason
+        installed: The versions that did install
+    """
+
+    def __init__(self, failures: Dict[str, str], installed: List[str]):
+        super().__init__(
+            f"Failed to install poetry {', '.join(failures)}: "
+            + "; ".join(failures.values()))
+        self.failures = failures
+        self.installed = installed
+
+
+class RemoteError(PoemError):
+    """Raised when release information cannot be fetched."""
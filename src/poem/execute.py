@@ -0,0 +1,140 @@
+"""Run one command against several installed Poetry versions at once."""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from poem.core import _get_installed_versions, get_poetry_bin, version_key
+from poem.fetch import DEFAULT_CONCURRENCY, FetchEngine
+from poem.sync import SKIP_DIRS, VERSION_FILE
+from poem.trace import span
+
+# Lines of output shown for a failed version unless all output is requested
+FAILURE_TAIL_LINES = 20
+
+
+def select_versions(specs: List[str], all_versions: bool = False) -> List[str]:
+    """Pick installed versions matching each spec, oldest first.
+
+    A spec matches a version exactly or as a release prefix, so "1.8"
+    selects every installed 1.8.x.
+
+    Args:
+        specs: Version specs given on the command line
+        all_versions: If True, select every installed version
+
+    Raises:
+        ValueError: If a spec matches no installed version.
+    """
+    installed = sorted(_get_installed_versions(), key=version_key)
+    if all_versions:
+        return installed
+
+    selected: List[str] = []
+    for spec in specs:
+        matches = [version for version in installed
+                   if version == spec or version.startswith(spec + ".")]
+        if not matches:
+            raise ValueError(f"No installed poetry version matches {spec}")
+        selected.extend(matches)
+    return sorted(dict.fromkeys(selected), key=version_key)
+
+
+def _build_command(version: str, command: List[str]) -> List[str]:
+    """Point a command at one version's poetry binary.
+
+    A leading "poetry" is replaced with that version's binary; any other
+    program runs as given, with the version's bin directory first on PATH.
+    """
+    if command[0] == "poetry":
+        return [get_poetry_bin(version)] + command[1:]
+    return list(command)
+
+
+def _prepare_workdir(source: str, version: str, scratch: str) -> str:
+    """Copy the project into a private working directory pinned to version."""
+    workdir = os.path.join(scratch, version)
+    with span("copy project", "fs", version=version):
+        shutil.copytree(source, workdir, symlinks=True,
+                        ignore=shutil.ignore_patterns(*SKIP_DIRS, "__pycache__"))
+    with open(os.path.join(workdir, VERSION_FILE), "w") as f:
+        f.write(version + "\n")
+    return workdir
+
+
+def _run_version(version: str, command: List[str], source: str,
+                 scratch: Optional[str], timeout: Optional[float]) -> Dict:
+    """Run the command for one version and collect its outcome."""
+    start = time.perf_counter()
+    try:
+        workdir = _prepare_workdir(source, version, scratch) if scratch else source
+    except OSError as e:
+        # shutil.Error (a subclass) carries one entry per file that failed
+        return {
+            "version": version,
+            "returncode": 1,
+            "duration": time.perf_counter() - start,
+            "output": f"Could not copy the project for {version}: {str(e)}\n",
+        }
+
+    env = os.environ.copy()
+    env["PATH"] = os.pathsep.join(
+        [os.path.dirname(get_poetry_bin(version)), env.get("PATH", "")])
+    try:
+        with span("exec", "subprocess", version=version):
+            result = subprocess.run(
+                _build_command(version, command),
+                cwd=workdir, env=env, stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                text=True, errors="replace", timeout=timeout)
+        returncode, output = result.returncode, result.stdout
+    except subprocess.TimeoutExpired as e:
+        output = e.stdout or ""
+        if isinstance(output, bytes):
+            output = output.decode(errors="replace")
+        returncode, output = None, output + f"\nTimed out after {timeout:g}s\n"
+    except OSError as e:
+        returncode, output = 127, f"{str(e)}\n"
+
+    return {
+        "version": version,
+        "returncode": returncode,
+        "duration": time.perf_counter() - start,
+        "output": output,
+    }
+
+
+def run_versions(versions: List[str], command: List[str], read_only: bool = False,
+                 jobs: int = DEFAULT_CONCURRENCY,
+                 timeout: Optional[float] = None) -> List[Dict]:
+    """Run a command against several Poetry versions concurrently.
+
+    By default each version works on its own copy of the current directory
+    (pinned to that version with a .poetry-version file), so commands that
+    write lock files or build artifacts do not interfere. With read_only the
+    command runs in the current directory itself.
+
+    Args:
+        versions: The installed versions to run against
+        command: The command to run, usually starting with "poetry"
+        read_only: If True, share the current directory instead of copying it
+        jobs: The maximum number of versions running at the same time
+        timeout: Seconds after which a version's command is stopped
+
+    Returns:
+        One dict per version, in order, with "version", "returncode" (None
+        on timeout), "duration" in seconds and the combined "output".
+    """
+    source = os.getcwd()
+    scratch = None if read_only else tempfile.mkdtemp(prefix="poem-exec-")
+    try:
+        engine = FetchEngine(concurrency=jobs)
+        return engine.map(
+            lambda version: _run_version(version, command, source, scratch, timeout),
+            versions)
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
@@ -0,0 +1,58 @@
+"""Concurrent remote operations built on asyncio."""
+
+import logging
+from typing import Any, Callable, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+
+
+class FetchEngine:
+    """Run blocking operations concurrently with a bounded fan-out.
+
+    Each call runs on a worker thread through asyncio.to_thread while an
+    asyncio semaphore caps how many are in flight, so installs, plugin
+    syncs and endpoint probes overlap instead of waiting on one another.
+    The transport stays the synchronous client in poem.http.
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+
+    async def _bounded(self, semaphore: "asyncio.Semaphore",
+                       func: Callable[..., Any], *args: Any) -> Any:
+        import asyncio
+
+        async with semaphore:
+            return await asyncio.to_thread(func, *args)
+
+    async def _run_all(self, func: Callable[..., Any],
+                       calls: List[Tuple[Any, ...]],
+                       return_exceptions: bool) -> List[Any]:
+        import asyncio
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [self._bounded(semaphore, func, *args) for args in calls]
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+
+    def map(self, func: Callable[..., Any], items: Iterable[Any],
+            return_exceptions: bool = False) -> List[Any]:
+        """Call func once per item concurrently, preserving input order.
+
+        Args:
+            func: A blocking callable taking a single item
+            items: The items to process
+            return_exceptions: If True, failures are returned in place of
+                results instead of being raised
+        """
+        # asyncio is imported on first use; it is slow to import and the
+        # shim never needs it
+        import asyncio
+
+        calls = [(item,) for item in items]
+        if not calls:
+            return []
+        logger.debug(
+            f"Running {len(calls)} operations with concurrency {self.concurrency}")
+        return asyncio.run(self._run_all(func, calls, return_exceptions))
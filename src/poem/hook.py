@@ -0,0 +1,161 @@
+"""Shell integration that switches Poetry versions when the prompt is drawn."""
+
+import os
+import shlex
+from typing import List, Optional
+
+from poem.core import (
+    _get_version_homes,
+    _lock_resolution_enabled,
+    get_global_version_file,
+    get_pinned_version,
+    get_poetry_bin,
+)
+
+SUPPORTED_SHELLS = ("bash", "zsh", "fish")
+
+# The hook only calls back into poem when the key changes. The key is built
+# from shell builtins alone: the working directory, the contents of the
+# version files and whether the pinned version is installed (in the shared
+# store or the user's home). With POEM_LOCK_RESOLUTION set when the hook is
+# rendered, the modification time of poetry.lock is added, which takes stat.
+_POSIX_HOOK = """\
+_poem_hook() {
+  local key="$PWD" v=""
+  if [ -f .poetry-version ]; then
+    IFS= read -r v < .poetry-version || true
+    key="$key|l:$v"
+    [ __INSTALLED__ ] && key="$key+"
+  fi
+__LOCK__  if [ -f __GLOBAL__ ]; then
+    IFS= read -r v < __GLOBAL__ || true
+    key="$key|g:$v"
+    [ __INSTALLED__ ] && key="$key+"
+  fi
+  if [ "$key" != "${_POEM_HOOK_KEY-}" ]; then
+    _POEM_HOOK_KEY="$key"
+    eval "$(command poem hook __SHELL__ --env)"
+  fi
+}
+"""
+
+_POSIX_LOCK = """\
+  if [ -f poetry.lock ]; then
+    key="$key|k:$(command stat -c %Y poetry.lock 2>/dev/null || command stat -f %m poetry.lock 2>/dev/null)"
+  fi
+"""
+
+_BASH_REGISTER = """\
+if [[ ";${PROMPT_COMMAND:-};" != *";_poem_hook;"* ]]; then
+  PROMPT_COMMAND="_poem_hook${PROMPT_COMMAND:+;$PROMPT_COMMAND}"
+fi
+_poem_hook
+"""
+
+_ZSH_REGISTER = """\
+autoload -Uz add-zsh-hook
+add-zsh-hook precmd _poem_hook
+_poem_hook
+"""
+
+_FISH_HOOK = """\
+function _poem_hook --on-event fish_prompt
+    set -l key $PWD
+    if test -f .poetry-version
+        read -l v < .poetry-version
+        set key "$key|l:$v"
+        test __INSTALLED__; and set key "$key+"
+    end
+__LOCK__    if test -f __GLOBAL__
+        read -l v < __GLOBAL__
+        set key "$key|g:$v"
+        test __INSTALLED__; and set key "$key+"
+    end
+    if test "$key" != "$_poem_hook_key"
+        set -g _poem_hook_key $key
+        command poem hook fish --env | source
+    end
+end
+_poem_hook
+"""
+
+
+_FISH_LOCK = """\
+    if test -f poetry.lock
+        set key "$key|k:"(command stat -c %Y poetry.lock 2>/dev/null; or command stat -f %m poetry.lock 2>/dev/null)
+    end
+"""
+
+
+def _fish_quote(value: str) -> str:
+    """Quote a string for fish, which does not accept POSIX quoting."""
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def render_hook(shell: str) -> str:
+    """Render the hook script to be evaluated by a shell's startup file.
+
+    Args:
+        shell: One of "bash", "zsh" or "fish"
+    """
+    global_file = get_global_version_file()
+
+    if shell == "fish":
+        script, lock = _FISH_HOOK, _FISH_LOCK
+        quote = _fish_quote
+    else:
+        script = _POSIX_HOOK + (_BASH_REGISTER if shell == "bash" else _ZSH_REGISTER)
+        lock = _POSIX_LOCK
+        quote = shlex.quote
+
+    # One directory test per home, so versions in the shared store count
+    installed = " -o ".join(
+        f'-d {quote(os.path.join(home, "venv"))}/"$v"' for home in _get_version_homes())
+    return (script.replace("__LOCK__", lock if _lock_resolution_enabled() else "")
+            .replace("__INSTALLED__", installed)
+            .replace("__GLOBAL__", quote(global_file))
+            .replace("__SHELL__", shell))
+
+
+def _resolve_bin_dir() -> Optional[str]:
+    """Get the bin directory of the pinned Poetry version, if installed."""
+    pinned = get_pinned_version()
+    if not pinned:
+        return None
+
+    poetry_bin = get_poetry_bin(pinned[0])
+    if not os.path.exists(poetry_bin):
+        return None
+    return os.path.dirname(poetry_bin)
+
+
+def render_env(shell: str) -> str:
+    """Render the shell code that points PATH at the pinned Poetry version.
+
+    The directory added last time is tracked in _POEM_PATH so that it can
+    be swapped out rather than accumulating on PATH.
+
+    Args:
+        shell: One of "bash", "zsh" or "fish"
+    """
+    previous = os.environ.get("_POEM_PATH")
+    paths: List[str] = [p for p in os.environ.get("PATH", "").split(os.pathsep)
+                        if p and p != previous]
+
+    bin_dir = _resolve_bin_dir()
+    if bin_dir:
+        paths.insert(0, bin_dir)
+
+    if shell == "fish":
+        lines = ["set -gx PATH " + " ".join(_fish_quote(p) for p in paths)]
+        if bin_dir:
+            lines.append(f"set -gx _POEM_PATH {_fish_quote(bin_dir)}")
+        else:
+            lines.append("set -e _POEM_PATH")
+    else:
+        lines = [f"export PATH={shlex.quote(os.pathsep.join(paths))}"]
+        if bin_dir:
+            lines.append(f"export _POEM_PATH={shlex.quote(bin_dir)}")
+        else:
+            lines.append("unset _POEM_PATH")
+    return "\n".join(lines) + "\n"
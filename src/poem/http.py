@@ -1,13 +1,37 @@
-import http.client
 import json
-from urllib.parse import urlsplit
+import os
+import threading
+import time
+from urllib.parse import quote, urljoin, urlsplit
 import logging
 
+from poem.cache import touch
+from poem.trace import span
+
 logger = logging.getLogger(__name__)
 
+MAX_REDIRECTS = 5
+
+
+def _get_mirror_url() -> str | None:
+    """Get the poem mirror base URL set with POEM_MIRROR_URL, if any."""
+    mirror_url = os.environ.get("POEM_MIRROR_URL", "").strip()
+    return mirror_url.rstrip("/") or None
+
+
+class HTTPError(Exception):
+    """Raised when a request returns an unexpected HTTP status."""
+
+    def __init__(self, url: str, status: int, reason: str = ""):
+        super().__init__(f"GET {url} returned {status} {reason}".strip())
+        self.url = url
+        self.status = status
+
 
 class HTTPClient:
     def __init__(self, host: str, port: int = None, timeout: int = 30):
+        import http.client
+
         parsed_url = urlsplit(host)
         _host = parsed_url.hostname
         self.scheme = parsed_url.scheme
@@ -25,13 +49,13 @@ class HTTPClient:
 
     def get(self, path: str, headers: dict = None) -> dict:
         """Send a GET request to path, relative to the initialized host."""
-        logging.debug(
+        logger.debug(
             f"GET {path} -> scheme: {self.scheme}, host: {self.conn.host}, path: {path}")
 
         self.conn.request("GET", path, headers=headers)
         res = self.conn.getresponse()
         raw_data = res.read()
-        logging.debug(f"Response data size: {len(raw_data)} bytes")
+        logger.debug(f"Response data size: {len(raw_data)} bytes")
         data = json.loads(raw_data.decode("utf-8"))
         return data
 
@@ -44,23 +68,133 @@ class HTTPClient:
 
 class HTTP:
     @staticmethod
-    def get(url: str, headers: dict = None) -> bytes:
-        """Send a GET request."""
-        scheme, host, path = HTTP.get_host(url)
-        logging.debug(
-            f"GET {url} -> scheme: {scheme}, host: {host}, path: {path}")
-
-        if scheme == 'https':
-            conn = http.client.HTTPSConnection(host)
-        else:
-            conn = http.client.HTTPConnection(host)
-
-        conn.request("GET", path, headers=headers)
-        res = conn.getresponse()
-        raw_body = res.read()
-        logging.debug(f"Response data size: {len(raw_body)} bytes")
-        conn.close()
-        return raw_body
+    def get(url: str, headers: dict = None, timeout: int = 30,
+            use_mirror: bool = True) -> bytes:
+        """Send a GET request, following redirects.
+
+        When a mirror is configured the request goes to the mirror first and
+        falls back to the upstream URL if the mirror cannot serve it.
+
+        Raises:
+            HTTPError: If the final response is not a 2xx status.
+        """
+        mirror_url = _get_mirror_url() if use_mirror else None
+        if mirror_url and not url.startswith(mirror_url + "/"):
+            try:
+                return HTTP._get(HTTP.mirror_path(mirror_url, url), headers, timeout)
+            except (OSError, HTTPError) as e:
+                logger.debug(f"Mirror could not serve {url} ({e}), using upstream")
+        return HTTP._get(url, headers, timeout)
+
+    @staticmethod
+    def _get(url: str, headers: dict = None, timeout: int = 30) -> bytes:
+        """Send a GET request to url itself, following redirects."""
+        # Imported on first use: http.client pulls in the email package,
+        # which would otherwise slow down every shim invocation
+        import http.client
+
+        for _ in range(MAX_REDIRECTS + 1):
+            parsed = urlsplit(url)
+            path = parsed.path or "/"
+            if parsed.query:
+                path = f"{path}?{parsed.query}"
+            logger.debug(
+                f"GET {url} -> scheme: {parsed.scheme}, host: {parsed.hostname}, path: {path}")
+
+            if parsed.scheme == 'https':
+                conn = http.client.HTTPSConnection(
+                    parsed.hostname, parsed.port, timeout=timeout)
+            else:
+                conn = http.client.HTTPConnection(
+                    parsed.hostname, parsed.port, timeout=timeout)
+
+            with span(f"GET {parsed.hostname}", "http", url=url):
+                try:
+                    conn.request("GET", path, headers=headers or {})
+                    res = conn.getresponse()
+                    raw_body = res.read()
+                finally:
+                    conn.close()
+
+            location = res.getheader("Location")
+            if res.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            if not 200 <= res.status < 300:
+                raise HTTPError(url, res.status, res.reason)
+
+            logger.debug(f"Response data size: {len(raw_body)} bytes")
+            return raw_body
+
+        raise HTTPError(url, res.status, "too many redirects")
+
+    @staticmethod
+    def get_cached(url: str, cache_file: str, max_age: int = 3600,
+                   headers: dict = None, use_mirror: bool = True) -> bytes:
+        """Send a GET request, reusing a cached response when it is fresh.
+
+        A response younger than max_age seconds is served from cache_file
+        without touching the network. If the request fails, a stale cached
+        response is returned instead of raising.
+        """
+        try:
+            age = time.time() - os.path.getmtime(cache_file)
+        except OSError:
+            age = None
+
+        if age is not None and age < max_age:
+            logger.debug(f"Cache hit for {url}: {cache_file}")
+            with span("read cache", "fs", path=cache_file), \
+                    open(cache_file, "rb") as f:
+                body = f.read()
+            touch(cache_file)
+            return body
+
+        try:
+            body = HTTP.get(url, headers=headers, use_mirror=use_mirror)
+        except (OSError, HTTPError):
+            if age is None:
+                raise
+            logger.debug(f"Request for {url} failed, using stale cache")
+            with open(cache_file, "rb") as f:
+                return f.read()
+
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(body)
+        os.replace(tmp_file, cache_file)
+        return body
+
+    @staticmethod
+    def cache_path(cache_dir: str, url: str) -> str:
+        """Map a URL to its file location inside a cache directory."""
+        parsed = urlsplit(url)
+        host = parsed.hostname or "localhost"
+        if parsed.port:
+            host = f"{host}_{parsed.port}"
+        parts = [p for p in parsed.path.split("/") if p not in ("", ".", "..")]
+        if not parts or parsed.path.endswith("/"):
+            parts.append("index")
+        if parsed.query:
+            parts[-1] = f"{parts[-1]}@{quote(parsed.query, safe='=&')}"
+        return os.path.join(cache_dir, host, *parts)
+
+    @staticmethod
+    def mirror_path(mirror_url: str, url: str) -> str:
+        """Map an upstream URL to its location on a poem mirror.
+
+        https://pypi.org/simple/poetry/ becomes <mirror>/pypi.org/simple/poetry/.
+        An explicit port is kept, which tells the mirror to use plain HTTP.
+        """
+        parsed = urlsplit(url)
+        host = parsed.hostname or ""
+        if parsed.port and parsed.port != 443:
+            host = f"{host}:{parsed.port}"
+        mirrored = f"{mirror_url}/{host}{parsed.path or '/'}"
+        if parsed.query:
+            mirrored = f"{mirrored}?{parsed.query}"
+        return mirrored
 
     @staticmethod
     def get_host(url: str) -> tuple[str | None, str | None, str | None]:
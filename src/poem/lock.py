@@ -0,0 +1,134 @@
+"""Advisory file locks shared between poem processes."""
+
+import contextlib
+import os
+import time
+from typing import Callable, Iterator, Optional
+
+# How often a waiting process is told the lock is still held
+PROGRESS_INTERVAL = 15.0
+
+
+class LockTimeout(Exception):
+    """Raised when a lock is still held by another process after the timeout."""
+
+    def __init__(self, path: str, timeout: float, holder: Optional[int]):
+        held_by = f" (held by pid {holder})" if holder else ""
+        super().__init__(f"Timed out after {timeout:g}s waiting for {path}{held_by}")
+        self.path = path
+        self.holder = holder
+
+
+def _try_lock(fd: int) -> bool:
+    """Take an exclusive lock on fd without blocking."""
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def _unlock(fd: int) -> None:
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        return
+    fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def _read_holder(path: str) -> Optional[int]:
+    """Get the pid recorded by the process holding a lock, if readable."""
+    try:
+        with open(path, "r") as f:
+            return int(f.read().strip() or 0) or None
+    except (OSError, ValueError):
+        return None
+
+
+def _is_current(fd: int, path: str) -> bool:
+    """Check whether fd is still the file at path, not one removed since it was opened."""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return False
+    opened = os.fstat(fd)
+    return (info.st_dev, info.st_ino) == (opened.st_dev, opened.st_ino)
+
+
+@contextlib.contextmanager
+def file_lock(path: str, timeout: float,
+              on_wait: Optional[Callable[[float, Optional[int]], None]] = None,
+              poll_interval: float = 0.1, remove: bool = False) -> Iterator[None]:
+    """Hold an exclusive lock on a file for the duration of a block.
+
+    The lock is released by the operating system if the holder dies, so a
+    crashed process never leaves a stale lock behind. A lock file removed
+    by its holder is noticed by waiters, who then lock a fresh one.
+
+    Args:
+        path: The lock file, created if needed
+        timeout: Seconds to wait for another holder before giving up
+        on_wait: Called with the seconds waited so far and the holder's pid
+            when the lock is first found busy, then every PROGRESS_INTERVAL
+        poll_interval: Seconds between attempts while waiting
+        remove: If True, delete the lock file on release, so locks named
+            after short-lived things do not pile up
+
+    Raises:
+        LockTimeout: If the lock could not be taken within timeout.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    start = time.monotonic()
+    next_progress = 0.0
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            while not _try_lock(fd):
+                waited = time.monotonic() - start
+                if waited >= timeout:
+                    raise LockTimeout(path, timeout, _read_holder(path))
+                if on_wait and waited >= next_progress:
+                    on_wait(waited, _read_holder(path))
+                    next_progress = waited + PROGRESS_INTERVAL
+                time.sleep(poll_interval)
+        except BaseException:
+            os.close(fd)
+            raise
+        if _is_current(fd, path):
+            break
+        # The previous holder removed the file we were waiting on
+        _unlock(fd)
+        os.close(fd)
+
+    try:
+        # Record the holder for the benefit of waiting processes
+        os.ftruncate(fd, 0)
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.write(fd, str(os.getpid()).encode())
+        try:
+            yield
+        finally:
+            os.ftruncate(fd, 0)
+            if remove:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            _unlock(fd)
+    finally:
+        os.close(fd)
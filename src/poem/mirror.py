@@ -0,0 +1,238 @@
+"""A caching HTTP mirror of the endpoints poem downloads from.
+
+Clients reach an upstream URL through the mirror by prefixing its host:
+https://pypi.org/simple/poetry/ is served at <mirror>/pypi.org/simple/poetry/.
+Release artifacts are cached for good; everything else (index pages, API
+responses, the installer script) is refreshed like the release index cache.
+"""
+
+import logging
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterable, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from poem.cache import prune_if_due, touch
+from poem.core import RELEASE_INDEX_MAX_AGE, _get_cache_dir, _get_index_url
+from poem.errors import PoemError
+from poem.http import HTTP, HTTPError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 3141
+
+# Hosts the mirror fetches from; anything else is refused so the mirror
+# cannot be used as an open proxy. A host with a port other than 443 must
+# be allowed as "host:port".
+DEFAULT_UPSTREAM_HOSTS = (
+    "pypi.org",
+    "files.pythonhosted.org",
+    "install.python-poetry.org",
+    "api.github.com",
+    "github.com",
+    "objects.githubusercontent.com",
+)
+
+# Published release files never change, so they are cached without expiry
+_ARTIFACT_SUFFIXES = (".whl", ".tar.gz", ".tar.bz2", ".zip")
+# Request headers passed on to the upstream server
+_FORWARDED_HEADERS = ("Accept", "User-Agent")
+
+
+def _negotiated_type(accept: Optional[str]) -> Optional[str]:
+    """Get the media type a client prefers in its Accept header, if any.
+
+    The simple API serves JSON or HTML for the same URL depending on Accept
+    (PEP 691), so index responses are cached per preferred type.
+    """
+    best, best_q = None, 0.0
+    for item in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_type and q > best_q:
+            best, best_q = media_type.lower(), q
+    return best
+
+
+def _content_type(path: str, body: bytes, requested: Optional[str] = None) -> str:
+    """Guess the content type of a cached response.
+
+    The type the client negotiated is returned when the body matches it.
+    """
+    if path.endswith(_ARTIFACT_SUFFIXES):
+        return "application/octet-stream"
+    if body[:1] in (b"{", b"["):
+        if requested and requested.endswith("json"):
+            return requested
+        return "application/json"
+    if body.lstrip()[:1] == b"<":
+        if requested and requested.endswith("html"):
+            return f"{requested}; charset=utf-8"
+        return "text/html; charset=utf-8"
+    return "text/plain; charset=utf-8"
+
+
+def _host_key(hostname: str, port: Optional[str]) -> str:
+    """Name a host as the allowlist does: with its port unless it is 443."""
+    hostname = hostname.lower()
+    return f"{hostname}:{port}" if port and port != "443" else hostname
+
+
+def _upstream_url(request_path: str) -> Optional[Tuple[str, str]]:
+    """Map a mirror request path to its upstream URL and host.
+
+    A host with an explicit port other than 443 is fetched over plain HTTP,
+    which lets a mirror front local stand-in servers.
+
+    Returns:
+        The upstream URL and the host with its port (see _host_key), or
+        None if the path names no host.
+    """
+    parsed = urlsplit(request_path)
+    host, _, path = parsed.path.lstrip("/").partition("/")
+    if not host or ".." in path.split("/"):
+        return None
+    hostname, _, port = host.partition(":")
+    scheme = "http" if port and port != "443" else "https"
+    url = f"{scheme}://{host}/{path}"
+    if parsed.query:
+        url = f"{url}?{parsed.query}"
+    return url, _host_key(hostname, port)
+
+
+class MirrorServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the mirror's cache settings."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], cache_dir: str,
+                 allowed_hosts: Iterable[str]):
+        super().__init__(address, MirrorHandler)
+        self.cache_dir = cache_dir
+        self.allowed_hosts: Set[str] = {host.lower() for host in allowed_hosts}
+
+    def fetch(self, url: str, headers: dict) -> Tuple[str, bytes]:
+        """Get the body for an upstream URL, from the cache when possible.
+
+        Returns:
+            The cache file the body was served from and the body itself.
+        """
+        if urlsplit(url).path.endswith(_ARTIFACT_SUFFIXES):
+            cache_file = HTTP.cache_path(
+                os.path.join(self.cache_dir, "artifacts"), url)
+            try:
+                with open(cache_file, "rb") as f:
+                    body = f.read()
+                touch(cache_file)
+                return cache_file, body
+            except OSError:
+                pass
+            body = HTTP.get(url, headers=headers, use_mirror=False)
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            tmp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_file, "wb") as f:
+                f.write(body)
+            os.replace(tmp_file, cache_file)
+            prune_if_due(self.cache_dir)
+            return cache_file, body
+
+        cache_file = HTTP.cache_path(os.path.join(self.cache_dir, "index"), url)
+        requested = _negotiated_type(headers.get("Accept"))
+        if requested:
+            cache_file = f"{cache_file}@{re.sub(r'[^a-z0-9.+-]', '_', requested)}"
+        body = HTTP.get_cached(url, cache_file, max_age=RELEASE_INDEX_MAX_AGE,
+                               headers=headers, use_mirror=False)
+        return cache_file, body
+
+
+class MirrorHandler(BaseHTTPRequestHandler):
+    """Serve GET requests from the mirror cache, filling it from upstream."""
+
+    server: MirrorServer
+    server_version = "poem-mirror"
+
+    def do_GET(self) -> None:
+        upstream = _upstream_url(self.path)
+        if upstream is None:
+            self.send_error(400, "Expected /<host>/<path>")
+            return
+        url, host = upstream
+        if host not in self.server.allowed_hosts:
+            self.send_error(403, f"Host not mirrored: {host}")
+            return
+
+        headers = {name: self.headers[name] for name in _FORWARDED_HEADERS
+                   if self.headers.get(name)}
+        try:
+            cache_file, body = self.server.fetch(url, headers)
+        except HTTPError as e:
+            self.send_error(e.status if 400 <= e.status < 600 else 502, str(e))
+            return
+        except OSError as e:
+            self.send_error(502, f"Failed to fetch {url}: {str(e)}")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", _content_type(
+            cache_file, body, _negotiated_type(headers.get("Accept"))))
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.info(f"{self.address_string()} {format % args}")
+
+
+def _default_allowed_hosts() -> Set[str]:
+    """Get the upstream hosts mirrored by default, including the index host."""
+    hosts = set(DEFAULT_UPSTREAM_HOSTS)
+    index_url = urlsplit(_get_index_url())
+    if index_url.hostname:
+        hosts.add(_host_key(index_url.hostname,
+                            str(index_url.port) if index_url.port else None))
+    return hosts
+
+
+def serve_mirror(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 cache_dir: Optional[str] = None,
+                 allowed_hosts: Optional[Iterable[str]] = None,
+                 on_ready: Optional[Callable[[str, str], None]] = None) -> None:
+    """Serve the poem cache over HTTP until interrupted.
+
+    Args:
+        host: The address to listen on
+        port: The port to listen on
+        cache_dir: The cache to serve and fill; the poem cache by default
+        allowed_hosts: Extra upstream hosts to mirror, as "host" or, for
+            ports other than 443, "host:port"
+        on_ready: Called with the mirror's URL and cache directory once it
+            is listening
+
+    Raises:
+        PoemError: If the address cannot be bound.
+    """
+    hosts = _default_allowed_hosts() | set(allowed_hosts or ())
+    try:
+        server = MirrorServer((host, port), cache_dir or _get_cache_dir(), hosts)
+    except OSError as e:
+        raise PoemError(f"Failed to start mirror on {host}:{port}: {str(e)}") from e
+
+    if on_ready:
+        bound_host, bound_port = server.server_address[:2]
+        on_ready(f"http://{bound_host}:{bound_port}", server.cache_dir)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,265 @@
+"""Keep the same Poetry plugins installed in every installed version.
+
+The plugins are declared once, one requirement per line, in the plugins.txt
+file of the poem configuration directory. `poem plugins sync` installs them
+into each version's venv with that version's own pip, pinning poetry itself
+so plugin dependencies cannot move it. Wheels are built once into a shared
+wheelhouse in the poem cache, and each version records the hash of the
+plugin set it was synced to in its install manifest.
+"""
+
+import hashlib
+import os
+import re
+import subprocess
+from typing import Dict, List, Optional
+
+from poem.cache import prune_if_due
+from poem.core import (
+    _get_cache_dir,
+    _get_index_url,
+    _get_venv_python,
+    _get_venv_python_at,
+    _write_manifest,
+    get_config_dir,
+    get_installed_locations,
+    get_poetry_home,
+    get_version_dir,
+    read_manifest,
+    version_key,
+)
+from poem.errors import PoemError, VersionNotInstalledError
+from poem.fetch import DEFAULT_CONCURRENCY, FetchEngine
+from poem.trace import span
+
+PLUGINS_FILE = "plugins.txt"
+
+_NAME_PATTERN = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+
+def _get_plugins_file() -> str:
+    """Get the plugin manifest path."""
+    return os.path.join(get_config_dir(), PLUGINS_FILE)
+
+
+def _get_wheelhouse() -> str:
+    """Get the directory of wheels shared by every version's plugin installs."""
+    return os.path.join(_get_cache_dir(), "wheels")
+
+
+def _requirement_name(requirement: str) -> str:
+    """Get the normalized project name of a requirement specifier."""
+    match = _NAME_PATTERN.match(requirement)
+    if not match:
+        raise ValueError(f"Invalid plugin requirement: {requirement!r}")
+    return re.sub(r"[-_.]+", "-", match.group(1)).lower()
+
+
+def read_plugins() -> List[str]:
+    """Read the declared plugin requirements, ignoring comments and blank lines."""
+    try:
+        with open(_get_plugins_file(), "r") as f:
+            lines = [line.split("#", 1)[0].strip() for line in f]
+    except FileNotFoundError:
+        return []
+    return [line for line in lines if line]
+
+
+def _write_plugins(requirements: List[str]) -> None:
+    """Atomically replace the plugin manifest."""
+    plugins_file = _get_plugins_file()
+    tmp_file = f"{plugins_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        f.writelines(f"{requirement}\n" for requirement in requirements)
+    os.replace(tmp_file, plugins_file)
+
+
+def _plugins_hash(requirements: List[str]) -> str:
+    """Hash a plugin set independently of the order it was declared in."""
+    digest = hashlib.sha256("\n".join(sorted(requirements)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def plugins_add(requirements: List[str]) -> List[str]:
+    """Declare plugins, replacing any existing entry for the same project.
+
+    Returns:
+        The declared plugin requirements.
+    """
+    added = {_requirement_name(requirement): requirement for requirement in requirements}
+    declared = [requirement for requirement in read_plugins()
+                if _requirement_name(requirement) not in added]
+    declared.extend(added.values())
+    _write_plugins(declared)
+    return declared
+
+
+def plugins_remove(names: List[str]) -> List[str]:
+    """Stop declaring plugins; the next sync uninstalls them.
+
+    Returns:
+        The declared plugin requirements.
+
+    Raises:
+        PoemError: If a plugin is not declared.
+    """
+    removed = {_requirement_name(name) for name in names}
+    declared = read_plugins()
+    unknown = removed - {_requirement_name(requirement) for requirement in declared}
+    if unknown:
+        raise PoemError(f"Plugin(s) not declared: {', '.join(sorted(unknown))}")
+
+    declared = [requirement for requirement in declared
+                if _requirement_name(requirement) not in removed]
+    _write_plugins(declared)
+    return declared
+
+
+def _interpreter_id(version_dir: str) -> str:
+    """Identify the base interpreter a version's venv was created from.
+
+    Venvs of the same base interpreter share an id, so wheels built with
+    one of them suit the others. A venv without a readable pyvenv.cfg is
+    identified by its own interpreter.
+    """
+    config = {}
+    try:
+        with open(os.path.join(version_dir, "venv", "pyvenv.cfg"), "r") as f:
+            for line in f:
+                key, _, value = line.partition("=")
+                config[key.strip()] = value.strip()
+    except OSError:
+        pass
+    if config.get("home"):
+        return f"{config['home']}|{config.get('version') or config.get('version_info', '')}"
+    return _get_venv_python_at(version_dir)
+
+
+def _prefetch_wheels(python: str, requirements: List[str], wheelhouse: str) -> None:
+    """Build or download wheels for the plugins and their dependencies once."""
+    os.makedirs(wheelhouse, exist_ok=True)
+    with span("prefetch plugin wheels", "subprocess", plugins=len(requirements)):
+        subprocess.run(
+            [python, "-m", "pip", "wheel", "--quiet", "--disable-pip-version-check",
+             "--index-url", _get_index_url(), "--find-links", wheelhouse,
+             "--wheel-dir", wheelhouse, *requirements],
+            check=True, capture_output=True, text=True)
+
+
+def _sync_version(version: str, requirements: List[str], digest: str,
+                  wheelhouse: str) -> None:
+    """Bring one version's plugins in line with the declared set.
+
+    Plugins are installed from the wheelhouse without touching the index;
+    only if that fails (a dependency missing from the wheelhouse) does pip
+    fall back to the index.
+
+    Raises:
+        subprocess.CalledProcessError: If pip fails.
+    """
+    home = get_poetry_home()
+    python = _get_venv_python(version, home)
+    manifest = read_manifest(version, home)
+    previous = manifest.get("plugins", {}).get("requirements", [])
+    declared_names = {_requirement_name(requirement) for requirement in requirements}
+    stale = sorted({_requirement_name(requirement) for requirement in previous}
+                   - declared_names)
+
+    pip = [python, "-m", "pip", "--disable-pip-version-check"]
+    with span("sync plugins", "subprocess", version=version):
+        if stale:
+            subprocess.run([*pip, "uninstall", "--yes", "--quiet", *stale],
+                           check=True, capture_output=True, text=True)
+        if requirements:
+            # Pinning poetry keeps plugin dependencies from replacing it
+            install = [*pip, "install", "--quiet", "--find-links", wheelhouse,
+                       f"poetry=={version}", *requirements]
+            offline = subprocess.run([*install, "--no-index"],
+                                     capture_output=True, text=True)
+            if offline.returncode != 0:
+                subprocess.run([*install, "--index-url", _get_index_url()],
+                               check=True, capture_output=True, text=True)
+
+    manifest["plugins"] = {"hash": digest, "requirements": requirements}
+    _write_manifest(version, manifest, home)
+
+
+def plugins_sync(versions: Optional[List[str]] = None, force: bool = False,
+                 jobs: int = DEFAULT_CONCURRENCY) -> Dict:
+    """Install the declared plugins into installed versions concurrently.
+
+    Versions whose manifest already records the hash of the declared plugin
+    set are skipped. Versions in the shared store are left to its
+    administrator.
+
+    Args:
+        versions: The versions to sync (default: every version in the
+            user's poetry home)
+        force: If True, sync versions that look up to date too
+        jobs: The maximum number of versions synced at the same time
+
+    Returns:
+        A dict with the declared "plugins", their "hash", the versions
+        "synced", already "up_to_date" and "failed" (mapped to the reason),
+        and any "warnings".
+
+    Raises:
+        VersionNotInstalledError: If a requested version is not installed
+            in the user's poetry home.
+    """
+    home = get_poetry_home()
+    requirements = read_plugins()
+    digest = _plugins_hash(requirements)
+    local = sorted((version for version, path in get_installed_locations().items()
+                    if os.path.dirname(os.path.dirname(path)) == home), key=version_key)
+    if versions:
+        missing = [version for version in versions if version not in local]
+        if missing:
+            raise VersionNotInstalledError(
+                missing[0], f"Poetry version(s) not installed in {home}: "
+                            f"{', '.join(missing)}")
+        local = [version for version in local if version in versions]
+
+    result = {"plugins": requirements, "hash": digest,
+              "synced": [], "up_to_date": [], "failed": {}, "warnings": []}
+    pending = []
+    for version in local:
+        synced_hash = read_manifest(version, home).get("plugins", {}).get("hash")
+        if not force and synced_hash == digest:
+            result["up_to_date"].append(version)
+        elif not requirements and synced_hash is None:
+            # Never had plugins, nothing to remove
+            result["up_to_date"].append(version)
+        else:
+            pending.append(version)
+
+    if not pending:
+        return result
+
+    wheelhouse = _get_wheelhouse()
+    if requirements:
+        # Wheels are built once per base interpreter, with its first version
+        interpreters: Dict[str, str] = {}
+        for version in pending:
+            interpreters.setdefault(_interpreter_id(get_version_dir(version, home)), version)
+        for version in interpreters.values():
+            try:
+                _prefetch_wheels(_get_venv_python(version, home), requirements, wheelhouse)
+            except (OSError, subprocess.CalledProcessError) as e:
+                # Each version can still install from the index
+                detail = getattr(e, "stderr", None) or str(e)
+                result["warnings"].append(
+                    f"could not prefetch plugin wheels for poetry {version}: {detail.strip()}")
+
+    engine = FetchEngine(concurrency=jobs)
+    outcomes = engine.map(
+        lambda version: _sync_version(version, requirements, digest, wheelhouse),
+        pending, return_exceptions=True)
+    prune_if_due()
+    for version, outcome in zip(pending, outcomes):
+        if isinstance(outcome, Exception):
+            detail = getattr(outcome, "stderr", None) or str(outcome)
+            result["failed"][version] = detail.strip()
+        else:
+            result["synced"].append(version)
+    return result
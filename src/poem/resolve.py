@@ -0,0 +1,324 @@
+"""Resolve which Poetry version applies, importing as little as possible.
+
+The shim runs this on every poetry command, so it sits apart from
+poem.core: it needs only the settings and tracing modules, never the HTTP
+client, the cache or the installer machinery. poem.core re-exports every
+name defined here.
+"""
+
+import os
+import platform
+import re
+from typing import Dict, List, Optional, Tuple
+
+from poem.settings import get_settings
+from poem.trace import span, traced
+
+# Present in a version directory while it is being installed
+INSTALLING_MARKER = ".poem-installing"
+# Lock files can be megabytes; only this much of each end is read
+LOCK_HEADER_BYTES = 512
+LOCK_TRAILER_BYTES = 4096
+# The Poetry releases that write each lock-version, as [first, end) ranges
+LOCK_VERSION_POETRY = {
+    "1.0": ("1.0", "1.1"),
+    "1.1": ("1.1", "1.5"),
+    "2.0": ("1.5", "2.0"),
+    "2.1": ("2.0", None),
+}
+
+_VERSION_PATTERN = re.compile(
+    r"^v?(?P<release>\d+(?:\.\d+)*)"
+    r"(?:[-_.]?(?P<pre>a|b|c|rc|alpha|beta|pre|preview)[-_.]?(?P<pre_n>\d*))?"
+    r"(?:[-_.]?(?:post|rev|r)[-_.]?(?P<post>\d*))?"
+    r"(?:[-_.]?dev[-_.]?(?P<dev>\d*))?$",
+    re.IGNORECASE,
+)
+_PRE_RANKS = {"a": 0, "alpha": 0, "b": 1, "beta": 1,
+              "c": 2, "rc": 2, "pre": 2, "preview": 2}
+_LOCK_GENERATED_BY = re.compile(rb"@generated by Poetry ([0-9][^\s]*)")
+_LOCK_VERSION = re.compile(rb'^lock-version\s*=\s*["\']([^"\']+)["\']', re.MULTILINE)
+
+
+def get_poetry_home() -> str:
+    """Get the poetry home directory (POEM_HOME, or ~/.poetry)."""
+    return get_settings().poetry_home
+
+
+def get_config_dir() -> str:
+    """Get the poem configuration directory (POEM_CONFIG_DIR, or the XDG config)."""
+    settings = get_settings()
+    return settings.ensure_dir(settings.config_dir)
+
+
+def get_store_dir() -> Optional[str]:
+    """Get the shared, read-only install store set with POEM_STORE, if any."""
+    return get_settings().store
+
+
+def _get_version_homes() -> List[str]:
+    """Get the directories holding installed versions, in lookup order.
+
+    The shared store, when configured, is searched before the user's home.
+    """
+    store = get_store_dir()
+    homes = [store] if store else []
+    homes.append(get_poetry_home())
+    return homes
+
+
+def version_key(version: str) -> tuple:
+    """Return a sort key ordering version strings the way PEP 440 does."""
+    match = _VERSION_PATTERN.match(version.strip())
+    if not match:
+        return ((), (-2, 0), 0, (1, 0))
+
+    release = tuple(int(part) for part in match.group("release").split("."))
+    while len(release) > 1 and release[-1] == 0:
+        release = release[:-1]
+
+    if match.group("pre"):
+        pre = (_PRE_RANKS[match.group("pre").lower()],
+               int(match.group("pre_n") or 0))
+    elif match.group("dev") is not None and match.group("post") is None:
+        pre = (-1, 0)
+    else:
+        pre = (3, 0)
+
+    post = int(match.group("post") or 0) if match.group(
+        "post") is not None else -1
+    dev = (0, int(match.group("dev") or 0)) if match.group(
+        "dev") is not None else (1, 0)
+    return (release, pre, post, dev)
+
+
+def get_installed_locations() -> Dict[str, str]:
+    """Map each installed version to its directory.
+
+    A version present in both the shared store and the user's home
+    resolves to the store, matching get_version_dir.
+    """
+    locations = {}
+    for home in reversed(_get_version_homes()):
+        version_dir = os.path.join(home, "venv")
+        if not os.path.isdir(version_dir):
+            continue
+
+        with span("scan installed versions", "fs", path=version_dir):
+            for d in os.listdir(version_dir):
+                path = os.path.join(version_dir, d)
+                if (not d.startswith(".") and os.path.isdir(path)
+                        and not os.path.isfile(os.path.join(path, INSTALLING_MARKER))):
+                    locations[d] = path
+    return locations
+
+
+def _get_installed_versions() -> List[str]:
+    """Get the versions installed in the shared store or the user's home."""
+    return list(get_installed_locations())
+
+
+def get_version_dir(version: str, home: Optional[str] = None) -> str:
+    """Get the install directory of a specific version.
+
+    Args:
+        version: The version to look up
+        home: The home to build the path in; by default the shared store
+            and then the user's home are searched, skipping copies that
+            are still being installed, and falling back to the user's home
+            for versions that are not installed
+    """
+    if home:
+        return os.path.join(home, "venv", version)
+
+    for version_home in _get_version_homes():
+        version_dir = os.path.join(version_home, "venv", version)
+        if (os.path.isdir(version_dir)
+                and not os.path.isfile(os.path.join(version_dir, INSTALLING_MARKER))):
+            return version_dir
+    return os.path.join(get_poetry_home(), "venv", version)
+
+
+def get_poetry_bin(version: str, home: Optional[str] = None) -> str:
+    """Get the path to the Poetry binary for a specific version.
+
+    The shared store is searched before the user's poetry home, unless a
+    home is given.
+    """
+    version_dir = get_version_dir(version, home=home)
+    if platform.system() == "Windows":
+        return os.path.join(version_dir, "Scripts", "poetry.exe")
+    else:
+        return os.path.join(version_dir, "bin", "poetry")
+
+
+def is_installed(version: str, home: Optional[str] = None) -> bool:
+    """Check whether a version is installed and not in the middle of installing.
+
+    Args:
+        version: The version to check
+        home: The home to look in (default: the shared store, then the
+            user's poetry home)
+    """
+    version_dir = get_version_dir(version, home=home)
+    return (os.path.exists(get_poetry_bin(version, home=home))
+            and not os.path.isfile(os.path.join(version_dir, INSTALLING_MARKER)))
+
+
+def get_global_version_file() -> str:
+    """Get the global version file path."""
+    return os.path.join(get_config_dir(), "global-version")
+
+
+def get_pinned_version(cwd: Optional[str] = None) -> Optional[Tuple[str, str]]:
+    """Get the Poetry version pinned by a version file, if any.
+
+    Unlike _get_active_version, this never runs the system poetry.
+
+    With POEM_LOCK_RESOLUTION set, a poetry.lock in the directory is
+    consulted after .poetry-version and before the global version.
+
+    Args:
+        cwd: The directory to resolve in (default: the working directory)
+
+    Returns:
+        A tuple containing the version and source ("local", "lock" or
+        "global"), or None when no version file applies
+    """
+    # Check for local .poetry-version file
+    local_version_file = os.path.join(cwd, ".poetry-version") if cwd else ".poetry-version"
+    if os.path.exists(local_version_file):
+        with span("read version file", "fs", path=local_version_file), \
+                open(local_version_file, "r") as f:
+            version = f.read().strip()
+            return version, "local"
+
+    # A poetry.lock names the release that wrote it; opt-in, after the local pin
+    if _lock_resolution_enabled():
+        lock_file = os.path.join(cwd, "poetry.lock") if cwd else "poetry.lock"
+        metadata = read_lock_metadata(lock_file)
+        if metadata:
+            version = _match_lock_version(metadata, _get_installed_versions())
+            if version:
+                return version, "lock"
+
+    # Check for global version
+    global_version_file = get_global_version_file()
+    if os.path.exists(global_version_file):
+        with span("read version file", "fs", path=global_version_file), \
+                open(global_version_file, "r") as f:
+            version = f.read().strip()
+            return version, "global"
+
+    return None
+
+
+def _lock_resolution_enabled() -> bool:
+    """Check whether POEM_LOCK_RESOLUTION asks to resolve versions from poetry.lock."""
+    return os.environ.get("POEM_LOCK_RESOLUTION", "").lower() in ("1", "true", "yes")
+
+
+def read_lock_metadata(lock_file: str) -> Optional[Dict[str, Optional[str]]]:
+    """Read which Poetry wrote a lock file, without parsing the whole file.
+
+    Poetry writes an "@generated by Poetry X" comment on the first line and
+    the [metadata] table, holding lock-version, at the end, so only the
+    first LOCK_HEADER_BYTES and last LOCK_TRAILER_BYTES are read.
+
+    Lock files of format 1.x keep every package hash after [metadata], so
+    their lock-version is only found when the file is short; the header
+    comment is what identifies them.
+
+    Returns:
+        A dict with "generated_by" and "lock_version" (either may be None),
+        or None if the file does not exist or names neither.
+    """
+    try:
+        with span("read lock metadata", "fs", path=lock_file), open(lock_file, "rb") as f:
+            header = f.read(LOCK_HEADER_BYTES)
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(len(header), size - LOCK_TRAILER_BYTES))
+            trailer = f.read()
+    except OSError:
+        return None
+
+    generated_by = _LOCK_GENERATED_BY.search(header)
+    # Very old lock files have no header comment, and the metadata of
+    # short files sits within the header already
+    lock_version = _LOCK_VERSION.search(trailer) or _LOCK_VERSION.search(header)
+    if not generated_by and not lock_version:
+        return None
+    return {
+        "generated_by": generated_by.group(1).decode("ascii", "replace").rstrip(".")
+        if generated_by else None,
+        "lock_version": lock_version.group(1).decode("ascii", "replace")
+        if lock_version else None,
+    }
+
+
+def lock_compatible(version: str, metadata: Dict[str, Optional[str]]) -> bool:
+    """Check whether a Poetry version suits a lock file.
+
+    A lock file naming the release that wrote it is matched by any release
+    of the same minor series; otherwise the version must be one of the
+    releases that write its lock-version (see LOCK_VERSION_POETRY).
+    """
+    generated_by = metadata.get("generated_by")
+    if generated_by:
+        return version_key(version)[0][:2] == version_key(generated_by)[0][:2]
+
+    bounds = LOCK_VERSION_POETRY.get(metadata.get("lock_version") or "")
+    if not bounds:
+        return False
+    first, end = bounds
+    key = version_key(version)
+    return key >= version_key(first) and (end is None or key < version_key(end))
+
+
+def _match_lock_version(metadata: Dict[str, Optional[str]],
+                        installed: List[str]) -> Optional[str]:
+    """Pick the installed version best suited to a lock file.
+
+    The release that wrote the file wins; otherwise the newest installed
+    release of the same minor series, or for lock files without a header,
+    the newest one writing the same lock-version. When nothing compatible
+    is installed, the release that wrote the file is returned so that it
+    can be installed.
+
+    Returns:
+        The version to use, or None if the lock file names no release and
+        nothing installed can handle it.
+    """
+    generated_by = metadata.get("generated_by")
+    if generated_by in installed:
+        return generated_by
+    compatible = [version for version in installed if lock_compatible(version, metadata)]
+    if compatible:
+        return max(compatible, key=version_key)
+    return generated_by
+
+
+@traced("resolve")
+def _get_active_version() -> Tuple[str, str]:
+    """Get the active Poetry version and its source.
+
+    Returns:
+        A tuple containing the version and source ("local", "lock", "global",
+        or "default")
+    """
+    pinned = get_pinned_version()
+    if pinned:
+        return pinned
+
+    # Return the default system version; this runs poetry, so importing
+    # the rest of poem here costs little
+    from poem.core import get_current_version
+
+    try:
+        version = get_current_version()
+        if version:
+            return version, "default"
+        else:
+            return "unknown", "unknown"
+    except:
+        return "unknown", "unknown"
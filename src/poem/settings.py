@@ -0,0 +1,96 @@
+"""Where poem keeps its files, resolved once per process.
+
+Every module gets its paths from get_settings(), so the environment is read
+a single time and directories are created at most once. Installs, shims and
+statistics can be moved off the home directory (for example onto tmpfs or a
+local disk when home is on NFS) with POEM_HOME; configuration and cache
+follow POEM_CONFIG_DIR and POEM_CACHE_DIR, then the XDG base directories.
+"""
+
+import os
+import platform
+from functools import lru_cache
+from typing import Mapping, Optional, Set
+
+
+def _env_path(environ: Mapping[str, str], name: str) -> Optional[str]:
+    """Get an absolute path from an environment variable, if it is set."""
+    value = environ.get(name)
+    if not value:
+        return None
+    return os.path.abspath(os.path.expanduser(value))
+
+
+class Settings:
+    """Paths used by poem, resolved from the environment.
+
+    Attributes:
+        poem_home: Holds the shims, the shim bundle, usage statistics and install logs
+        poetry_home: Holds the installed versions in its venv directory
+        config_dir: Holds the global version, index URL and plugin manifest
+        cache_dir: Holds downloads, release listings and wheels; see poem.cache
+        store: The shared, read-only install store, if one is configured
+    """
+
+    def __init__(self, environ: Optional[Mapping[str, str]] = None):
+        environ = os.environ if environ is None else environ
+        home = os.path.expanduser("~")
+        if platform.system() == "Windows":
+            roaming = environ.get("APPDATA", "")
+            default_poem_home = os.path.join(roaming, ".poem")
+            default_poetry_home = os.path.join(roaming, "pypoetry")
+            default_config_dir = os.path.join(roaming, "poem")
+            default_cache_dir = os.path.join(environ.get("LOCALAPPDATA", ""), "poem", "Cache")
+        else:
+            default_poem_home = os.path.join(home, ".poem")
+            default_poetry_home = os.path.join(home, ".poetry")
+            default_config_dir = os.path.join(
+                _env_path(environ, "XDG_CONFIG_HOME") or os.path.join(home, ".config"), "poem")
+            default_cache_dir = os.path.join(
+                _env_path(environ, "XDG_CACHE_HOME") or os.path.join(home, ".cache"), "poem")
+
+        # POEM_HOME moves everything poem installs, versions included
+        poem_home = _env_path(environ, "POEM_HOME")
+        self.poem_home = poem_home or default_poem_home
+        self.poetry_home = poem_home or default_poetry_home
+        self.config_dir = _env_path(environ, "POEM_CONFIG_DIR") or default_config_dir
+        self.cache_dir = _env_path(environ, "POEM_CACHE_DIR") or default_cache_dir
+        self.store = _env_path(environ, "POEM_STORE")
+        self._created: Set[str] = set()
+
+    @property
+    def shim_dir(self) -> str:
+        return os.path.join(self.poem_home, "shims")
+
+    @property
+    def shim_bundle_dir(self) -> str:
+        return os.path.join(self.poem_home, "shim-bundle")
+
+    @property
+    def stats_dir(self) -> str:
+        return os.path.join(self.poem_home, "stats")
+
+    @property
+    def log_dir(self) -> str:
+        return os.path.join(self.poem_home, "logs")
+
+    def ensure_dir(self, path: str) -> str:
+        """Create a directory the first time it is asked for in this process."""
+        if path not in self._created:
+            os.makedirs(path, exist_ok=True)
+            self._created.add(path)
+        return path
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Get the settings of this process, reading the environment on first use."""
+    return Settings()
+
+
+def reset_settings() -> None:
+    """Forget the loaded settings, so the next call reads the environment again.
+
+    For tests and tools that change the environment of a running process.
+    """
+    get_settings.cache_clear()
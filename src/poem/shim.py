@@ -4,34 +4,126 @@
 import os
 import sys
 import subprocess
-from pathlib import Path
-from poem.core import _get_active_version, _get_poetry_bin
+from time import perf_counter
+# Only the resolution path is imported up front; poem.core, with the HTTP
+# client and installer, is loaded when a missing version is installed
+from poem.resolve import (
+    _get_active_version,
+    get_global_version_file,
+    get_poetry_bin,
+    is_installed,
+)
+from poem.stats import UNRESOLVED_VERSION, record_invocation
+from poem.trace import span
+
+
+def _auto_install_enabled() -> bool:
+    """Check whether POEM_AUTO_INSTALL asks the shim to install missing versions."""
+    return os.environ.get("POEM_AUTO_INSTALL", "").lower() in ("1", "true", "yes")
+
+
+def _auto_install_timeout() -> float:
+    """Get how long to wait for a concurrent install (POEM_AUTO_INSTALL_TIMEOUT)."""
+    from poem.core import AUTO_INSTALL_TIMEOUT
+
+    try:
+        return float(os.environ.get("POEM_AUTO_INSTALL_TIMEOUT", AUTO_INSTALL_TIMEOUT))
+    except ValueError:
+        return AUTO_INSTALL_TIMEOUT
+
+
+def _resolution_key() -> str:
+    """Describe what version resolution depends on in the current directory.
+
+    Built exactly like the key in the Unix shim script, which only uses
+    shell builtins: $PWD, then the first line of .poetry-version and of the
+    global version file when they exist.
+    """
+    cwd = os.environ.get("PWD")
+    try:
+        if not cwd or not os.path.samestat(os.stat(cwd), os.stat(".")):
+            cwd = os.getcwd()
+    except OSError:
+        cwd = os.getcwd()
+
+    key = cwd
+    for tag, version_file in (("l", ".poetry-version"),
+                              ("g", get_global_version_file())):
+        if os.path.isfile(version_file):
+            with open(version_file, "r", newline="") as f:
+                key += f"|{tag}:" + f.readline().rstrip("\n")
+    return key
 
 
 def main():
     """Run poetry with the appropriate version."""
+    if os.environ.get("POEM_SHIM_CHECK"):
+        # Self-check used by `poem init` to verify the installed shim runs
+        from poem import __version__
+        print(f"poem shim {__version__}")
+        sys.exit(0)
+
+    start = perf_counter()
     try:
-        # Get the active version of Poetry
-        version, source = _get_active_version()
+        env = os.environ.copy()
+        key = _resolution_key()
+        if (env.get("POEM_RESOLVED_KEY") == key and env.get("POEM_RESOLVED_VERSION")
+                and env.get("POEM_RESOLVED_BIN")):
+            # A parent shim resolved the version for this directory and
+            # version files already
+            version, source = env["POEM_RESOLVED_VERSION"], "inherited"
+            poetry_bin = env["POEM_RESOLVED_BIN"]
+            installed = os.path.exists(poetry_bin)
+        else:
+            # Get the active version of Poetry
+            version, source = _get_active_version()
 
-        if version == "unknown":
-            print("No poetry version is active. Please install one first:")
-            print("  poem install 1.2.3")
-            sys.exit(1)
+            if version == "unknown":
+                print("No poetry version is active. Please install one first:")
+                print("  poem install 1.2.3")
+                record_invocation(UNRESOLVED_VERSION, source, perf_counter() - start, 1, None)
+                sys.exit(1)
+
+            # Get the path to the appropriate Poetry binary
+            poetry_bin = get_poetry_bin(version)
 
-        # Get the path to the appropriate Poetry binary
-        poetry_bin = _get_poetry_bin(version)
+            # A version still being installed already has its poetry script,
+            # so the install marker is checked too
+            installed = is_installed(version)
 
-        if not os.path.exists(poetry_bin):
+            # Install a missing version once, however many shims ask for it
+            if _auto_install_enabled() and not installed:
+                from poem.core import _ensure_installed
+
+                _ensure_installed(version, timeout=_auto_install_timeout())
+                installed = True
+
+        if not installed:
             print(f"Poetry version {version} is not installed or is broken.")
             print(f"Please reinstall it: poem install {version}")
+            print("Or set POEM_AUTO_INSTALL=1 to install missing versions on first use.")
+            record_invocation(version, source, perf_counter() - start, 1, None)
             sys.exit(1)
 
+        # Let nested poetry calls skip resolution while nothing changed
+        if source in ("local", "global", "inherited"):
+            env.update(POEM_RESOLVED_VERSION=version, POEM_RESOLVED_BIN=poetry_bin,
+                       POEM_RESOLVED_KEY=key)
+        else:
+            for name in ("POEM_RESOLVED_VERSION", "POEM_RESOLVED_BIN", "POEM_RESOLVED_KEY"):
+                env.pop(name, None)
+
         # Forward all arguments to the Poetry binary
-        result = subprocess.run(
-            [poetry_bin] + sys.argv[1:],
-            check=False,
-        )
+        started = perf_counter()
+        with span("poetry", "subprocess", version=version, source=source):
+            result = subprocess.run(
+                [poetry_bin] + sys.argv[1:],
+                env=env,
+                check=False,
+            )
+
+        record_invocation(version, source, started - start, result.returncode,
+                          perf_counter() - started)
 
         # Exit with the same code as Poetry
         sys.exit(result.returncode)
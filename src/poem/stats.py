@@ -0,0 +1,288 @@
+"""Usage statistics of the poetry shim.
+
+Every shim run appends one JSON line to a log with a single O_APPEND
+write, so concurrent shims never take a lock or wait on one another. The
+log is rotated by size, keeping one previous generation; the counts of a
+generation are folded into a totals file before it is dropped, so the
+counters only ever grow. `poem stats` aggregates both files with the
+totals and can write them for the Prometheus node exporter's textfile
+collector.
+"""
+
+import json
+import os
+from time import time
+from typing import Dict, List, Optional
+
+from poem.errors import PoemError
+from poem.settings import get_settings
+
+STATS_FILE = "shim-stats.jsonl"
+# The log is rotated to STATS_FILE + ".1" once it grows past this size
+MAX_STATS_BYTES = 4 * 1024 * 1024
+# Counts of the log generations already dropped by rotation
+TOTALS_FILE = "shim-stats-totals.json"
+# Recorded as the version of shim runs that found no version to run
+UNRESOLVED_VERSION = "unresolved"
+# Appends of at most this size are atomic with respect to each other
+_MAX_RECORD_BYTES = 512
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _get_stats_dir() -> str:
+    """Get the directory holding the shim statistics, next to the shims."""
+    return get_settings().stats_dir
+
+
+def _stats_enabled() -> bool:
+    """Check whether POEM_STATS allows recording (on unless set to 0)."""
+    return os.environ.get("POEM_STATS", "1").lower() not in ("0", "false", "no")
+
+
+def record_invocation(version: str, source: str, resolve_seconds: float,
+                      exit_code: Optional[int], run_seconds: Optional[float]) -> None:
+    """Append one shim invocation to the statistics log.
+
+    Never raises and never blocks: if the log cannot be written at once,
+    the record is dropped.
+
+    Args:
+        version: The resolved Poetry version
+        source: Where the version came from ("local", "global", ...)
+        resolve_seconds: Time the shim spent before starting poetry
+        exit_code: Poetry's exit code, or the shim's when poetry did not run
+        run_seconds: How long poetry ran, or None when it did not run
+    """
+    if not _stats_enabled():
+        return
+    record = json.dumps({
+        "ts": round(time(), 3),
+        "version": version,
+        "source": source,
+        "resolve_ms": round(resolve_seconds * 1000, 3),
+        "exit_code": exit_code,
+        "run_ms": None if run_seconds is None else round(run_seconds * 1000, 1),
+    }, separators=(",", ":")).encode("utf-8") + b"\n"
+    if len(record) > _MAX_RECORD_BYTES:
+        return
+
+    path = os.path.join(_get_stats_dir(), STATS_FILE)
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_NONBLOCK", 0)
+    try:
+        try:
+            fd = os.open(path, flags, 0o644)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd = os.open(path, flags, 0o644)
+        try:
+            _rotate_if_full(fd, path)
+            os.write(fd, record)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+def _rotate_if_full(fd: int, path: str) -> None:
+    """Move a full log aside; the open descriptor follows it to the old name.
+
+    The inode check keeps racing shims from rotating twice and discarding
+    the previous generation.
+    """
+    info = os.fstat(fd)
+    if info.st_size < MAX_STATS_BYTES:
+        return
+    if os.stat(path).st_ino == info.st_ino:
+        _retire_generation(f"{path}.1")
+        os.replace(path, f"{path}.1")
+
+
+def _retire_generation(path: str) -> None:
+    """Fold the counts of the log generation about to be dropped into the totals.
+
+    The generation is claimed by renaming it first, so racing shims never
+    count it twice.
+    """
+    claimed = f"{path}.{os.getpid()}.retiring"
+    try:
+        os.rename(path, claimed)
+    except OSError:
+        return
+    try:
+        stats_dir = os.path.dirname(path)
+        totals = read_totals(stats_dir)
+        for record in _read_log(claimed):
+            version = totals.setdefault(record["version"], {
+                "invocations": 0, "failures": 0, "resolve_ms_sum": 0.0, "sources": {}})
+            source = record.get("source", "unknown")
+            version["invocations"] += 1
+            version["failures"] += 1 if record.get("exit_code") else 0
+            version["resolve_ms_sum"] = round(
+                version["resolve_ms_sum"] + (record.get("resolve_ms") or 0.0), 3)
+            version["sources"][source] = version["sources"].get(source, 0) + 1
+
+        totals_file = os.path.join(stats_dir, TOTALS_FILE)
+        tmp_file = f"{totals_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(totals, f, sort_keys=True)
+        os.replace(tmp_file, totals_file)
+    finally:
+        os.unlink(claimed)
+
+
+def _read_log(path: str) -> List[Dict]:
+    """Read the records of one log file, skipping damaged lines."""
+    try:
+        with open(path, "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return []
+    records = []
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # A line cut short by a crash or a full disk
+            continue
+        if isinstance(record, dict) and "version" in record:
+            records.append(record)
+    return records
+
+
+def read_records(stats_dir: Optional[str] = None) -> List[Dict]:
+    """Read the records of the current and the rotated log, oldest first."""
+    stats_dir = stats_dir or _get_stats_dir()
+    return (_read_log(os.path.join(stats_dir, f"{STATS_FILE}.1"))
+            + _read_log(os.path.join(stats_dir, STATS_FILE)))
+
+
+def read_totals(stats_dir: Optional[str] = None) -> Dict[str, Dict]:
+    """Read the per-version counts of the log generations dropped by rotation."""
+    try:
+        with open(os.path.join(stats_dir or _get_stats_dir(), TOTALS_FILE), "r") as f:
+            totals = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return totals if isinstance(totals, dict) else {}
+
+
+def _quantile(values: List[float], q: float) -> Optional[float]:
+    """Get the nearest-rank quantile of sorted values."""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(q * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def aggregate(records: List[Dict], totals: Optional[Dict[str, Dict]] = None) -> Dict:
+    """Summarize shim records per Poetry version.
+
+    Args:
+        records: The records still in the logs
+        totals: The counts of rotated-out records (see read_totals), added
+            to the counts; quantiles only cover the records
+
+    Returns:
+        A dict with the total "invocations", "failures" and "resolve_ms"
+        quantiles, and "versions" mapping each version to its own
+        "invocations", "failures", "sources" counts and "resolve_ms"
+        quantiles (None without records).
+    """
+    def summarize(group: List[Dict]) -> Dict:
+        latencies = sorted(record.get("resolve_ms") or 0.0 for record in group)
+        return {
+            "invocations": len(group),
+            "failures": sum(1 for record in group if record.get("exit_code")),
+            "resolve_ms": {str(q): _quantile(latencies, q) for q in QUANTILES},
+            "resolve_ms_sum": round(sum(latencies), 3),
+        }
+
+    by_version: Dict[str, List[Dict]] = {}
+    for record in records:
+        by_version.setdefault(record["version"], []).append(record)
+
+    summary = summarize(records)
+    summary["versions"] = {}
+    for version, group in sorted(by_version.items()):
+        sources: Dict[str, int] = {}
+        for record in group:
+            source = record.get("source", "unknown")
+            sources[source] = sources.get(source, 0) + 1
+        summary["versions"][version] = dict(summarize(group), sources=sources)
+
+    for version, counts in sorted((totals or {}).items()):
+        stats = summary["versions"].setdefault(
+            version, dict(summarize([]), sources={}))
+        for target in (stats, summary):
+            target["invocations"] += counts.get("invocations", 0)
+            target["failures"] += counts.get("failures", 0)
+            target["resolve_ms_sum"] = round(
+                target["resolve_ms_sum"] + counts.get("resolve_ms_sum", 0.0), 3)
+        for source, count in counts.get("sources", {}).items():
+            stats["sources"][source] = stats["sources"].get(source, 0) + count
+    summary["versions"] = dict(sorted(summary["versions"].items()))
+    return summary
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(summary: Dict) -> str:
+    """Render a summary in the Prometheus text exposition format."""
+    lines = [
+        "# HELP poem_shim_invocations_total Poetry runs through the poem shim.",
+        "# TYPE poem_shim_invocations_total counter",
+    ]
+    for version, stats in summary["versions"].items():
+        for source, count in sorted(stats["sources"].items()):
+            lines.append(f'poem_shim_invocations_total{{version="{_label(version)}",'
+                         f'source="{_label(source)}"}} {count}')
+    lines += [
+        "# HELP poem_shim_failures_total Shim runs that exited non-zero.",
+        "# TYPE poem_shim_failures_total counter",
+    ]
+    for version, stats in summary["versions"].items():
+        lines.append(f'poem_shim_failures_total{{version="{_label(version)}"}} '
+                     f'{stats["failures"]}')
+    lines += [
+        "# HELP poem_shim_resolve_seconds Time the shim spends before starting poetry.",
+        "# TYPE poem_shim_resolve_seconds summary",
+    ]
+    for version, stats in summary["versions"].items():
+        label = f'version="{_label(version)}"'
+        for q, value in stats["resolve_ms"].items():
+            if value is None:
+                continue
+            lines.append(f'poem_shim_resolve_seconds{{{label},quantile="{q}"}} '
+                         f'{value / 1000:.6f}')
+        lines.append(f"poem_shim_resolve_seconds_sum{{{label}}} "
+                     f"{stats['resolve_ms_sum'] / 1000:.6f}")
+        lines.append(f"poem_shim_resolve_seconds_count{{{label}}} {stats['invocations']}")
+    return "\n".join(lines) + "\n"
+
+
+def collect_stats(textfile: Optional[str] = None) -> Dict:
+    """Summarize shim usage and optionally write a textfile for Prometheus.
+
+    Args:
+        textfile: A .prom file to write for the node exporter's textfile
+            collector; it is replaced atomically
+
+    Returns:
+        The summary (see aggregate), with the "stats_dir" it was read from.
+
+    Raises:
+        PoemError: If the textfile cannot be written.
+    """
+    summary = aggregate(read_records(), read_totals())
+    summary["stats_dir"] = _get_stats_dir()
+    if textfile:
+        tmp_file = f"{textfile}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, "w") as f:
+                f.write(render_prometheus(summary))
+            os.replace(tmp_file, textfile)
+        except OSError as e:
+            raise PoemError(f"Failed to write {textfile}: {str(e)}") from e
+    return summary
@@ -0,0 +1,117 @@
+"""Administration of the shared, read-only install store."""
+
+import os
+import stat
+from typing import Dict, List, Optional
+
+from poem.core import (
+    get_store_dir,
+    get_version_dir,
+    install_versions,
+    is_installed,
+    remove_version_dir,
+    version_key,
+)
+from poem.errors import PoemError
+from poem.fetch import DEFAULT_CONCURRENCY
+
+
+def _require_store(store: Optional[str]) -> str:
+    """Get the store to administer, raising PoemError if none is configured."""
+    store = os.path.abspath(store) if store else get_store_dir()
+    if not store:
+        raise PoemError("No shared store configured. Set POEM_STORE or pass --store.")
+    return store
+
+
+def _make_world_readable(path: str) -> None:
+    """Let every user read the tree and traverse/execute what its owner can."""
+    for root, dirs, files in os.walk(path):
+        for name in [root] + [os.path.join(root, f) for f in files]:
+            if os.path.islink(name):
+                continue
+            mode = os.stat(name).st_mode
+            extra = stat.S_IRGRP | stat.S_IROTH
+            if mode & stat.S_IXUSR:
+                extra |= stat.S_IXGRP | stat.S_IXOTH
+            os.chmod(name, mode | extra)
+
+
+def store_install(versions: List[str], store: Optional[str] = None,
+                  jobs: int = DEFAULT_CONCURRENCY) -> Dict:
+    """Install versions into the shared store for every user of the host.
+
+    Args:
+        versions: The versions to install
+        store: The store directory (default: POEM_STORE)
+        jobs: The maximum number of installs running at the same time
+
+    Returns:
+        A dict with the "store" directory, the versions "installed" and
+        those "skipped" as already in the store.
+
+    Raises:
+        PoemError: If no store is configured.
+        InstallError: If a version fails to install.
+    """
+    store = _require_store(store)
+    os.makedirs(os.path.join(store, "venv"), exist_ok=True)
+
+    versions = list(dict.fromkeys(versions))
+    missing = [version for version in versions if not is_installed(version, home=store)]
+    if missing:
+        install_versions(missing, jobs=jobs, home=store)
+        for version in missing:
+            _make_world_readable(get_version_dir(version, home=store))
+    return {"store": store, "installed": missing,
+            "skipped": [version for version in versions if version not in missing]}
+
+
+def store_uninstall(versions: List[str], store: Optional[str] = None) -> Dict:
+    """Remove versions from the shared store.
+
+    Args:
+        versions: The versions to remove
+        store: The store directory (default: POEM_STORE)
+
+    Returns:
+        A dict with the "store" directory, the versions "removed" and those
+        "skipped" as not in the store.
+
+    Raises:
+        PoemError: If no store is configured, or a version cannot be removed.
+    """
+    store = _require_store(store)
+    result: Dict = {"store": store, "removed": [], "skipped": []}
+    for version in versions:
+        version_dir = get_version_dir(version, home=store)
+        if not os.path.exists(version_dir):
+            result["skipped"].append(version)
+            continue
+        try:
+            remove_version_dir(version_dir)
+        except OSError as e:
+            raise PoemError(f"Failed to remove poetry {version}: {str(e)}") from e
+        result["removed"].append(version)
+    return result
+
+
+def store_list(store: Optional[str] = None) -> Dict:
+    """List the versions in the shared store.
+
+    Args:
+        store: The store directory (default: POEM_STORE)
+
+    Returns:
+        A dict with the "store" directory and its "versions", oldest first.
+
+    Raises:
+        PoemError: If no store is configured.
+    """
+    store = _require_store(store)
+    venv_dir = os.path.join(store, "venv")
+    versions = []
+    if os.path.isdir(venv_dir):
+        versions = [d for d in os.listdir(venv_dir)
+                    if not d.startswith(".") and os.path.isdir(os.path.join(venv_dir, d))]
+    return {"store": store, "versions": sorted(versions, key=version_key)}
@@ -0,0 +1,89 @@
+"""Install every Poetry version pinned in a directory tree."""
+
+import os
+from typing import Dict, List
+
+from poem.core import (
+    _VERSION_PATTERN,
+    _get_installed_versions,
+    install_versions,
+    version_key,
+)
+from poem.errors import PoemError
+from poem.fetch import DEFAULT_CONCURRENCY
+from poem.trace import span
+
+VERSION_FILE = ".poetry-version"
+# Directories that never contain projects worth scanning
+SKIP_DIRS = frozenset({".git", "node_modules", ".venv"})
+
+
+def find_pinned_versions(root: str) -> Dict[str, List[str]]:
+    """Find every .poetry-version file below root.
+
+    The tree is walked iteratively with os.scandir, without following
+    symlinks, and directories in SKIP_DIRS are not descended into.
+
+    Returns:
+        A mapping of pinned version to the project directories pinning it.
+    """
+    pins: Dict[str, List[str]] = {}
+    pending = [root]
+    with span("scan pinned versions", "fs", path=root):
+        while pending:
+            directory = pending.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIP_DIRS:
+                            pending.append(entry.path)
+                    elif entry.name == VERSION_FILE and entry.is_file():
+                        with open(entry.path, "r") as f:
+                            version = f.read().strip()
+                        if version:
+                            pins.setdefault(version, []).append(directory)
+                except OSError:
+                    continue
+    return pins
+
+
+def sync_versions(path: str = ".", dry_run: bool = False,
+                  jobs: int = DEFAULT_CONCURRENCY) -> Dict:
+    """Install the versions pinned under path that are not installed yet.
+
+    Args:
+        path: The root of the tree to scan
+        dry_run: If True, only work out the plan
+        jobs: The maximum number of installs running at the same time
+
+    Returns:
+        The plan: the scanned "root", the "pinned" versions with the
+        projects pinning them, the "missing" versions and those
+        "installed" by this sync. Pins that are not version numbers are
+        never installed; they are listed under "invalid" with their
+        projects.
+
+    Raises:
+        PoemError: If path is not a directory.
+        InstallError: If a missing version fails to install.
+    """
+    root = os.path.abspath(path)
+    if not os.path.isdir(root):
+        raise PoemError(f"{path} is not a directory")
+
+    found = find_pinned_versions(root)
+    invalid = {version: found.pop(version) for version in sorted(found)
+               if not _VERSION_PATTERN.match(version)}
+    pins = {version: found[version] for version in sorted(found, key=version_key)}
+    installed = set(_get_installed_versions())
+    missing = [version for version in pins if version not in installed]
+    plan = {"root": root, "pinned": pins, "missing": missing, "installed": [],
+            "invalid": invalid}
+    if missing and not dry_run:
+        plan["installed"] = install_versions(missing, jobs=jobs)
+    return plan
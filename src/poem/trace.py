@@ -0,0 +1,151 @@
+"""Lightweight tracing of where poem spends its time.
+
+Tracing is off unless POEM_TRACE is set or --trace is passed. With
+POEM_TRACE=1 a summary table is printed to stderr when the process exits;
+with POEM_TRACE=<file>.json a Chrome trace (chrome://tracing, Perfetto) is
+written to that file instead.
+"""
+
+import atexit
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO
+
+_lock = threading.Lock()
+_events: List[Dict[str, Any]] = []
+_enabled = False
+_output: Optional[str] = None
+_origin_ns = time.perf_counter_ns()
+_null_span = contextlib.nullcontext()
+
+
+def enable(output: Optional[str] = None) -> None:
+    """Start recording spans and report them when the process exits.
+
+    Args:
+        output: Path of a Chrome trace JSON file to write; a summary table
+            is printed to stderr when this is None or "-"
+    """
+    global _enabled, _output
+    if not _enabled:
+        atexit.register(report)
+    _enabled = True
+    _output = None if output in (None, "-") else output
+
+
+def is_enabled() -> bool:
+    """Check whether spans are being recorded."""
+    return _enabled
+
+
+@contextlib.contextmanager
+def _record(name: str, category: str, args: Dict[str, Any]) -> Iterator[None]:
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        end = time.perf_counter_ns()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - _origin_ns) / 1000,
+            "dur": (end - start) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {key: str(value) for key, value in args.items()},
+        }
+        with _lock:
+            _events.append(event)
+
+
+def span(name: str, category: str = "poem", **args: Any):
+    """Time a block of code as a named span.
+
+    Returns a shared no-op context manager while tracing is disabled, so
+    instrumented code costs next to nothing in normal runs.
+
+    Args:
+        name: The span name shown in reports
+        category: The kind of work ("resolve", "fs", "subprocess", "http", ...)
+        **args: Extra details attached to the span in Chrome traces
+    """
+    if not _enabled:
+        return _null_span
+    return _record(name, category, args)
+
+
+def traced(category: str, name: Optional[str] = None) -> Callable:
+    """Decorate a function so each call is recorded as a span."""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _record(span_name, category, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary() -> List[Dict[str, Any]]:
+    """Aggregate recorded spans by name, slowest total first."""
+    totals: Dict[str, Dict[str, Any]] = {}
+    with _lock:
+        events = list(_events)
+    for event in events:
+        entry = totals.setdefault(event["name"], {
+            "name": event["name"], "category": event["cat"],
+            "count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        duration_ms = event["dur"] / 1000
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        entry["max_ms"] = max(entry["max_ms"], duration_ms)
+    return sorted(totals.values(), key=lambda entry: entry["total_ms"], reverse=True)
+
+
+def _print_summary(stream: TextIO) -> None:
+    rows = summary()
+    wall_ms = (time.perf_counter_ns() - _origin_ns) / 1e6
+    stream.write(f"\npoem trace ({wall_ms:.1f} ms since start)\n")
+    stream.write(f"{'span':32} {'category':12} {'calls':>5} "
+                 f"{'total ms':>10} {'mean ms':>9} {'max ms':>9}\n")
+    for row in rows:
+        stream.write(
+            f"{row['name'][:32]:32} {row['category'][:12]:12} {row['count']:5d} "
+            f"{row['total_ms']:10.2f} {row['total_ms'] / row['count']:9.2f} "
+            f"{row['max_ms']:9.2f}\n")
+
+
+def report() -> None:
+    """Write the recorded spans as a Chrome trace or a summary table."""
+    if not _enabled:
+        return
+    if _output:
+        with _lock:
+            events = list(_events)
+        try:
+            with open(_output, "w") as f:
+                json.dump({"traceEvents": events,
+                           "displayTimeUnit": "ms"}, f)
+        except OSError as e:
+            print(f"Failed to write trace to {_output}: {str(e)}",
+                  file=sys.stderr)
+    else:
+        _print_summary(sys.stderr)
+
+
+def _configure_from_env() -> None:
+    value = os.environ.get("POEM_TRACE", "")
+    if value and value != "0":
+        enable(None if value in ("1", "-") else value)
+
+
+_configure_from_env()
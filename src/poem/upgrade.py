@@ -0,0 +1,253 @@
+"""Upgrade an installed Poetry version in place of a full reinstall."""
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from time import time
+from typing import Dict, Optional
+
+from poem.core import (
+    INSTALLING_MARKER,
+    _finalize_install,
+    _find_release,
+    _get_index_url,
+    _get_venv_python_at,
+    _install_lock,
+    _python_satisfies,
+    _read_manifest_at,
+    _relocate_version_dir,
+    _write_manifest_at,
+    get_global_version_file,
+    get_poetry_home,
+    get_version_dir,
+    load_release_index,
+    remove_version_dir,
+)
+from poem.errors import PoemError, VersionNotInstalledError
+from poem.http import HTTPError
+from poem.lock import LockTimeout
+from poem.trace import span
+from poem.verify import _site_packages
+
+
+def _link_or_copy(src: str, dst: str) -> str:
+    """Hardlink a file into the clone, copying it when linking is not possible."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+    return dst
+
+
+def _clone_version_dir(source: str, destination: str) -> None:
+    """Clone a version directory, sharing file contents through hardlinks.
+
+    Everything that later rewrites a file in the clone (pip, compileall,
+    _relocate_version_dir, _write_manifest) replaces it with a new file
+    instead of writing through the link, so the source is never modified.
+    """
+    with span("clone version", "fs", path=source):
+        shutil.copytree(source, destination, symlinks=True,
+                        copy_function=_link_or_copy)
+
+
+def _installed_dists(venv_dir: str) -> Dict[str, str]:
+    """Map each distribution installed in a venv to its version."""
+    dists = {}
+    for site_packages in _site_packages(venv_dir):
+        for entry in os.listdir(site_packages):
+            if entry.endswith(".dist-info"):
+                name, _, dist_version = entry[:-len(".dist-info")].rpartition("-")
+                dists[name.lower()] = dist_version
+    return dists
+
+
+def _update_pin(version_file: str, from_version: str, to_version: str) -> bool:
+    """Atomically repoint a version file pinned to from_version.
+
+    Returns:
+        True if the file was pinned to from_version and now names to_version.
+    """
+    try:
+        with open(version_file, "r") as f:
+            if f.read().strip() != from_version:
+                return False
+    except OSError:
+        return False
+
+    tmp_file = f"{version_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "w") as f:
+        f.write(to_version)
+    os.replace(tmp_file, version_file)
+    return True
+
+
+def _venv_python_version(version_dir: str) -> Optional[str]:
+    """Read the Python version of a version's venv, or None if it is not recorded."""
+    try:
+        with open(os.path.join(version_dir, "venv", "pyvenv.cfg"), "r") as f:
+            for line in f:
+                key, _, value = line.partition("=")
+                if key.strip() in ("version", "version_info"):
+                    return ".".join(value.strip().split(".")[:3])
+    except OSError:
+        pass
+    return None
+
+
+def _check_requires_python(from_version: str, to_version: str, source_dir: str) -> None:
+    """Refuse a release that cannot run on the interpreter of the venv being upgraded.
+
+    Without a recorded Python version or a reachable release index, the
+    check is skipped, as it is for installs.
+    """
+    python = _venv_python_version(source_dir)
+    if python is None:
+        return
+    try:
+        release = _find_release(load_release_index(), to_version)
+    except (OSError, HTTPError, ValueError):
+        return
+    if release and not _python_satisfies(release["requires_python"], python):
+        raise PoemError(f"poetry {to_version} requires Python {release['requires_python']}, "
+                        f"but poetry {from_version} runs on Python {python}")
+
+
+def upgrade_version(from_version: str, to_version: str, keep: bool = False,
+                    update_pins: bool = True, compile_bytecode: bool = True) -> Dict:
+    """Upgrade an installed version by cloning it and upgrading the clone.
+
+    The venv of from_version is cloned with hardlinks and pip upgrades only
+    the distributions whose versions differ in to_version. The clone is
+    prepared under a hidden staging name and renamed into place when it is
+    complete, so to_version never appears half-installed. The global
+    version and the .poetry-version of the working directory are then
+    repointed, and from_version is removed unless keep is set.
+
+    Args:
+        from_version: The installed version to upgrade from
+        to_version: The version to upgrade to
+        keep: If True, leave from_version installed
+        update_pins: If True, repoint version files naming from_version;
+            leaving them requires keep, so they still name an installed version
+        compile_bytecode: If True, precompile the upgraded venv
+
+    Returns:
+        A dict with "from", "to", "path", the "changed" distributions (each
+        mapped to its old and new version, None when added or removed), the
+        "pins" that were updated, whether from_version was "removed", the
+        "duration" in seconds and any "warnings".
+
+    Raises:
+        VersionNotInstalledError: If from_version is not in the user's home.
+        PoemError: If to_version is already installed or does not support
+            the Python of from_version's venv, the upgrade fails, or
+            update_pins is off without keep.
+    """
+    if not update_pins and not keep:
+        raise PoemError(f"Leaving the version files pinned to {from_version} "
+                        f"requires keeping it installed (--keep)")
+    home = get_poetry_home()
+    source_dir = get_version_dir(from_version, home=home)
+    target_dir = get_version_dir(to_version, home=home)
+    if from_version == to_version:
+        raise PoemError(f"Poetry {from_version} is already at {to_version}")
+    if (not os.path.isdir(source_dir)
+            or os.path.isfile(os.path.join(source_dir, INSTALLING_MARKER))):
+        if os.path.isdir(get_version_dir(from_version)):
+            raise VersionNotInstalledError(
+                from_version, f"Poetry version {from_version} is installed in the shared "
+                              f"store; upgrade it with: poem store install {to_version}")
+        raise VersionNotInstalledError(from_version)
+    _check_requires_python(from_version, to_version, source_dir)
+
+    start = time()
+    staging_dir = os.path.join(home, "venv", f".{to_version}.upgrade-{os.getpid()}")
+    try:
+        # Shares the lock of installs, so the two never race
+        with _install_lock(to_version, home=home):
+            if os.path.exists(target_dir):
+                raise PoemError(f"Poetry version {to_version} is already installed")
+
+            changed = _prepare_upgrade(from_version, to_version, source_dir,
+                                       staging_dir, target_dir)
+            os.rename(staging_dir, target_dir)
+    except LockTimeout as e:
+        raise PoemError(f"Failed to upgrade poetry {from_version}: {str(e)}") from e
+    except (OSError, subprocess.CalledProcessError) as e:
+        detail = getattr(e, "stderr", None) or str(e)
+        raise PoemError(f"Failed to upgrade poetry {from_version} to {to_version}: "
+                        f"{detail.strip()}") from e
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    try:
+        _finalize_install(to_version, compile_bytecode=compile_bytecode, home=home)
+    except OSError as e:
+        # Still marked as installing, so nothing runs it; do not leave it behind
+        shutil.rmtree(target_dir, ignore_errors=True)
+        raise PoemError(f"Failed to upgrade poetry {from_version} to {to_version}: "
+                        f"{str(e)}") from e
+
+    pins = []
+    if update_pins:
+        for version_file in (get_global_version_file(),
+                             os.path.abspath(".poetry-version")):
+            if _update_pin(version_file, from_version, to_version):
+                pins.append(version_file)
+
+    removed = False
+    warnings = []
+    if not keep:
+        try:
+            remove_version_dir(source_dir)
+            removed = True
+        except OSError as e:
+            warnings.append(f"could not remove poetry {from_version}: {str(e)}")
+
+    duration = round(time() - start, 3)
+    return {
+        "from": from_version,
+        "to": to_version,
+        "path": target_dir,
+        "changed": changed,
+        "pins": pins,
+        "removed": removed,
+        "duration": duration,
+        "warnings": warnings,
+    }
+
+
+def _prepare_upgrade(from_version: str, to_version: str, source_dir: str,
+                     staging_dir: str, target_dir: str) -> Dict:
+    """Build the upgraded version in staging_dir, ready to be renamed to target_dir.
+
+    Returns:
+        The distributions that changed, mapped to their old and new versions.
+    """
+    _clone_version_dir(source_dir, staging_dir)
+    # The clone stays marked until _finalize_install has run at its final path
+    Path(staging_dir, INSTALLING_MARKER).touch()
+    _relocate_version_dir(staging_dir, source_dir, staging_dir)
+
+    venv_dir = os.path.join(staging_dir, "venv")
+    python = _get_venv_python_at(staging_dir)
+    before = _installed_dists(venv_dir)
+    with span("pip upgrade", "subprocess", version=to_version):
+        subprocess.run(
+            [python, "-m", "pip", "install", "--quiet", "--disable-pip-version-check",
+             "--index-url", _get_index_url(), f"poetry=={to_version}"],
+            check=True, capture_output=True, text=True)
+    after = _installed_dists(venv_dir)
+
+    _relocate_version_dir(staging_dir, staging_dir, target_dir)
+    manifest = _read_manifest_at(staging_dir)
+    manifest.pop("bytecode", None)
+    manifest.pop("imported_from", None)
+    manifest["upgraded_from"] = from_version
+    _write_manifest_at(staging_dir, manifest)
+
+    return {name: [before.get(name), after.get(name)]
+            for name in sorted(set(before) | set(after))
+            if before.get(name) != after.get(name)}
@@ -0,0 +1,215 @@
+"""Check installed Poetry versions against the RECORD files of their packages."""
+
+import base64
+import csv
+import glob
+import hashlib
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from poem.core import (
+    _get_venv_python,
+    get_installed_locations,
+    get_version_dir,
+    version_key,
+)
+from poem.errors import VersionNotInstalledError
+from poem.trace import span
+
+# Files are hashed in chunks, so large files never sit in memory whole
+READ_CHUNK_SIZE = 1024 * 1024
+# Files handed to a worker process at a time
+HASH_BATCH_SIZE = 64
+
+
+def _hash_file(task: Tuple[str, str]) -> Optional[str]:
+    """Hash a file the way RECORD does, or return None if it is missing.
+
+    Runs in a worker process.
+
+    Args:
+        task: The file path and the hashlib algorithm name
+    """
+    path, algorithm = task
+    digest = hashlib.new(algorithm)
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    except OSError:
+        # Unreadable files cannot match any digest
+        return ""
+    return base64.urlsafe_b64encode(digest.digest()).rstrip(b"=").decode("ascii")
+
+
+def _site_packages(venv_dir: str) -> List[str]:
+    """Find the site-packages directories of a virtual environment."""
+    return (glob.glob(os.path.join(venv_dir, "lib", "python*", "site-packages"))
+            + glob.glob(os.path.join(venv_dir, "Lib", "site-packages")))
+
+
+def _read_records(venv_dir: str) -> List[Dict]:
+    """List the files every installed distribution declares in its RECORD.
+
+    Console scripts are only checked for presence: their shebangs embed
+    the venv location and are rewritten when a version is relocated.
+
+    Returns:
+        One dict per file with "dist", "dist_version", "path" and the
+        expected "algorithm" and "digest" (None for presence-only checks).
+    """
+    scripts_dirs = {os.path.join(venv_dir, "bin"), os.path.join(venv_dir, "Scripts")}
+    entries = []
+    for site_packages in _site_packages(venv_dir):
+        for dist_info in glob.glob(os.path.join(site_packages, "*.dist-info")):
+            name, _, dist_version = os.path.basename(dist_info)[:-len(".dist-info")].rpartition("-")
+            try:
+                with open(os.path.join(dist_info, "RECORD"), "r", newline="") as f:
+                    rows = list(csv.reader(f))
+            except OSError:
+                continue
+
+            for row in rows:
+                if not row or not row[0]:
+                    continue
+                path = os.path.normpath(os.path.join(site_packages, row[0]))
+                algorithm, _, digest = (row[1] if len(row) > 1 else "").partition("=")
+                if os.path.dirname(path) in scripts_dirs:
+                    algorithm, digest = "", ""
+                entries.append({
+                    "dist": name,
+                    "dist_version": dist_version,
+                    "path": path,
+                    "algorithm": algorithm or None,
+                    "digest": digest or None,
+                })
+    return entries
+
+
+def verify_installs(versions: List[str], jobs: Optional[int] = None) -> List[Dict]:
+    """Check the files of installed versions against their RECORD hashes.
+
+    Every file of every version is hashed in one process pool, so large
+    installs and many versions are checked in parallel.
+
+    Args:
+        versions: The versions to check
+        jobs: The number of worker processes (default: one per CPU)
+
+    Returns:
+        One dict per version with "version", the number of files "checked",
+        and the "missing" and "corrupt" files, each as a dict with "dist",
+        "dist_version" and "path".
+    """
+    results = []
+    hashed: List[Tuple[Dict, Dict]] = []
+    tasks: List[Tuple[str, str]] = []
+    for version in versions:
+        venv_dir = os.path.join(get_version_dir(version), "venv")
+        result = {"version": version, "checked": 0, "missing": [], "corrupt": []}
+        results.append(result)
+        with span("read records", "fs", version=version):
+            entries = _read_records(venv_dir)
+        for entry in entries:
+            result["checked"] += 1
+            if entry["digest"] and entry["algorithm"] in hashlib.algorithms_available:
+                hashed.append((result, entry))
+                tasks.append((entry["path"], entry["algorithm"]))
+            elif not entry["path"].endswith(".pyc") and not os.path.exists(entry["path"]):
+                # Bytecode is listed without a hash and may be regenerated
+                result["missing"].append(_problem(entry))
+
+    if not tasks:
+        return results
+    with span("hash files", "fs", files=len(tasks)):
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            digests = pool.map(_hash_file, tasks, chunksize=HASH_BATCH_SIZE)
+            for (result, entry), digest in zip(hashed, digests):
+                if digest is None:
+                    result["missing"].append(_problem(entry))
+                elif digest != entry["digest"]:
+                    result["corrupt"].append(_problem(entry))
+    return results
+
+
+def has_problems(results: List[Dict]) -> bool:
+    """Check whether any verified version has missing or corrupt files."""
+    return any(result["missing"] or result["corrupt"] for result in results)
+
+
+def _problem(entry: Dict) -> Dict:
+    return {"dist": entry["dist"], "dist_version": entry["dist_version"],
+            "path": entry["path"]}
+
+
+def affected_dists(result: Dict) -> List[str]:
+    """Get the requirement specifiers of the distributions with problems."""
+    return sorted({f"{problem['dist']}=={problem['dist_version']}"
+                   for problem in result["missing"] + result["corrupt"]})
+
+
+def repair_install(result: Dict) -> None:
+    """Reinstall the distributions of a version that failed verification.
+
+    Only the affected distributions are reinstalled, without their
+    dependencies, using the version's own pip.
+
+    Raises:
+        subprocess.CalledProcessError: If pip fails.
+    """
+    dists = affected_dists(result)
+    if not dists:
+        return
+    with span("repair", "subprocess", version=result["version"]):
+        subprocess.run(
+            [_get_venv_python(result["version"]), "-m", "pip", "install",
+             "--quiet", "--force-reinstall", "--no-deps", *dists],
+            check=True, capture_output=True, text=True)
+
+
+def verify_versions(versions: List[str], repair: bool = False,
+                    jobs: Optional[int] = None) -> List[Dict]:
+    """Verify installed versions and optionally repair them.
+
+    Args:
+        versions: The versions to check; all installed versions if empty
+        repair: If True, reinstall the distributions with problems
+        jobs: The number of hashing processes (default: one per CPU)
+
+    Returns:
+        The final verification result of each version; see has_problems.
+        Versions a repair was attempted on also have a "repair" dict with
+        the reinstalled "distributions" and the "error", if it failed.
+
+    Raises:
+        VersionNotInstalledError: If a requested version is not installed.
+    """
+    installed = get_installed_locations()
+    versions = list(dict.fromkeys(versions)) or sorted(installed, key=version_key)
+    missing = [version for version in versions if version not in installed]
+    if missing:
+        raise VersionNotInstalledError(
+            missing[0], f"Poetry version(s) not installed: {', '.join(missing)}")
+
+    results = verify_installs(versions, jobs=jobs)
+    broken = [result for result in results if result["missing"] or result["corrupt"]]
+    if not repair or not broken:
+        return results
+
+    repairs = {}
+    for result in broken:
+        repairs[result["version"]] = {"distributions": affected_dists(result), "error": None}
+        try:
+            repair_install(result)
+        except (OSError, subprocess.CalledProcessError) as e:
+            detail = getattr(e, "stderr", None) or str(e)
+            repairs[result["version"]]["error"] = detail.strip()
+
+    repaired = {result["version"]: result for result in verify_installs(list(repairs), jobs=jobs)}
+    for version, result in repaired.items():
+        result["repair"] = repairs[version]
+    return [repaired.get(result["version"], result) for result in results]
@@ -0,0 +1,49 @@
+"""Shared test configuration."""
+
+import os
+
+import pytest
+
+from poem.settings import reset_settings
+
+
+@pytest.fixture(autouse=True)
+def fresh_settings(monkeypatch):
+    """Make every test read its own environment instead of a cached one.
+
+    The poem and XDG variables of the shell running the tests are cleared,
+    so they cannot move a test's files out of its temporary home.
+    """
+    for name in list(os.environ):
+        if name.startswith(("POEM_", "XDG_")):
+            monkeypatch.delenv(name)
+    reset_settings()
+    yield
+    reset_settings()
+
+
+@pytest.fixture
+def make_home(tmp_path, monkeypatch):
+    """Point HOME at a fake home with poetry versions installed.
+
+    Returns a function taking the versions to install, the version to pin
+    globally and the home directory (default: tmp_path). Each version gets
+    a bin/poetry script that echoes its version and arguments. The function
+    returns the poetry home.
+    """
+    def make(*versions, pin=None, root=None):
+        root = root or tmp_path
+        for version in versions:
+            bin_dir = root / ".poetry" / "venv" / version / "bin"
+            bin_dir.mkdir(parents=True)
+            poetry = bin_dir / "poetry"
+            poetry.write_text(f"#!/bin/sh\necho \"fake poetry {version} $*\"\n")
+            poetry.chmod(0o755)
+        if pin:
+            config_dir = root / ".config" / "poem"
+            config_dir.mkdir(parents=True)
+            (config_dir / "global-version").write_text(pin)
+        monkeypatch.setenv("HOME", str(root))
+        return root / ".poetry"
+
+    return make
@@ -0,0 +1,152 @@
+"""Tests for the poem library API and --json output."""
+
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from poem import api
+from poem.cli import main
+from poem.core import INSTALLING_MARKER
+
+
+@pytest.fixture
+def home(make_home, tmp_path, monkeypatch):
+    """Configure a poetry home with two installed versions."""
+    poetry_home = make_home("1.10.0", "1.8.3", root=tmp_path / "home")
+    project = tmp_path / "project"
+    project.mkdir()
+    monkeypatch.chdir(project)
+    return poetry_home
+
+
+def test_installed_is_sorted_by_version(home):
+    """Test that installed versions are returned as data, oldest first."""
+    versions = api.installed()
+
+    assert [entry["version"] for entry in versions] == ["1.8.3", "1.10.0"]
+    assert versions[0]["path"] == str(home / "venv" / "1.8.3")
+    assert versions[0]["shared"] is False
+
+
+def test_resolve_pinned_version(home, tmp_path):
+    """Test resolving a pin in another directory without printing."""
+    other = tmp_path / "other"
+    other.mkdir()
+    (other / ".poetry-version").write_text("1.8.3\n")
+
+    assert api.resolve(cwd=str(other)) == {
+        "version": "1.8.3",
+        "source": "local",
+        "bin": str(home / "venv" / "1.8.3" / "bin" / "poetry"),
+        "installed": True,
+    }
+
+
+@patch("poem.api.shutil.which", return_value=None)
+def test_resolve_without_poetry_raises(mock_which, home):
+    """Test that a missing poetry is an exception, not an exit."""
+    with pytest.raises(api.PoemError):
+        api.resolve()
+
+
+def test_uninstall_errors(home):
+    """Test that uninstall reports problems with exceptions."""
+    with pytest.raises(api.VersionNotInstalledError):
+        api.uninstall("9.9.9")
+
+    api.set_local("1.8.3")
+    with pytest.raises(api.PoemError):
+        api.uninstall("1.8.3")
+
+    assert api.uninstall("1.10.0") == str(home / "venv" / "1.10.0")
+    assert not (home / "venv" / "1.10.0").exists()
+
+
+def test_uninstall_sweeps_failed_removals(home):
+    """Test that an uninstall finishes removals that failed earlier."""
+    stale = home / "venv" / ".1.7.1.removing-99999"
+    (stale / "bin").mkdir(parents=True)
+    os.utime(stale, (0, 0))
+    running = home / "venv" / ".1.7.2.removing-99998"
+    running.mkdir()
+
+    api.uninstall("1.10.0")
+
+    assert not stale.exists()
+    assert running.exists()
+
+
+@patch("poem.core._install_many")
+def test_install_raises_with_failures(mock_install_many, home):
+    """Test that failed installs are collected into InstallError."""
+    mock_install_many.return_value = {"1.7.1": None, "2.0.0": "installer failed"}
+    # Interrupted half-way, so not installed
+    (home / "venv" / "1.7.1" / "bin").mkdir(parents=True)
+    (home / "venv" / "1.7.1" / "bin" / "poetry").touch()
+    (home / "venv" / "1.7.1" / INSTALLING_MARKER).touch()
+
+    with pytest.raises(api.InstallError) as excinfo:
+        api.install(["1.8.3", "1.7.1", "2.0.0"])
+
+    mock_install_many.assert_called_once()
+    assert mock_install_many.call_args.args[0] == ["1.7.1", "2.0.0"]
+    assert excinfo.value.failures == {"2.0.0": "installer failed"}
+    assert excinfo.value.installed == ["1.7.1"]
+
+
+@patch("poem.api.refresh_shim_bundle")
+@patch("poem.core._install_many", return_value={"2.0.0": None})
+def test_only_installs_refresh_the_shim_bundle(mock_install_many, mock_refresh, home):
+    """Test that the shim bundle is checked after installs, not on every command."""
+    api.set_local("1.8.3")
+    assert main(["current"]) == 0
+    assert main(["list", "--json"]) == 0
+    mock_refresh.assert_not_called()
+
+    api.install(["2.0.0"])
+    mock_refresh.assert_called_once_with()
+
+
+def test_cli_json_output(home, capsys):
+    """Test that --json prints only JSON on stdout."""
+    assert main(["local", "1.8.3", "--json"]) == 0
+    assert json.loads(capsys.readouterr().out)["version"] == "1.8.3"
+
+    assert main(["list", "--json"]) == 0
+    listed = json.loads(capsys.readouterr().out)
+    assert [entry["version"] for entry in listed] == ["1.8.3", "1.10.0"]
+
+    assert main(["uninstall", "9.9.9", "--json"]) == 1
+    assert json.loads(capsys.readouterr().out)["type"] == "VersionNotInstalledError"
+
+
+def test_diagnose_reports_lock_mismatch(home, capsys):
+    """Test that doctor data flags a lock file written by another release."""
+    api.set_local("1.10.0")
+    with open("poetry.lock", "w") as f:
+        f.write("# This file is automatically @generated by Poetry 1.8.3 "
+                "and should not be changed by hand.\n")
+
+    lock = api.diagnose(network=False)["lock"]
+
+    assert lock == {"generated_by": "1.8.3", "lock_version": None, "compatible": False}
+
+
+def test_deprecated_core_functions_use_the_api(home, capsys):
+    """Test that the pre-API core functions still work, with a warning."""
+    from poem import core
+
+    with pytest.warns(DeprecationWarning, match="poem.api.set_local"):
+        core.set_local_version("1.8.3")
+    with pytest.warns(DeprecationWarning):
+        assert core.get_current_version_with_source() == "1.8.3"
+    with pytest.warns(DeprecationWarning):
+        core.list_versions(installed_only=True)
+
+    out = capsys.readouterr().out
+    assert "Current poetry version: 1.8.3 (from local)" in out
+    assert "- 1.8.3\n- 1.10.0\n" in out
+    with pytest.raises(api.VersionNotInstalledError), pytest.warns(DeprecationWarning):
+        core.uninstall_version("9.9.9")
@@ -0,0 +1,101 @@
+"""Tests for exporting and importing bundles of installed versions."""
+
+import json
+import os
+import platform
+
+import pytest
+
+from poem.bundle import export_bundle, import_bundle
+from poem.errors import PoemError
+from poem.settings import reset_settings
+
+pytestmark = pytest.mark.skipif(
+    platform.system() == "Windows", reason="builds a Unix venv layout")
+
+
+def _fake_install(home, version):
+    """Lay out a version directory the way the Poetry installer does."""
+    version_dir = home / ".poetry" / "venv" / version
+    venv_bin = version_dir / "venv" / "bin"
+    venv_bin.mkdir(parents=True)
+    (version_dir / "venv" / "pyvenv.cfg").write_text(
+        f"home = /usr/bin\ncommand = /usr/bin/python3 -m venv {version_dir}/venv\n")
+    script = venv_bin / "poetry"
+    script.write_text(f"#!{version_dir}/venv/bin/python\nprint('{version}')\n")
+    script.chmod(0o755)
+    (version_dir / "bin").mkdir()
+    (version_dir / "bin" / "poetry").symlink_to(script)
+    (version_dir / "poem-manifest.json").write_text(json.dumps({"version": version}))
+    return version_dir
+
+
+def test_export_import_relocates_paths(tmp_path, monkeypatch, capsys):
+    """Test that a bundle moved to another home has its paths fixed up."""
+    source_home = tmp_path / "source"
+    target_home = tmp_path / "target"
+    _fake_install(source_home, "1.7.1")
+    _fake_install(source_home, "1.8.3")
+    bundle = tmp_path / "poem-bundle.tar"
+
+    monkeypatch.setenv("HOME", str(source_home))
+    export_bundle([], str(bundle), jobs=2)
+
+    # The target home stands in for another machine, a fresh process
+    monkeypatch.setenv("HOME", str(target_home))
+    reset_settings()
+    import_bundle(str(bundle), jobs=2)
+
+    version_dir = target_home / ".poetry" / "venv" / "1.8.3"
+    script = version_dir / "venv" / "bin" / "poetry"
+    assert script.read_text().startswith(f"#!{version_dir}/venv/bin/python\n")
+    assert str(source_home) not in (version_dir / "venv" / "pyvenv.cfg").read_text()
+    assert os.readlink(version_dir / "bin" / "poetry") == str(script)
+    assert os.access(script, os.X_OK)
+
+    manifest = json.loads((version_dir / "poem-manifest.json").read_text())
+    assert manifest["imported_from"] == str(source_home / ".poetry" / "venv" / "1.8.3")
+    assert sorted(os.listdir(target_home / ".poetry" / "venv")) == ["1.7.1", "1.8.3"]
+
+
+def test_import_skips_installed_versions(tmp_path, monkeypatch):
+    """Test that existing versions are kept unless --force is given."""
+    home = tmp_path / "home"
+    version_dir = _fake_install(home, "1.8.3")
+    bundle = tmp_path / "poem-bundle.tar"
+    monkeypatch.setenv("HOME", str(home))
+    export_bundle(["1.8.3"], str(bundle))
+    (version_dir / "marker").write_text("kept")
+
+    result = import_bundle(str(bundle))
+
+    assert (version_dir / "marker").exists()
+    assert result["skipped"] == ["1.8.3"]
+
+    import_bundle(str(bundle), force=True)
+
+    assert not (version_dir / "marker").exists()
+
+
+def test_forced_import_keeps_the_install_when_the_swap_fails(tmp_path, monkeypatch):
+    """Test that a replaced version is restored if its replacement cannot move in."""
+    home = tmp_path / "home"
+    version_dir = _fake_install(home, "1.8.3")
+    bundle = tmp_path / "poem-bundle.tar"
+    monkeypatch.setenv("HOME", str(home))
+    export_bundle(["1.8.3"], str(bundle))
+    (version_dir / "marker").write_text("kept")
+
+    real_rename = os.rename
+
+    def rename(src, dst):
+        if str(dst) == str(version_dir) and ".import-" in str(src) and "old" not in str(src):
+            raise OSError(28, "No space left on device")
+        return real_rename(src, dst)
+
+    monkeypatch.setattr(os, "rename", rename)
+    with pytest.raises(PoemError, match="No space left"):
+        import_bundle(str(bundle), force=True)
+
+    assert (version_dir / "marker").read_text() == "kept"
+    assert os.listdir(home / ".poetry" / "venv") == ["1.8.3"]
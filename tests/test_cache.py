@@ -0,0 +1,126 @@
+"""Tests for the size-bounded download cache."""
+
+import os
+import tempfile
+from time import time
+from unittest.mock import patch
+
+import pytest
+
+from poem.cache import cache_info, clear_cache, parse_size, prune_cache, prune_if_due
+from poem.core import _download_installer, _get_install_log
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Configure an empty poem cache."""
+    monkeypatch.setenv("POEM_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("POEM_CACHE_SIZE", raising=False)
+    (tmp_path / "cache").mkdir()
+    return tmp_path / "cache"
+
+
+def _cached_file(path, size, used, modified=None):
+    """Write a cache file last used `used` seconds ago."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    now = time()
+    os.utime(path, (now - used, now - (used if modified is None else modified)))
+    return path
+
+
+def test_parse_size():
+    """Test the sizes accepted by POEM_CACHE_SIZE and --max-size."""
+    assert parse_size("1048576") == 1048576
+    assert parse_size("500M") == 500 * 1024 ** 2
+    assert parse_size("1.5GiB") == int(1.5 * 1024 ** 3)
+    assert parse_size("2kb") == 2048
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_prune_evicts_least_recently_used_and_stale_temp_files(cache):
+    """Test that old partial downloads go first, then files by last use."""
+    oldest = _cached_file(cache / "artifacts" / "old.whl", 400, used=3000)
+    recent = _cached_file(cache / "wheels" / "recent.whl", 400, used=10)
+    middle = _cached_file(cache / "index" / "page", 400, used=1000, modified=5000)
+    stale = _cached_file(cache / "index" / "page.123.tmp", 100, used=7200)
+    in_flight = _cached_file(cache / "artifacts" / "new.whl.456.tmp", 100, used=5)
+
+    result = prune_cache(budget=600)
+
+    assert result["temp_files"] == 1
+    assert result["removed"] == 3
+    assert not stale.exists() and not oldest.exists() and not middle.exists()
+    assert recent.exists() and in_flight.exists()
+    assert result["size"] == 500
+    assert not (cache / "index").exists()
+
+
+def test_prune_if_due_runs_once_per_interval(cache, monkeypatch):
+    """Test that automatic pruning is throttled by its stamp file."""
+    monkeypatch.setenv("POEM_CACHE_SIZE", "0")
+    first = _cached_file(cache / "downloads" / "a", 10, used=100)
+    prune_if_due()
+    assert not first.exists()
+
+    second = _cached_file(cache / "downloads" / "b", 10, used=100)
+    prune_if_due()
+    assert second.exists()
+
+
+def test_info_and_clear(cache):
+    """Test that info reports each area and clear empties the cache."""
+    _cached_file(cache / "index" / "poetry", 300, used=0)
+    _cached_file(cache / "wheels" / "plugin.whl", 700, used=0)
+
+    info = cache_info()
+    assert info["size"] == 1000
+    assert info["areas"] == {"index": 300, "wheels": 700}
+
+    assert clear_cache() == {"removed": 2, "freed": 1000}
+    assert os.listdir(cache) == []
+
+
+def test_installer_is_kept_in_the_cache(cache, tmp_path):
+    """Test that the installer is downloaded once into the cache, not a temp file."""
+    with patch("poem.core.HTTP.get", return_value=b"print('installer')\n") as mock_get:
+        first = _download_installer()
+        second = _download_installer()
+
+    assert first == second
+    assert first.startswith(str(cache / "downloads"))
+    assert open(first, "rb").read() == b"print('installer')\n"
+    mock_get.assert_called_once()
+
+
+def test_prune_removes_stale_legacy_installers(cache, tmp_path, monkeypatch):
+    """Test that installers left in the temp directory go, other files stay."""
+    temp_dir = tmp_path / "tmp"
+    monkeypatch.setattr(tempfile, "tempdir", str(temp_dir))
+    stale = _cached_file(temp_dir / "tmpab_cd123.py", 10, used=7200)
+    fresh = _cached_file(temp_dir / "tmpzz9yx876.py", 10, used=5)
+    for path in (stale, fresh):
+        with open(path, "r+b") as f:
+            f.write(b'r"""\nThis script will install Poetry and its dependencies.\n')
+        os.utime(path, (os.path.getatime(path), os.path.getatime(path)))
+    unrelated = _cached_file(temp_dir / "tmpqwertyui.py", 10, used=7200)
+
+    result = prune_cache(budget=0)
+
+    assert result["temp_files"] == 1
+    assert not stale.exists()
+    assert fresh.exists() and unrelated.exists()
+
+
+def test_install_logs_are_not_evicted(cache, tmp_path, monkeypatch):
+    """Test that install logs live outside the pruned cache."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    log = _get_install_log("1.8.3")
+    assert not log.startswith(str(cache))
+
+    os.makedirs(os.path.dirname(log))
+    with open(log, "w") as f:
+        f.write("installer output\n")
+    prune_cache(budget=0)
+    assert os.path.exists(log)
@@ -1,6 +1,10 @@
 """Tests for the poem CLI."""
 
+import json
+
+from poem import api
 from poem.cli import main
+from poem.fetch import DEFAULT_CONCURRENCY
 import sys
 import os
 import pytest
@@ -17,84 +21,136 @@ def test_version(capsys):
         main(["--version"])
     assert e.value.code == 0
     captured = capsys.readouterr()
-    assert "pvm" in captured.out
+    assert "poem" in captured.out
     assert "0.1.0" in captured.out
 
 
 def test_help(capsys):
-    """Test the help output."""
+    """Test the --help flag."""
     with pytest.raises(SystemExit) as e:
         main(["--help"])
     assert e.value.code == 0
     captured = capsys.readouterr()
-    assert "usage: pvm" in captured.out
+    assert "usage: poem" in captured.out
 
 
-@patch("poem.core.list_versions")
-def test_list_command(mock_list_versions, capsys):
+@patch("poem.api.installed", return_value=[])
+def test_list_command(mock_installed, capsys):
     """Test the list command."""
     assert main(["list"]) == 0
-    mock_list_versions.assert_called_once_with(installed_only=True)
+    mock_installed.assert_called_once_with()
+    assert "No poetry versions are installed." in capsys.readouterr().out
 
 
-@patch("poem.core.get_remote_versions")
-def test_ls_remote_command(mock_get_remote_versions, capsys):
+@patch("poem.api.releases", return_value=[])
+def test_ls_remote_command(mock_releases, capsys):
     """Test the ls-remote command."""
     assert main(["ls-remote"]) == 0
-    mock_get_remote_versions.assert_called_once()
+    mock_releases.assert_called_once_with(latest=False, since=None, stable=False, python=None)
 
 
-@patch("poem.core.switch_version")
-def test_use_command(mock_switch_version, capsys):
+@patch("poem.api.use", return_value={"version": "1.1.0", "bin": "/p/bin/poetry", "path": "/p/bin"})
+@patch("poem.api.install", return_value=[])
+@patch("poem.api.installed", return_value=[{"version": "1.1.0", "manifest": {}}])
+def test_use_command(mock_installed, mock_install, mock_use, capsys):
     """Test the use command."""
     assert main(["use", "1.1.0"]) == 0
-    mock_switch_version.assert_called_once_with("1.1.0")
+    mock_install.assert_called_once_with(["1.1.0"], jobs=DEFAULT_CONCURRENCY, compile_bytecode=True)
+    mock_use.assert_called_once_with("1.1.0")
+    assert "/p/bin" in capsys.readouterr().out
 
 
-@patch("poem.core.get_current_version_with_source")
-def test_current_command(mock_get_current_version_with_source, capsys):
+@patch("poem.api.resolve", return_value={"version": "1.1.0", "source": "local",
+                                         "bin": "/p/bin/poetry", "installed": True})
+def test_current_command(mock_resolve, capsys):
     """Test the current command."""
     assert main(["current"]) == 0
-    mock_get_current_version_with_source.assert_called_once()
+    mock_resolve.assert_called_once_with()
+    assert "Current poetry version: 1.1.0 (from local)" in capsys.readouterr().out
 
 
-@patch("poem.core.install_version")
-def test_install_command(mock_install_version, capsys):
+@patch("poem.api.install", return_value=["1.1.0"])
+@patch("poem.api.installed", return_value=[])
+def test_install_command(mock_installed, mock_install, capsys):
     """Test the install command."""
     assert main(["install", "1.1.0"]) == 0
-    mock_install_version.assert_called_once_with("1.1.0")
+    mock_install.assert_called_once_with(["1.1.0"], jobs=DEFAULT_CONCURRENCY, compile_bytecode=True)
+    assert "Successfully installed poetry 1.1.0" in capsys.readouterr().out
+
+
+@patch("poem.api.install", return_value=["1.7.1", "1.8.3"])
+@patch("poem.api.installed", return_value=[])
+def test_install_multiple_versions_command(mock_installed, mock_install, capsys):
+    """Test installing several versions at once."""
+    assert main(["install", "1.7.1", "1.8.3", "--jobs", "2"]) == 0
+    mock_install.assert_called_once_with(
+        ["1.7.1", "1.8.3"], jobs=2, compile_bytecode=True)
 
 
-@patch("poem.core.uninstall_version")
-def test_uninstall_command(mock_uninstall_version, capsys):
+@patch("poem.api.uninstall", return_value="/p/venv/1.1.0")
+def test_uninstall_command(mock_uninstall, capsys):
     """Test the uninstall command."""
     assert main(["uninstall", "1.1.0"]) == 0
-    mock_uninstall_version.assert_called_once_with("1.1.0")
+    mock_uninstall.assert_called_once_with("1.1.0")
+
+
+@patch("poem.api.uninstall", side_effect=api.VersionNotInstalledError("1.1.0"))
+def test_uninstall_command_failure(mock_uninstall, capsys):
+    """Test that library errors become an exit status and a message on stderr."""
+    assert main(["uninstall", "1.1.0"]) == 1
+    assert "Poetry version 1.1.0 is not installed" in capsys.readouterr().err
 
 
-@patch("poem.core.set_global_version")
-def test_global_command(mock_set_global_version, capsys):
+@patch("poem.api.verify", side_effect=[OSError(28, "No space left on device"),
+                                       KeyboardInterrupt])
+def test_unexpected_errors_exit_without_traceback(mock_verify, capsys):
+    """Test that file system errors and interrupts become an exit status."""
+    assert main(["verify", "--json"]) == 1
+    assert json.loads(capsys.readouterr().out)["type"] == "OSError"
+    assert main(["verify"]) == 130
+    assert "Interrupted" in capsys.readouterr().err
+
+
+@patch("poem.api.set_global", return_value="/config/global")
+@patch("poem.api.install", return_value=[])
+@patch("poem.api.installed", return_value=[{"version": "1.1.0", "manifest": {}}])
+def test_global_command(mock_installed, mock_install, mock_set_global, capsys):
     """Test the global command."""
     assert main(["global", "1.1.0"]) == 0
-    mock_set_global_version.assert_called_once_with("1.1.0")
+    mock_set_global.assert_called_once_with("1.1.0")
 
 
-@patch("poem.core.set_local_version")
-def test_local_command(mock_set_local_version, capsys):
+@patch("poem.api.set_local", return_value=".poetry-version")
+def test_local_command(mock_set_local, capsys):
     """Test the local command."""
     assert main(["local", "1.1.0"]) == 0
-    mock_set_local_version.assert_called_once_with("1.1.0")
+    mock_set_local.assert_called_once_with("1.1.0")
 
 
-@patch("poem.core.doctor")
-def test_doctor_command(mock_doctor, capsys):
+@patch("poem.api.diagnose")
+def test_doctor_command(mock_diagnose, capsys):
     """Test the doctor command."""
+    mock_diagnose.return_value = {
+        "config_dir": "/config", "global_version": None, "local_version": None,
+        "poetry_home": "/home", "store": None, "installed": [], "poetry_path_dirs": [],
+        "active": None, "lock": None, "network": [],
+    }
     assert main(["doctor"]) == 0
-    mock_doctor.assert_called_once()
+    mock_diagnose.assert_called_once_with()
+    assert "No global version set" in capsys.readouterr().out
 
 
-@patch("poem.core.which_poetry")
-def test_which_command(mock_which_poetry, capsys):
+@patch("poem.api.resolve", return_value={"version": "1.1.0", "source": "local",
+                                         "bin": "/p/bin/poetry", "installed": True})
+def test_which_command(mock_resolve, capsys):
     """Test the which command."""
     assert main(["which"]) == 0
-    mock_which_poetry.assert_called_once()
+    assert capsys.readouterr().out == "/p/bin/poetry\n"
+
+
+@patch("poem.api.bundle_export")
+def test_bundle_export_to_stdout_refuses_json(mock_export, capsys):
+    """Test that --json cannot share stdout with a bundle written to -."""
+    assert main(["bundle", "export", "-o", "-", "--json"]) == 1
+    mock_export.assert_not_called()
+    assert json.loads(capsys.readouterr().out)["type"] == "ValueError"
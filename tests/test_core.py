@@ -1,14 +1,32 @@
 """Tests for the poem core functionality."""
 
 from poem.core import (
-    _get_poetry_home,
+    get_poetry_home,
     _run_command,
-    list_versions,
     get_current_version,
-    install_version,
-    switch_version,
-    get_remote_versions,
+    fetch_pypi_versions,
+    version_key,
+    _finalize_install,
+    read_manifest,
+    read_lock_metadata,
+    _match_lock_version,
+    get_pinned_version,
+    _run_installer,
+    _get_install_log,
+    _install_many,
+    load_release_index,
+    _parse_release_index,
+    _ReleaseIndex,
+    _find_release,
+    _python_satisfies,
+    query_releases,
 )
+from poem import api
+from poem.cli import main
+from poem.settings import reset_settings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
 import os
 import platform
 import subprocess
@@ -24,18 +42,20 @@ sys.path.insert(0, os.path.join(os.path.dirname(
 
 
 def test_get_poetry_home():
-    """Test the _get_poetry_home function."""
+    """Test the get_poetry_home function."""
     with patch("platform.system") as mock_system:
         # Test Windows path
         mock_system.return_value = "Windows"
-        with patch.dict(os.environ, {"APPDATA": "C:\\Users\\Test\\AppData\\Roaming"}):
-            assert _get_poetry_home() == "C:\\Users\\Test\\AppData\\Roaming\\pypoetry"
+        appdata = "C:\\Users\\Test\\AppData\\Roaming"
+        with patch.dict(os.environ, {"APPDATA": appdata}):
+            # Joined with the separator of the platform the tests run on
+            assert get_poetry_home() == os.path.join(appdata, "pypoetry")
 
         # Test Unix path
         mock_system.return_value = "Linux"
-        with patch("os.path.expanduser") as mock_expanduser:
-            mock_expanduser.return_value = "/home/test/.poetry"
-            assert _get_poetry_home() == "/home/test/.poetry"
+        reset_settings()
+        with patch.dict(os.environ, {"HOME": "/home/test"}):
+            assert get_poetry_home() == "/home/test/.poetry"
 
 
 @patch("subprocess.run")
@@ -61,26 +81,27 @@ def test_run_command_failure(mock_run, capsys):
     mock_run.side_effect = subprocess.CalledProcessError(
         1, ["some", "command"], stderr="error message\n")
 
-    with pytest.raises(SystemExit) as e:
+    with pytest.raises(subprocess.CalledProcessError) as e:
         _run_command(["some", "command"])
 
-    assert e.value.code == 1
-    captured = capsys.readouterr()
-    assert "Error: error message" in captured.err
+    assert e.value.stderr == "error message\n"
+    assert capsys.readouterr().err == ""
 
 
 @patch("os.path.exists")
 @patch("os.listdir")
 @patch("os.path.isdir")
-@patch("poem.core._get_poetry_home")
-def test_list_versions_installed(mock_get_home, mock_isdir, mock_listdir, mock_exists, capsys):
-    """Test the list_versions function with --installed flag."""
+@patch("poem.resolve.get_poetry_home")
+@patch("poem.api.read_manifest", return_value={})
+def test_list_versions_installed(mock_manifest, mock_get_home, mock_isdir, mock_listdir,
+                                 mock_exists, capsys):
+    """Test that poem list prints the installed versions."""
     mock_get_home.return_value = "/home/test/.poetry"
     mock_exists.return_value = True
     mock_listdir.return_value = ["1.0.0", "1.1.0", "1.2.0"]
     mock_isdir.return_value = True
 
-    list_versions(installed_only=True)
+    assert main(["list"]) == 0
 
     captured = capsys.readouterr()
     assert "Installed poetry versions:" in captured.out
@@ -97,63 +118,45 @@ def test_get_current_version(mock_run_command, capsys):
     result = get_current_version()
 
     assert result == "1.1.0"
-    captured = capsys.readouterr()
-    assert "Current poetry version: 1.1.0" in captured.out
+    assert capsys.readouterr().out == ""
 
 
 class TestGetRemoteVersions(unittest.TestCase):
-    @patch("poem.core.HTTP")
-    def test_get_remote_versions_success(self, mock_http):
-        # Mock the HTTP.get method to return sample GitHub API response
-        mock_response = [
-            {
-                "tag_name": "v1.7.1",
-                "prerelease": False,
-                "name": "Poetry 1.7.1"
-            },
-            {
-                "tag_name": "1.6.0",
-                "prerelease": False,
-                "name": "Poetry 1.6.0"
-            },
-            {
-                "tag_name": "1.5.0-rc.1",
-                "prerelease": True,
-                "name": "Poetry 1.5.0-rc.1"
-            }
+    @patch("poem.api.load_release_index")
+    def test_get_remote_versions_success(self, mock_index):
+        # Mock the release index built from the package index
+        mock_index.return_value = [
+            {"version": "1.5.0rc1", "requires_python": ">=3.7", "prerelease": True,
+             "uploaded": "2023-05-01T10:00:00Z"},
+            {"version": "1.6.0", "requires_python": ">=3.7", "prerelease": False,
+             "uploaded": "2023-08-20T10:00:00Z"},
+            {"version": "1.7.1", "requires_python": ">=3.8,<4.0", "prerelease": False,
+             "uploaded": "2023-11-16T10:00:00Z"},
         ]
-        mock_http.get.return_value = mock_response
 
         # Capture stdout to verify output
         captured_output = io.StringIO()
         sys.stdout = captured_output
 
         # Call the function
-        get_remote_versions()
+        code = main(["ls-remote", "--stable"])
 
         # Restore stdout
         sys.stdout = sys.__stdout__
 
-        # Verify HTTP.get was called with correct parameters
-        mock_http.get.assert_called_once_with(
-            "https://api.github.com/repos/python-poetry/poetry/releases",
-            headers={
-                "User-Agent": "pvm-tool",
-                "Accept": "application/vnd.github.v3+json"
-            }
-        )
+        # Verify output lists the newest version first, with its metadata
+        output = captured_output.getvalue().splitlines()
+        self.assertEqual(code, 0)
+        self.assertEqual(len(output), 2)
+        self.assertIn("1.7.1", output[0])
+        self.assertIn("2023-11-16", output[0])
+        self.assertIn("python >=3.8,<4.0", output[0])
+        self.assertNotIn("1.5.0rc1", "\n".join(output))
 
-        # Verify output contains expected versions
-        output = captured_output.getvalue()
-        self.assertIn("Fetching available versions from GitHub", output)
-        self.assertIn("1.7.1", output)
-        self.assertIn("1.6.0", output)
-        self.assertIn("1.5.0-rc.1", output)
-
-    @patch("poem.core.HTTP")
-    def test_get_remote_versions_error(self, mock_http):
-        # Mock HTTP.get to raise an exception
-        mock_http.get.side_effect = Exception("Network error")
+    @patch("poem.api.load_release_index")
+    def test_get_remote_versions_error(self, mock_index):
+        # Mock the index lookup to raise an exception
+        mock_index.side_effect = OSError("Network error")
 
         # Capture stdout and stderr to verify output
         captured_output = io.StringIO()
@@ -162,7 +165,7 @@ class TestGetRemoteVersions(unittest.TestCase):
         sys.stderr = captured_error
 
         # Call the function
-        get_remote_versions()
+        code = main(["ls-remote"])
 
         # Restore stdout and stderr
         sys.stdout = sys.__stdout__
@@ -170,29 +173,310 @@ class TestGetRemoteVersions(unittest.TestCase):
 
         # Verify error message
         error_output = captured_error.getvalue()
-        output = captured_output.getvalue()
+        self.assertEqual(code, 1)
         self.assertIn(
-            "Failed to fetch remote versions: Network error", error_output)
-        self.assertIn("Try using pip: pip index versions poetry", output)
+            "Failed to fetch poetry releases: Network error", error_output)
+        self.assertEqual(captured_output.getvalue(), "")
 
-    @patch("poem.core.HTTP")
-    def test_get_remote_versions_empty_response(self, mock_http):
-        # Mock HTTP.get to return empty list
-        mock_http.get.return_value = []
+    @patch("poem.api.load_release_index")
+    def test_get_remote_versions_empty_response(self, mock_index):
+        # Mock an index without releases
+        mock_index.return_value = []
 
         # Capture stdout
         captured_output = io.StringIO()
         sys.stdout = captured_output
 
         # Call the function
-        get_remote_versions()
+        main(["ls-remote"])
 
         # Restore stdout
         sys.stdout = sys.__stdout__
 
-        # Verify output shows empty list
+        # Verify output shows that nothing matched
         output = captured_output.getvalue()
-        self.assertIn("Available Poetry versions: []", output)
+        self.assertIn("No poetry versions match.", output)
+
+
+SIMPLE_INDEX_PAGE = {
+    "meta": {"api-version": "1.1"},
+    "name": "poetry",
+    "files": [
+        {"filename": "poetry-1.8.3-py3-none-any.whl", "yanked": False},
+        {"filename": "poetry-1.8.3.tar.gz", "yanked": False},
+        {"filename": "poetry-1.10.0-py3-none-any.whl", "yanked": False},
+        {"filename": "poetry-2.0.0b1-py3-none-any.whl", "yanked": False},
+        {"filename": "poetry-1.9.0-py3-none-any.whl", "yanked": "broken"},
+    ],
+}
+
+
+@pytest.fixture
+def index_server():
+    """Serve a PEP 691 project page for poetry from a local stand-in index."""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            if self.path != "/simple/poetry/":
+                self.send_error(404)
+                return
+            body = json.dumps(SIMPLE_INDEX_PAGE).encode("utf-8")
+            self.send_response(200)
+            self.send_header(
+                "Content-Type", "application/vnd.pypi.simple.v1+json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/simple", requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_version_key_ordering():
+    """Test that versions sort numerically with prereleases first."""
+    versions = ["1.10.0", "2.0.0", "1.9.0", "2.0.0b1", "2.0.0rc1", "1.9"]
+    assert sorted(versions, key=version_key) == [
+        "1.9.0", "1.9", "1.10.0", "2.0.0b1", "2.0.0rc1", "2.0.0"]
+
+
+def test_fetch_pypi_versions_uses_index_and_cache(index_server, tmp_path):
+    """Test fetching versions from a configured index and reusing the cache."""
+    index_url, requests = index_server
+    with patch.dict(os.environ, {"POEM_INDEX_URL": index_url}), \
+            patch("poem.core._get_cache_dir", return_value=str(tmp_path)):
+        assert fetch_pypi_versions() == ["1.8.3", "1.10.0", "2.0.0b1"]
+        assert fetch_pypi_versions() == ["1.8.3", "1.10.0", "2.0.0b1"]
+
+    assert requests == ["/simple/poetry/"]
+
+
+def test_list_versions_available(index_server, tmp_path):
+    """Test listing available versions without spawning pip."""
+    index_url, _ = index_server
+    with patch.dict(os.environ, {"POEM_INDEX_URL": index_url}), \
+            patch("poem.core._get_cache_dir", return_value=str(tmp_path)), \
+            patch("subprocess.run") as mock_run:
+        versions = api.remote_versions()
+
+    mock_run.assert_not_called()
+    assert versions == ["1.8.3", "1.10.0", "2.0.0b1"]
+
+
+def test_parse_release_index_json_and_html():
+    """Test that both page formats yield requires-python and upload dates."""
+    page = {"files": [
+        {"filename": "poetry-1.8.3-py3-none-any.whl", "requires-python": ">=3.8,<4.0",
+         "upload-time": "2024-05-04T17:15:12.345Z"},
+        {"filename": "poetry-1.8.3.tar.gz", "requires-python": ">=3.8,<4.0",
+         "upload-time": "2024-05-04T17:14:59.001Z"},
+        {"filename": "poetry-2.0.0b1-py3-none-any.whl", "requires-python": ">=3.9"},
+        {"filename": "poetry-1.9.0-py3-none-any.whl", "yanked": "broken"},
+    ]}
+    releases = _parse_release_index(json.dumps(page).encode("utf-8"))
+    assert releases == [
+        {"version": "1.8.3", "requires_python": ">=3.8,<4.0", "prerelease": False,
+         "uploaded": "2024-05-04T17:14:59.001Z"},
+        {"version": "2.0.0b1", "requires_python": ">=3.9", "prerelease": True,
+         "uploaded": None},
+    ]
+
+    html_page = (b'<a href="p/poetry-1.1.15.tar.gz" data-requires-python="&gt;=2.7, !=3.0.*">'
+                 b'poetry-1.1.15.tar.gz</a>')
+    assert _parse_release_index(html_page)[0]["requires_python"] == ">=2.7, !=3.0.*"
+
+
+def test_python_satisfies():
+    """Test matching Python versions against requires-python specifiers."""
+    assert _python_satisfies(None, "3.11")
+    assert _python_satisfies(">=3.8,<4.0", "3.11")
+    assert not _python_satisfies(">=3.9", "3.8")
+    assert not _python_satisfies(">=2.7, !=3.0.*, !=3.1.*", "3.1")
+    assert _python_satisfies(">=2.7, !=3.0.*, !=3.1.*", "3.10")
+    assert _python_satisfies("~=3.8", "3.12")
+    assert not _python_satisfies("~=3.8.1", "3.9")
+    assert _python_satisfies("<3.12", "3.11.9")
+    assert _python_satisfies(">=3.8; not-a-specifier", "3.11")
+
+
+def test_query_releases_filters():
+    """Test the --latest, --since, --stable and --python filters."""
+    releases = [
+        {"version": "1.1.15", "requires_python": ">=2.7, !=3.0.*", "prerelease": False,
+         "uploaded": "2022-09-29T00:00:00Z"},
+        {"version": "1.8.3", "requires_python": ">=3.8,<4.0", "prerelease": False,
+         "uploaded": "2024-05-04T00:00:00Z"},
+        {"version": "2.0.0b1", "requires_python": ">=3.9", "prerelease": True,
+         "uploaded": "2024-12-01T00:00:00Z"},
+    ]
+
+    def versions(**filters):
+        return [release["version"] for release in query_releases(releases, **filters)]
+
+    assert versions(since="1.8") == ["1.8.3", "2.0.0b1"]
+    assert versions(since="1.8.3") == ["2.0.0b1"]
+    assert versions(since="2024-05-04") == ["1.8.3", "2.0.0b1"]
+    assert versions(stable=True, latest=True) == ["1.8.3"]
+    assert versions(python="3.8") == ["1.1.15", "1.8.3"]
+    assert versions(python="2.7", latest=True) == ["1.1.15"]
+    with pytest.raises(ValueError):
+        query_releases(releases, since="last week")
+
+    # HTML indexes carry no upload times
+    undated = [dict(release, uploaded=None) for release in releases]
+    with pytest.raises(ValueError, match="upload times"):
+        query_releases(undated, since="2024-05-04")
+    assert [release["version"] for release in query_releases(undated, since="1.8.3")] == [
+        "2.0.0b1"]
+
+
+def test_release_index_reused_while_page_is_fresh(index_server, tmp_path):
+    """Test that the compact index is read instead of parsing the page again."""
+    index_url, requests = index_server
+    with patch.dict(os.environ, {"POEM_INDEX_URL": index_url}), \
+            patch("poem.core._get_cache_dir", return_value=str(tmp_path)):
+        first = load_release_index()
+        with patch("poem.core._parse_release_index") as mock_parse:
+            assert load_release_index() == first
+        mock_parse.assert_not_called()
+
+    assert [release["version"] for release in first] == ["1.8.3", "1.10.0", "2.0.0b1"]
+    assert requests == ["/simple/poetry/"]
+
+
+def test_release_keys_are_built_once_per_load():
+    """Test that lookups on a loaded index reuse its sort keys."""
+    index = _ReleaseIndex(_parse_release_index(json.dumps(SIMPLE_INDEX_PAGE).encode()))
+
+    with patch("poem.core.version_key", wraps=version_key) as mock_key:
+        assert [release["version"] for release in query_releases(index, since="1.8.3")] == [
+            "1.10.0", "2.0.0b1"]
+        assert _find_release(index, "1.10.0")["version"] == "1.10.0"
+
+    # Only the two versions looked up are parsed
+    assert mock_key.call_count == 2
+
+
+def test_install_many_rejects_incompatible_before_download():
+    """Test that a version excluded by requires-python never downloads the installer."""
+    releases = [{"version": "1.1.15", "requires_python": ">=2.7,<3.0",
+                 "prerelease": False, "uploaded": None}]
+    with patch("poem.core.load_release_index", return_value=releases), \
+            patch("poem.core._download_installer") as mock_download:
+        errors = _install_many(["1.1.15"])
+
+    mock_download.assert_not_called()
+    assert "requires Python >=2.7,<3.0" in errors["1.1.15"]
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="uses a symlinked venv python")
+def test_finalize_install_precompiles_and_records_manifest(tmp_path):
+    """Test that a new install is compiled to bytecode and recorded."""
+    venv_dir = tmp_path / "venv" / "1.8.3" / "venv"
+    (venv_dir / "bin").mkdir(parents=True)
+    (venv_dir / "bin" / "python").symlink_to(sys.executable)
+    site_packages = venv_dir / "lib" / "site-packages"
+    site_packages.mkdir(parents=True)
+    (site_packages / "module.py").write_text("VALUE = 1\n")
+
+    with patch("poem.resolve.get_poetry_home", return_value=str(tmp_path)):
+        _finalize_install("1.8.3")
+        manifest = read_manifest("1.8.3")
+
+    assert list((site_packages / "__pycache__").glob("module.*.pyc"))
+    assert manifest["version"] == "1.8.3"
+    assert manifest["bytecode"]["complete"] is True
+
+
+def test_read_lock_metadata_reads_only_the_ends(tmp_path):
+    """Test that the header and trailing metadata of a large lock file are found."""
+    lock_file = tmp_path / "poetry.lock"
+    lock_file.write_text(
+        "# This file is automatically @generated by Poetry 1.8.3 and should not be changed by hand.\n"
+        + '[[package]]\nname = "demo"\n' * 20000
+        + 'lock-version = "9.9"\n'
+        + '[[package]]\nname = "demo"\n' * 20000
+        + '[metadata]\nlock-version = "2.0"\npython-versions = "^3.9"\n')
+
+    assert read_lock_metadata(str(lock_file)) == {"generated_by": "1.8.3", "lock_version": "2.0"}
+    assert read_lock_metadata(str(tmp_path / "missing.lock")) is None
+
+    old_lock = tmp_path / "old.lock"
+    old_lock.write_text('[metadata]\nlock-version = "1.1"\n')
+    assert read_lock_metadata(str(old_lock)) == {"generated_by": None, "lock_version": "1.1"}
+
+
+def test_match_lock_version():
+    """Test mapping lock files to installed versions."""
+    installed = ["1.4.2", "1.7.1", "1.8.2", "1.8.5", "2.1.0"]
+    written_by = {"generated_by": "1.8.3", "lock_version": "2.0"}
+
+    assert _match_lock_version(written_by, installed) == "1.8.5"
+    assert _match_lock_version(written_by, installed + ["1.8.3"]) == "1.8.3"
+    assert _match_lock_version(written_by, ["2.1.0"]) == "1.8.3"
+    assert _match_lock_version({"generated_by": None, "lock_version": "1.1"}, installed) == "1.4.2"
+    assert _match_lock_version({"generated_by": None, "lock_version": "3.0"}, installed) is None
+
+
+def test_lock_resolution_is_opt_in(tmp_path, monkeypatch):
+    """Test that poetry.lock is consulted between the local and global pins."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("POEM_STORE", raising=False)
+    (tmp_path / ".poetry" / "venv" / "1.8.5").mkdir(parents=True)
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "poetry.lock").write_text(
+        "# This file is automatically @generated by Poetry 1.8.3 and should not be changed by hand.\n")
+    (tmp_path / ".config" / "poem").mkdir(parents=True)
+    (tmp_path / ".config" / "poem" / "global-version").write_text("2.0.0")
+
+    assert get_pinned_version(str(project)) == ("2.0.0", "global")
+    monkeypatch.setenv("POEM_LOCK_RESOLUTION", "1")
+    assert get_pinned_version(str(project)) == ("1.8.5", "lock")
+    (project / ".poetry-version").write_text("1.7.1")
+    assert get_pinned_version(str(project)) == ("1.7.1", "local")
+
+
+FAKE_INSTALLER = """\
+import time
+print("Retrieving Poetry metadata", flush=True)
+print("# Welcome to Poetry!", flush=True)
+print("Installing Poetry (1.8.3)", flush=True)
+for step in ("Creating environment", "Installing Poetry", "Creating script", "Done"):
+    time.sleep(0.05)
+    print(f"\\x1b[2KInstalling Poetry (1.8.3): {step}", flush=True)
+time.sleep(0)
+"""
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="uses POSIX process groups")
+def test_run_installer_logs_phases_and_stalls(tmp_path, monkeypatch):
+    """Test that installer output is logged, timed by phase and stopped when stuck."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    installer = tmp_path / "installer.py"
+    installer.write_text(FAKE_INSTALLER)
+
+    timings = _run_installer("1.8.3", str(installer))
+
+    assert list(timings) == ["startup", "metadata", "venv", "dependencies", "script"]
+    assert timings["dependencies"] >= 0.04
+    log = open(_get_install_log("1.8.3")).read()
+    assert "Installing Poetry (1.8.3): Creating script" in log
+    assert "\x1b" not in log
+
+    installer.write_text(FAKE_INSTALLER.replace("time.sleep(0)", "time.sleep(30)"))
+    monkeypatch.setenv("POEM_INSTALL_STALL_TIMEOUT", "0.5")
+    with pytest.raises(RuntimeError, match="printed nothing for 0.5s during done"):
+        _run_installer("1.8.3", str(installer))
+    assert "killed" in open(_get_install_log("1.8.3")).read()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+"""Tests for poem shim installation."""
+
+import os
+import platform
+import subprocess
+
+import pytest
+
+from poem.directories import install_shims
+
+pytestmark = pytest.mark.skipif(
+    platform.system() == "Windows", reason="exercises the Unix shim")
+
+
+@pytest.fixture
+def fake_home(make_home, tmp_path):
+    """Create a home directory with poetry 1.8.3 installed and pinned."""
+    make_home("1.8.3", pin="1.8.3")
+    return tmp_path
+
+
+def test_install_shims_builds_isolated_bundle(fake_home, capsys):
+    """Test that the installed shim runs isolated from a precompiled bundle."""
+    result = install_shims()
+
+    shim = fake_home / ".poem" / "shims" / "poetry"
+    assert result["shim"] == str(shim)
+    bundle = fake_home / ".poem" / "shim-bundle"
+    assert " -I -S " in shim.read_text()
+    assert list((bundle / "poem" / "__pycache__").glob("shim.*.pyc"))
+
+    result = subprocess.run([str(shim), "--version"], cwd=fake_home,
+                            env=dict(os.environ, PYTHONPATH="/nonexistent"),
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "fake poetry 1.8.3 --version"
+
+
+def test_install_shims_replaces_existing_bundle(fake_home, capsys):
+    """Test that reinstalling swaps the bundle without leftovers."""
+    install_shims()
+    install_shims()
+
+    entries = sorted(os.listdir(fake_home / ".poem"))
+    assert entries == ["shim-bundle", "shims"]
+
+
+def test_nested_calls_reuse_resolution(fake_home, capsys):
+    """Test that a nested call takes the shell fast path until a pin changes."""
+    poetry = fake_home / ".poetry" / "venv" / "1.8.3" / "bin" / "poetry"
+    poetry.write_text("#!/bin/sh\necho \"$POEM_RESOLVED_VERSION|$POEM_RESOLVED_KEY\"\n")
+    install_shims()
+    shim = str(fake_home / ".poem" / "shims" / "poetry")
+    project = fake_home / "project"
+    project.mkdir()
+    (project / ".poetry-version").write_text("1.8.3\n")
+
+    def run(env):
+        return subprocess.run([shim], cwd=project, env=env, capture_output=True,
+                              text=True)
+
+    env = dict(os.environ, PWD=str(project), POEM_TRACE="1")
+    first = run(env)
+    version, key = first.stdout.strip().split("|", 1)
+    assert version == "1.8.3"
+    assert "poem trace" in first.stderr
+
+    nested_env = dict(env, POEM_RESOLVED_VERSION=version, POEM_RESOLVED_KEY=key,
+                      POEM_RESOLVED_BIN=str(poetry))
+    nested = run(nested_env)
+    assert nested.stdout.strip() == first.stdout.strip()
+    assert "poem trace" not in nested.stderr
+
+    (project / ".poetry-version").write_text("1.8.4\n")
+    changed = run(nested_env)
+    assert changed.returncode == 1
+    assert "Poetry version 1.8.4 is not installed" in changed.stdout
+
+
+def test_stale_bundle_is_rebuilt_for_a_new_poem_version(fake_home, capsys):
+    """Test that the bundle is rebuilt once it was built by another poem version."""
+    from poem import __version__
+    from poem.directories import refresh_shim_bundle
+
+    assert not refresh_shim_bundle()
+    install_shims()
+    version_file = fake_home / ".poem" / "shim-bundle" / "poem-version"
+    assert version_file.read_text() == __version__
+    assert not refresh_shim_bundle()
+
+    version_file.write_text("0.0.1")
+    assert refresh_shim_bundle()
+    assert version_file.read_text() == __version__
@@ -0,0 +1,85 @@
+"""Tests for poem exec."""
+
+import os
+import shutil
+import stat
+
+import pytest
+
+from poem.cli import main
+from poem.execute import select_versions
+
+FAKE_POETRY = """#!/bin/sh
+echo "poetry {version} in $(cat .poetry-version 2>/dev/null || echo shared)"
+echo touched > touched.txt
+[ "$1" = "fail" ] && [ "{version}" = "1.7.1" ] && exit 3
+exit 0
+"""
+
+
+@pytest.fixture
+def versions(tmp_path, monkeypatch):
+    """Install fake poetry binaries for a few versions."""
+    home = tmp_path / "home"
+    for version in ("1.7.1", "1.8.2", "1.8.3"):
+        bin_dir = home / ".poetry" / "venv" / version / "bin"
+        bin_dir.mkdir(parents=True)
+        poetry = bin_dir / "poetry"
+        poetry.write_text(FAKE_POETRY.format(version=version))
+        poetry.chmod(poetry.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.delenv("POEM_STORE", raising=False)
+
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "pyproject.toml").write_text("[tool.poetry]\n")
+    monkeypatch.chdir(project)
+    return project
+
+
+def test_select_versions_by_prefix(versions):
+    """Test that a release prefix selects every matching version."""
+    assert select_versions(["1.8"]) == ["1.8.2", "1.8.3"]
+    assert select_versions(["1.8.3", "1.7.1"]) == ["1.7.1", "1.8.3"]
+    assert select_versions([], all_versions=True) == ["1.7.1", "1.8.2", "1.8.3"]
+    with pytest.raises(ValueError):
+        select_versions(["2.0"])
+
+
+def test_exec_runs_in_pinned_copies(versions, capsys):
+    """Test that each version runs in its own copy of the project."""
+    assert main(["exec", "--all", "--show-output", "--", "poetry", "build"]) == 0
+
+    out = capsys.readouterr().out
+    for version in ("1.7.1", "1.8.2", "1.8.3"):
+        assert f"poetry {version} in {version}" in out
+    assert not os.path.exists(versions / "touched.txt")
+
+
+def test_exec_reports_failures(versions, capsys):
+    """Test that a failing version is summarised and fails the command."""
+    assert main(["exec", "--read-only", "1.7", "1.8.3", "--", "poetry", "fail"]) == 1
+
+    out = capsys.readouterr().out
+    assert "==> poetry 1.7.1\npoetry 1.7.1 in shared" in out
+    assert "1.7.1        failed         3" in out
+    assert "1.8.3        ok             0" in out
+    assert os.path.exists(versions / "touched.txt")
+
+
+def test_exec_reports_copy_failures_per_version(versions, monkeypatch, capsys):
+    """Test that a failed project copy only fails that version."""
+    real_copytree = shutil.copytree
+
+    def copytree(src, dst, **kwargs):
+        if dst.endswith("1.8.2"):
+            raise shutil.Error([(src, dst, "No space left on device")])
+        return real_copytree(src, dst, **kwargs)
+
+    monkeypatch.setattr(shutil, "copytree", copytree)
+    assert main(["exec", "--all", "--", "poetry", "build"]) == 1
+
+    out = capsys.readouterr().out
+    assert "Could not copy the project for 1.8.2" in out
+    assert "1.7.1        ok             0" in out
+    assert "1.8.3        ok             0" in out
@@ -0,0 +1,45 @@
+"""Tests for the poem fetch engine."""
+
+import threading
+import time
+
+import pytest
+
+from poem.fetch import FetchEngine
+
+
+def test_map_preserves_order_and_bounds_concurrency():
+    """Test that results keep input order and in-flight calls are capped."""
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def work(item):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.02)
+        with lock:
+            state["running"] -= 1
+        return item * 2
+
+    results = FetchEngine(concurrency=3).map(work, range(10))
+
+    assert results == [item * 2 for item in range(10)]
+    assert 1 < state["peak"] <= 3
+
+
+def test_map_collects_exceptions():
+    """Test that failures can be returned in place of results."""
+    def get(url):
+        if url.endswith("bad"):
+            raise OSError("unreachable")
+        return url.encode("utf-8")
+
+    results = FetchEngine().map(get, ["http://a/ok", "http://a/bad"],
+                                return_exceptions=True)
+
+    assert results[0] == b"http://a/ok"
+    assert isinstance(results[1], OSError)
+
+    with pytest.raises(OSError):
+        FetchEngine().map(get, ["http://a/bad"])
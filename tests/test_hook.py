@@ -0,0 +1,97 @@
+"""Tests for the poem shell hook."""
+
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from poem.hook import render_env, render_hook
+
+SRC_DIR = os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+@pytest.fixture
+def fake_home(make_home, tmp_path):
+    """Create a home directory with poetry 1.8.3 installed."""
+    make_home("1.8.3")
+    return tmp_path
+
+
+def test_render_env_swaps_previous_entry(fake_home, monkeypatch):
+    """Test that the PATH update replaces the directory added last time."""
+    project = fake_home / "project"
+    project.mkdir()
+    (project / ".poetry-version").write_text("1.8.3")
+    monkeypatch.chdir(project)
+    monkeypatch.setenv("_POEM_PATH", "/old/bin")
+    monkeypatch.setenv("PATH", "/old/bin:/usr/bin")
+
+    bin_dir = str(fake_home / ".poetry" / "venv" / "1.8.3" / "bin")
+    env = render_env("bash")
+
+    assert f"export PATH={bin_dir}:/usr/bin\n" in env
+    assert f"export _POEM_PATH={bin_dir}\n" in env
+
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="bash is required")
+def test_bash_hook_switches_on_cd(fake_home, tmp_path):
+    """Test that the bash hook puts the pinned poetry on PATH after cd."""
+    project = fake_home / "project"
+    project.mkdir()
+    (project / ".poetry-version").write_text("1.8.3")
+
+    shim_dir = tmp_path / "cmd"
+    shim_dir.mkdir()
+    poem = shim_dir / "poem"
+    poem.write_text(f"#!/bin/sh\nexec {sys.executable} -m poem.cli \"$@\"\n")
+    poem.chmod(0o755)
+
+    env = dict(os.environ, HOME=str(fake_home), PYTHONPATH=SRC_DIR,
+               PATH=f"{shim_dir}:/usr/bin:/bin")
+    script = (
+        'eval "$(poem hook bash)"\n'
+        f'cd {project} && _poem_hook && command -v poetry\n'
+        'cd / && _poem_hook && command -v poetry || echo none\n'
+    )
+    result = subprocess.run(["bash", "-c", script], env=env,
+                            capture_output=True, text=True, check=True)
+
+    lines = result.stdout.split()
+    assert lines[0] == str(fake_home / ".poetry" / "venv" / "1.8.3" / "bin" / "poetry")
+    assert lines[1] == "none"
+
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="bash is required")
+def test_bash_hook_rekeys_on_lock_change(fake_home, tmp_path, monkeypatch):
+    """Test that editing poetry.lock re-runs the hook under POEM_LOCK_RESOLUTION."""
+    project = fake_home / "project"
+    project.mkdir()
+    lock = project / "poetry.lock"
+    lock.write_text("# This file is automatically @generated by Poetry 1.8.3\n")
+    os.utime(lock, (1000000000, 1000000000))
+
+    assert "poetry.lock" not in render_hook("bash")
+    monkeypatch.setenv("POEM_LOCK_RESOLUTION", "1")
+    hook = render_hook("bash")
+
+    calls = tmp_path / "calls"
+    shim_dir = tmp_path / "cmd"
+    shim_dir.mkdir()
+    poem = shim_dir / "poem"
+    poem.write_text(f"#!/bin/sh\necho x >> {calls}\n")
+    poem.chmod(0o755)
+    env = dict(os.environ, PATH=f"{shim_dir}:/usr/bin:/bin")
+    script = (
+        f"{hook}cd {project}\n"
+        "_poem_hook\n"
+        "touch -t 203301010000 poetry.lock\n"
+        "_poem_hook\n"
+        "_poem_hook\n"
+    )
+    subprocess.run(["bash", "-c", script], env=env, check=True)
+
+    # Once on registration, once on cd, once after the lock changed
+    assert calls.read_text().count("x") == 3
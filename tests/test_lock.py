@@ -0,0 +1,102 @@
+"""Tests for file locks and single-flight installs."""
+
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from poem.core import INSTALLING_MARKER, _ensure_installed, _get_installed_versions
+from poem.lock import LockTimeout, file_lock
+
+
+def test_file_lock_times_out_while_held(tmp_path):
+    """Test that a waiter gives up after the timeout and learns the holder."""
+    lock_file = str(tmp_path / "locks" / "x.lock")
+    waits = []
+
+    with file_lock(lock_file, timeout=1):
+        with pytest.raises(LockTimeout) as excinfo:
+            with file_lock(lock_file, timeout=0.3,
+                           on_wait=lambda waited, holder: waits.append(holder)):
+                pass
+
+    assert excinfo.value.holder is not None
+    assert len(waits) == 1
+    with file_lock(lock_file, timeout=0.3):
+        pass
+
+
+def test_removed_lock_file_is_not_shared(tmp_path):
+    """Test that a waiter on a removed lock file locks a fresh one."""
+    lock_file = str(tmp_path / "x.lock")
+    entered = []
+
+    def wait():
+        with file_lock(lock_file, timeout=5, remove=True):
+            entered.append(os.path.exists(lock_file))
+
+    with file_lock(lock_file, timeout=1, remove=True):
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.3)
+        assert entered == []
+    waiter.join()
+
+    assert entered == [True]
+    assert not os.path.exists(lock_file)
+
+
+def test_ensure_installed_is_single_flight(tmp_path, monkeypatch, capsys):
+    """Test that concurrent callers share one install of a version."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("POEM_STORE", raising=False)
+    calls = []
+
+    def fake_run_installer(version, installer_path, home=None):
+        calls.append(version)
+        version_dir = tmp_path / ".poetry" / "venv" / version
+        (version_dir / "bin").mkdir(parents=True)
+        (version_dir / INSTALLING_MARKER).touch()
+        (version_dir / "bin" / "poetry").touch()
+        time.sleep(0.3)
+        (version_dir / INSTALLING_MARKER).unlink()
+        return {}
+
+    errors = []
+
+    def call():
+        try:
+            _ensure_installed("1.8.3", timeout=10)
+        except Exception as e:
+            errors.append(e)
+
+    with patch("poem.core._incompatible_versions", return_value={}), \
+            patch("poem.core._download_installer", return_value="install-poetry.py"), \
+            patch("poem.core._run_installer", side_effect=fake_run_installer), \
+            patch("poem.core._finalize_install"):
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
+    assert calls == ["1.8.3"]
+    assert _get_installed_versions() == ["1.8.3"]
+    assert os.listdir(tmp_path / ".poetry" / "venv") == ["1.8.3"]
+    err = capsys.readouterr().err
+    assert err.count("poem: installing poetry 1.8.3") == 1
+    assert "waiting for another process" in err
+
+
+def test_partial_install_is_not_listed(tmp_path, monkeypatch):
+    """Test that a version still being installed is not reported installed."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("POEM_STORE", raising=False)
+    version_dir = tmp_path / ".poetry" / "venv" / "1.8.3"
+    version_dir.mkdir(parents=True)
+    (version_dir / INSTALLING_MARKER).touch()
+
+    assert _get_installed_versions() == []
@@ -0,0 +1,163 @@
+"""Tests for the caching download mirror."""
+
+import os
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from poem.http import HTTP, HTTPError
+from poem.mirror import MirrorServer
+
+FILES = {
+    "/simple/poetry/": b'{"files": []}',
+    "/packages/poetry-1.8.3-py3-none-any.whl": b"wheel bytes",
+}
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def upstream():
+    """Serve a few files from a local stand-in for PyPI."""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            if self.path == "/simple/demo/":
+                # Serves whichever format the client lists first (PEP 691)
+                json_page = self.headers.get("Accept", "").startswith(
+                    "application/vnd.pypi.simple.v1+json")
+                body = b'{"files": []}' if json_page else b"<html></html>"
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if self.path not in FILES:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(FILES[self.path])))
+            self.end_headers()
+            self.wfile.write(FILES[self.path])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    yield _serve(server), requests, server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def mirror(upstream, tmp_path, monkeypatch):
+    """Run a mirror that may fetch from the local stand-in server."""
+    port = upstream[2].server_address[1]
+    server = MirrorServer(("127.0.0.1", 0), str(tmp_path / "cache"), {f"127.0.0.1:{port}"})
+    mirror_url = _serve(server)
+    monkeypatch.setenv("POEM_MIRROR_URL", mirror_url)
+    yield mirror_url, tmp_path / "cache"
+    server.shutdown()
+    server.server_close()
+
+
+def test_mirror_caches_artifacts(upstream, mirror):
+    """Test that artifacts are fetched upstream once, then served from cache."""
+    upstream_url, requests, server = upstream
+    _, cache_dir = mirror
+    url = f"{upstream_url}/packages/poetry-1.8.3-py3-none-any.whl"
+
+    assert HTTP.get(url) == b"wheel bytes"
+    assert os.path.exists(HTTP.cache_path(str(cache_dir / "artifacts"), url))
+
+    server.shutdown()
+    assert HTTP.get(url) == b"wheel bytes"
+    assert requests == ["/packages/poetry-1.8.3-py3-none-any.whl"]
+
+
+def test_mirror_keeps_index_pages_in_index_cache(upstream, mirror):
+    """Test that index pages are cached where the release index lives."""
+    upstream_url, requests, _ = upstream
+    _, cache_dir = mirror
+    url = f"{upstream_url}/simple/poetry/"
+
+    assert HTTP.get(url) == b'{"files": []}'
+    assert HTTP.get(url) == b'{"files": []}'
+    assert os.path.exists(HTTP.cache_path(str(cache_dir / "index"), url))
+    assert requests == ["/simple/poetry/"]
+
+
+def test_mirror_caches_each_negotiated_format(upstream, mirror):
+    """Test that JSON and HTML pages of one URL are cached and served apart."""
+    upstream_url, requests, _ = upstream
+    mirror_url, _ = mirror
+    url = f"{mirror_url}/{upstream_url[len('http://'):]}/simple/demo/"
+    json_type = "application/vnd.pypi.simple.v1+json"
+    html_type = "application/vnd.pypi.simple.v1+html"
+
+    for _ in range(2):
+        assert HTTP.get(url, headers={"Accept": json_type}, use_mirror=False) == \
+            b'{"files": []}'
+        assert HTTP.get(url, headers={"Accept": f"{html_type}, {json_type};q=0.5"},
+                        use_mirror=False) == b"<html></html>"
+    assert requests == ["/simple/demo/", "/simple/demo/"]
+
+    with urllib.request.urlopen(urllib.request.Request(
+            url, headers={"Accept": json_type})) as response:
+        assert response.headers["Content-Type"] == json_type
+
+
+def test_mirror_allows_hosts_by_port(upstream, tmp_path):
+    """Test that allowing a host does not allow it on any other port."""
+    upstream_url, requests, _ = upstream
+    server = MirrorServer(("127.0.0.1", 0), str(tmp_path), {"127.0.0.1"})
+    mirror_url = _serve(server)
+    try:
+        with pytest.raises(HTTPError) as excinfo:
+            HTTP.get(f"{mirror_url}/{upstream_url[len('http://'):]}/simple/poetry/",
+                     use_mirror=False)
+        assert excinfo.value.status == 403
+        assert requests == []
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_client_falls_back_to_upstream(upstream, monkeypatch):
+    """Test that requests go upstream when the mirror is unreachable."""
+    upstream_url, requests, _ = upstream
+    monkeypatch.setenv("POEM_MIRROR_URL", "http://127.0.0.1:9")
+
+    assert HTTP.get(f"{upstream_url}/simple/poetry/") == b'{"files": []}'
+    assert requests == ["/simple/poetry/"]
+
+
+def test_mirror_refuses_unknown_hosts(tmp_path):
+    """Test that the mirror is not an open proxy."""
+    server = MirrorServer(("127.0.0.1", 0), str(tmp_path), {"pypi.org"})
+    mirror_url = _serve(server)
+    try:
+        with pytest.raises(HTTPError) as excinfo:
+            HTTP.get(f"{mirror_url}/example.com/", use_mirror=False)
+        assert excinfo.value.status == 403
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_mirror_path_and_cache_path_keep_queries():
+    """Test the URL mappings used by clients and the mirror cache."""
+    url = "https://api.github.com/repos/python-poetry/poetry/releases?page=2"
+
+    assert HTTP.mirror_path("http://mirror:3141", url) == (
+        "http://mirror:3141/api.github.com/repos/python-poetry/poetry/releases?page=2")
+    assert HTTP.cache_path("/c", url) == os.path.join(
+        "/c", "api.github.com", "repos", "python-poetry", "poetry", "releases@page=2")
@@ -0,0 +1,86 @@
+"""Tests for declarative plugin sets."""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from poem.core import _get_venv_python
+from poem.errors import PoemError
+from poem.plugins import plugins_add, plugins_remove, plugins_sync, read_plugins
+
+
+@pytest.fixture
+def home(make_home):
+    """Configure a poetry home with two installed versions."""
+    return make_home("1.7.1", "1.8.3")
+
+
+def _pyvenv(home, version, base):
+    """Record the base interpreter of a version's venv."""
+    venv = home / "venv" / version / "venv"
+    venv.mkdir(parents=True, exist_ok=True)
+    (venv / "pyvenv.cfg").write_text(f"home = {base}\nversion = 3.11.9\n")
+
+
+def _manifest(home, version):
+    return json.loads((home / "venv" / version / "poem-manifest.json").read_text())
+
+
+def test_add_replaces_same_project(home):
+    """Test that declaring a plugin again replaces its earlier specifier."""
+    plugins_add(["poetry-plugin-export>=1.6", "poetry_dynamic_versioning"])
+    plugins_add(["Poetry.Plugin.Export>=1.8"])
+
+    assert read_plugins() == ["poetry_dynamic_versioning", "Poetry.Plugin.Export>=1.8"]
+    assert plugins_remove(["poetry-dynamic-versioning"]) == ["Poetry.Plugin.Export>=1.8"]
+    with pytest.raises(PoemError):
+        plugins_remove(["not-declared"])
+
+
+@patch("poem.plugins.subprocess.run")
+def test_sync_skips_versions_up_to_date(mock_run, home):
+    """Test that sync installs everywhere once, then only where the set changed."""
+    mock_run.return_value.returncode = 0
+    for version in ("1.7.1", "1.8.3"):
+        _pyvenv(home, version, "/usr/bin")
+    plugins_add(["poetry-plugin-export"])
+
+    result = plugins_sync(jobs=2)
+
+    assert result["synced"] == ["1.7.1", "1.8.3"]
+    commands = [call.args[0] for call in mock_run.call_args_list]
+    # One wheelhouse build, then one offline install per version
+    assert sum("wheel" in command for command in commands) == 1
+    installs = [command for command in commands if "install" in command]
+    assert len(installs) == 2
+    assert all("--no-index" in command for command in installs)
+    assert {command[command.index("install") + 4] for command in installs} == \
+        {"poetry==1.7.1", "poetry==1.8.3"}
+    assert _manifest(home, "1.8.3")["plugins"]["requirements"] == ["poetry-plugin-export"]
+
+    mock_run.reset_mock()
+    result = plugins_sync()
+    assert result["up_to_date"] == ["1.7.1", "1.8.3"]
+    mock_run.assert_not_called()
+
+    plugins_remove(["poetry-plugin-export"])
+    result = plugins_sync(["1.8.3"])
+    assert result["synced"] == ["1.8.3"]
+    assert mock_run.call_args.args[0][-2:] == ["--quiet", "poetry-plugin-export"]
+    assert "uninstall" in mock_run.call_args.args[0]
+
+
+@patch("poem.plugins.subprocess.run")
+def test_sync_prefetches_once_per_interpreter(mock_run, home):
+    """Test that versions on different base interpreters each get wheels built."""
+    mock_run.return_value.returncode = 0
+    _pyvenv(home, "1.7.1", "/opt/python3.8/bin")
+    _pyvenv(home, "1.8.3", "/opt/python3.12/bin")
+    plugins_add(["poetry-plugin-export"])
+
+    plugins_sync()
+
+    wheels = [call.args[0][0] for call in mock_run.call_args_list
+              if "wheel" in call.args[0]]
+    assert sorted(wheels) == [_get_venv_python("1.7.1"), _get_venv_python("1.8.3")]
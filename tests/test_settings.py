@@ -0,0 +1,56 @@
+"""Tests for process-wide settings."""
+
+import os
+
+from poem.core import get_config_dir, get_global_version_file, get_poetry_home
+from poem.directories import _create_shim_directory
+from poem.settings import Settings, get_settings, reset_settings
+
+
+def test_defaults_follow_home_and_xdg(tmp_path, monkeypatch):
+    """Test the default layout and the XDG overrides."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    settings = Settings({})
+    assert settings.poetry_home == str(tmp_path / ".poetry")
+    assert settings.shim_dir == str(tmp_path / ".poem" / "shims")
+    assert settings.config_dir == str(tmp_path / ".config" / "poem")
+    assert settings.cache_dir == str(tmp_path / ".cache" / "poem")
+
+    settings = Settings({"XDG_CONFIG_HOME": str(tmp_path / "xdg-config"),
+                         "XDG_CACHE_HOME": str(tmp_path / "xdg-cache")})
+    assert settings.config_dir == str(tmp_path / "xdg-config" / "poem")
+    assert settings.cache_dir == str(tmp_path / "xdg-cache" / "poem")
+    assert settings.poetry_home == str(tmp_path / ".poetry")
+
+
+def test_poem_home_relocates_installs_and_shims(tmp_path, monkeypatch):
+    """Test that POEM_HOME and POEM_CONFIG_DIR redirect every module's paths."""
+    monkeypatch.setenv("POEM_HOME", str(tmp_path / "nvme" / "poem"))
+    monkeypatch.setenv("POEM_CONFIG_DIR", str(tmp_path / "config"))
+    reset_settings()
+
+    assert get_poetry_home() == str(tmp_path / "nvme" / "poem")
+    assert _create_shim_directory() == str(tmp_path / "nvme" / "poem" / "shims")
+    assert get_global_version_file() == str(tmp_path / "config" / "global-version")
+    assert os.path.isdir(tmp_path / "config")
+
+    # Loaded once: later environment changes are not seen until a reset
+    monkeypatch.setenv("POEM_HOME", str(tmp_path / "elsewhere"))
+    assert get_settings() is get_settings()
+    assert get_poetry_home() == str(tmp_path / "nvme" / "poem")
+    reset_settings()
+    assert get_poetry_home() == str(tmp_path / "elsewhere")
+
+
+def test_config_dir_is_created_once(tmp_path, monkeypatch):
+    """Test that the config directory is not recreated on every call."""
+    monkeypatch.setenv("POEM_CONFIG_DIR", str(tmp_path / "config"))
+    calls = []
+    real_makedirs = os.makedirs
+    monkeypatch.setattr(os, "makedirs",
+                        lambda *args, **kwargs: calls.append(args) or real_makedirs(*args, **kwargs))
+
+    for _ in range(3):
+        get_config_dir()
+
+    assert len(calls) == 1
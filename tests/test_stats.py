@@ -0,0 +1,97 @@
+"""Tests for shim usage statistics."""
+
+import json
+import threading
+
+import pytest
+
+from poem import stats
+from poem.cli import main
+from poem.stats import (
+    aggregate,
+    collect_stats,
+    read_records,
+    record_invocation,
+    render_prometheus,
+)
+
+
+@pytest.fixture
+def stats_dir(tmp_path, monkeypatch):
+    """Point the statistics log at a temporary home."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("POEM_STATS", raising=False)
+    return tmp_path / ".poem" / "stats"
+
+
+def test_concurrent_appends_keep_whole_lines(stats_dir):
+    """Test that records from many writers never interleave."""
+    def write():
+        for i in range(50):
+            record_invocation("1.8.3", "local", 0.002, i % 5 == 0, 1.5)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    lines = (stats_dir / stats.STATS_FILE).read_text().splitlines()
+    assert len(lines) == 400
+    assert all(json.loads(line)["version"] == "1.8.3" for line in lines)
+
+
+def test_log_is_rotated_by_size(stats_dir, monkeypatch):
+    """Test that a full log moves aside and both generations are read."""
+    monkeypatch.setattr(stats, "MAX_STATS_BYTES", 1000)
+    for _ in range(30):
+        record_invocation("1.8.3", "global", 0.001, 0, 0.1)
+
+    assert (stats_dir / f"{stats.STATS_FILE}.1").exists()
+    assert (stats_dir / stats.STATS_FILE).stat().st_size < 1000
+    assert len(read_records()) < 30
+    # Counters keep the runs whose log generation was dropped
+    summary = collect_stats()
+    assert summary["invocations"] == 30
+    assert summary["versions"]["1.8.3"]["sources"] == {"global": 30}
+
+    monkeypatch.setenv("POEM_STATS", "0")
+    before = len(read_records())
+    record_invocation("1.8.3", "global", 0.001, 0, 0.1)
+    assert len(read_records()) == before
+
+
+def test_stats_summary_and_textfile(stats_dir, tmp_path, capsys):
+    """Test percentiles per version and the Prometheus output."""
+    for ms in range(1, 101):
+        record_invocation("1.8.3", "local", ms / 1000, 0, 1.0)
+    record_invocation("2.0.0", "global", 0.005, 1, None)
+    with open(stats_dir / stats.STATS_FILE, "a") as f:
+        f.write('{"version": "1.8.3", "tru')
+
+    textfile = tmp_path / "poem.prom"
+    assert main(["stats", "--textfile", str(textfile)]) == 0
+    summary = collect_stats()
+
+    assert summary["invocations"] == 101
+    assert summary["versions"]["1.8.3"]["resolve_ms"] == {"0.5": 50.0, "0.9": 90.0, "0.99": 99.0}
+    assert summary["versions"]["2.0.0"]["failures"] == 1
+    prom = textfile.read_text()
+    assert 'poem_shim_invocations_total{version="1.8.3",source="local"} 100' in prom
+    assert 'poem_shim_resolve_seconds{version="1.8.3",quantile="0.9"} 0.090000' in prom
+    assert 'poem_shim_failures_total{version="2.0.0"} 1' in prom
+    assert "101 shim runs, 1 failed" in capsys.readouterr().out
+    assert render_prometheus(aggregate([])).count("\n") == 6
+
+
+def test_unresolved_shim_runs_are_recorded(stats_dir, monkeypatch, capsys):
+    """Test that a shim run without an active version is still counted."""
+    from poem import shim
+
+    monkeypatch.setattr(shim, "_get_active_version", lambda: ("unknown", "unknown"))
+    with pytest.raises(SystemExit) as exit_info:
+        shim.main()
+
+    assert exit_info.value.code == 1
+    summary = collect_stats()
+    assert summary["versions"][stats.UNRESOLVED_VERSION]["failures"] == 1
@@ -0,0 +1,75 @@
+"""Tests for the shared install store."""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from poem.cli import main
+from poem.core import get_installed_locations, get_poetry_bin, is_installed
+from poem.store import store_install
+
+
+@pytest.fixture
+def homes(tmp_path, monkeypatch):
+    """Configure a user home and a shared store, each with some versions."""
+    user_home = tmp_path / "home"
+    store = tmp_path / "store"
+    for home, versions in ((user_home / ".poetry", ["1.7.1", "1.8.3"]),
+                           (store, ["1.8.3", "2.0.0"])):
+        for version in versions:
+            (home / "venv" / version / "bin").mkdir(parents=True)
+            (home / "venv" / version / "bin" / "poetry").touch()
+    monkeypatch.setenv("HOME", str(user_home))
+    monkeypatch.setenv("POEM_STORE", str(store))
+    return user_home / ".poetry", store
+
+
+def test_store_is_searched_before_user_home(homes):
+    """Test that versions resolve across both homes with the store first."""
+    user_home, store = homes
+
+    assert get_poetry_bin("1.8.3") == str(store / "venv" / "1.8.3" / "bin" / "poetry")
+    assert get_poetry_bin("1.7.1") == str(user_home / "venv" / "1.7.1" / "bin" / "poetry")
+    assert get_poetry_bin("9.9.9") == str(user_home / "venv" / "9.9.9" / "bin" / "poetry")
+    assert sorted(get_installed_locations()) == ["1.7.1", "1.8.3", "2.0.0"]
+
+
+def test_list_marks_store_versions(homes, capsys):
+    """Test that list shows which versions come from the shared store."""
+    assert main(["list"]) == 0
+
+    out = capsys.readouterr().out
+    assert "- 1.7.1\n" in out
+    assert "- 2.0.0 (shared store)\n" in out
+
+
+def test_uninstall_leaves_store_alone(homes, tmp_path, monkeypatch, capsys):
+    """Test that users cannot uninstall versions from the shared store."""
+    _, store = homes
+    monkeypatch.chdir(tmp_path)
+
+    assert main(["uninstall", "2.0.0"]) == 1
+
+    assert os.path.isdir(store / "venv" / "2.0.0")
+    assert "poem store uninstall 2.0.0" in capsys.readouterr().err
+
+
+def test_store_copy_being_installed_is_skipped(homes):
+    """Test that a half-installed store copy does not hide the user's complete one."""
+    user_home, store = homes
+    (store / "venv" / "1.8.3" / ".poem-installing").touch()
+
+    assert get_poetry_bin("1.8.3") == str(user_home / "venv" / "1.8.3" / "bin" / "poetry")
+    assert is_installed("1.8.3")
+
+
+@patch("poem.store.install_versions")
+def test_store_install_skips_present_versions(mock_install, homes, capsys):
+    """Test that only versions missing from the store are installed there."""
+    _, store = homes
+
+    result = store_install(["2.0.0", "2.1.0"], jobs=2)
+
+    mock_install.assert_called_once_with(["2.1.0"], jobs=2, home=str(store))
+    assert result["skipped"] == ["2.0.0"]
@@ -0,0 +1,25 @@
+"""A short run of the concurrency stress harness."""
+
+import importlib.util
+import os
+import platform
+
+import pytest
+
+HARNESS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       "benchmarks", "stress_poem.py")
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="uses the Unix shim and sh scripts")
+def test_shims_never_run_partial_versions_under_churn():
+    """Test that shims racing installs, uninstalls and global switches stay correct."""
+    spec = importlib.util.spec_from_file_location("stress_poem", HARNESS)
+    stress = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(stress)
+
+    report = stress.run_stress(shims=2, duration=3, churn=1)
+
+    assert report["violations"] == []
+    assert report["outcomes"].get("ok", 0) > 0
+    assert report["mutations"]["install"] > 0
+    assert report["mutations"]["global"] > 0
@@ -0,0 +1,72 @@
+"""Tests for poem sync."""
+
+from unittest.mock import patch
+
+from poem.cli import main
+from poem.fetch import DEFAULT_CONCURRENCY
+from poem.sync import find_pinned_versions, sync_versions
+
+
+def _pin(directory, version):
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / ".poetry-version").write_text(version)
+
+
+def test_find_pinned_versions_skips_ignored_dirs(tmp_path):
+    """Test that pins are grouped by version and ignored dirs are skipped."""
+    _pin(tmp_path / "a", "1.8.3")
+    _pin(tmp_path / "b" / "nested", "1.8.3")
+    _pin(tmp_path / "c", "1.7.1\n")
+    _pin(tmp_path / "node_modules" / "pkg", "0.12.0")
+    _pin(tmp_path / ".venv" / "lib", "0.12.0")
+    _pin(tmp_path / ".git" / "hooks", "0.12.0")
+
+    pins = find_pinned_versions(str(tmp_path))
+
+    assert sorted(pins) == ["1.7.1", "1.8.3"]
+    assert sorted(pins["1.8.3"]) == [
+        str(tmp_path / "a"), str(tmp_path / "b" / "nested")]
+
+
+@patch("poem.sync.install_versions")
+@patch("poem.sync._get_installed_versions", return_value=["1.8.3"])
+def test_sync_installs_only_missing(mock_installed, mock_install, tmp_path, capsys):
+    """Test that only versions missing locally are installed."""
+    _pin(tmp_path / "a", "1.8.3")
+    _pin(tmp_path / "b", "1.7.1")
+    _pin(tmp_path / "c", "1.10.0")
+
+    sync_versions(str(tmp_path), jobs=3)
+
+    mock_install.assert_called_once_with(["1.7.1", "1.10.0"], jobs=3)
+
+
+@patch("poem.sync.install_versions")
+@patch("poem.sync._get_installed_versions", return_value=[])
+def test_sync_dry_run_prints_plan(mock_installed, mock_install, tmp_path, capsys):
+    """Test that a dry run prints the plan without installing."""
+    _pin(tmp_path / "a", "1.8.3")
+
+    assert main(["sync", str(tmp_path), "--dry-run"]) == 0
+
+    mock_install.assert_not_called()
+    captured = capsys.readouterr()
+    assert "1.8.3        missing    (1 project)" in captured.out
+    assert "Would install: 1.8.3" in captured.out
+
+
+@patch("poem.sync.install_versions", return_value=["1.8.3"])
+@patch("poem.sync._get_installed_versions", return_value=[])
+def test_sync_rejects_invalid_pins(mock_installed, mock_install, tmp_path, capsys):
+    """Test that pins which are not versions are reported and never installed."""
+    _pin(tmp_path / "a", "1.8.3")
+    _pin(tmp_path / "b", "1.8.3; rm -rf ~")
+
+    plan = sync_versions(str(tmp_path))
+
+    mock_install.assert_called_once_with(["1.8.3"], jobs=DEFAULT_CONCURRENCY)
+    assert list(plan["pinned"]) == ["1.8.3"]
+    assert plan["invalid"] == {"1.8.3; rm -rf ~": [str(tmp_path / "b")]}
+
+    assert main(["sync", str(tmp_path), "--dry-run"]) == 0
+    assert "Ignoring invalid version '1.8.3; rm -rf ~'" in capsys.readouterr().err
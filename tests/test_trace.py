@@ -0,0 +1,64 @@
+"""Tests for poem tracing."""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from poem import trace
+
+SRC_DIR = os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+@pytest.fixture
+def tracing(monkeypatch):
+    """Enable tracing with a clean event list for one test."""
+    monkeypatch.setattr(trace, "_events", [])
+    monkeypatch.setattr(trace, "_enabled", True)
+    monkeypatch.setattr(trace, "_output", None)
+    return trace
+
+
+def test_span_is_noop_when_disabled(monkeypatch):
+    """Test that nothing is recorded unless tracing is enabled."""
+    monkeypatch.setattr(trace, "_events", [])
+    monkeypatch.setattr(trace, "_enabled", False)
+
+    with trace.span("work", "fs"):
+        pass
+
+    assert trace._events == []
+
+
+def test_summary_aggregates_spans(tracing):
+    """Test that spans with the same name are counted together."""
+    @trace.traced("resolve")
+    def resolve():
+        with trace.span("read version file", "fs"):
+            pass
+
+    resolve()
+    resolve()
+
+    rows = {row["name"]: row for row in trace.summary()}
+    assert rows["resolve"]["count"] == 2
+    assert rows["resolve"]["category"] == "resolve"
+    assert rows["read version file"]["count"] == 2
+
+
+def test_cli_writes_chrome_trace(tmp_path):
+    """Test that --trace-file writes Chrome trace JSON for a command."""
+    trace_file = tmp_path / "trace.json"
+    env = dict(os.environ, HOME=str(tmp_path), PYTHONPATH=SRC_DIR)
+    env.pop("POEM_TRACE", None)
+
+    subprocess.run(
+        [sys.executable, "-m", "poem.cli", "--trace-file", str(trace_file), "list"],
+        env=env, cwd=tmp_path, capture_output=True, check=True)
+
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    assert {"name": "list", "cat": "cli"}.items() <= events[-1].items()
+    assert all(event["ph"] == "X" for event in events)
@@ -0,0 +1,136 @@
+"""Tests for poem upgrade."""
+
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from poem.core import INSTALLING_MARKER, _get_installed_versions
+from poem.errors import PoemError
+from poem.upgrade import upgrade_version
+
+
+def _fake_venv(version_dir, version):
+    """Lay out a version directory with poetry and one dependency."""
+    venv = version_dir / "venv"
+    site = venv / "lib" / "python3.11" / "site-packages"
+    (site / f"poetry-{version}.dist-info").mkdir(parents=True)
+    (site / "packaging-24.0.dist-info").mkdir()
+    (site / "packaging.py").write_text("VERSION = '24.0'\n")
+    (venv / "bin").mkdir()
+    (venv / "bin" / "poetry").write_text(f"#!{venv}/bin/python\n")
+    (version_dir / "bin").mkdir()
+    (version_dir / "bin" / "poetry").symlink_to(venv / "bin" / "poetry")
+    (version_dir / "poem-manifest.json").write_text(json.dumps({"version": version}))
+    return site
+
+
+@pytest.fixture
+def home(make_home, tmp_path, monkeypatch):
+    """Configure a poetry home with poetry 1.8.2 installed and pinned globally."""
+    poetry_home = make_home(pin="1.8.2")
+    monkeypatch.chdir(tmp_path)
+    _fake_venv(poetry_home / "venv" / "1.8.2", "1.8.2")
+    return poetry_home
+
+
+def _fake_pip(command, **kwargs):
+    """Upgrade poetry in the venv the way pip would."""
+    venv = os.path.dirname(os.path.dirname(command[0]))
+    site = os.path.join(venv, "lib", "python3.11", "site-packages")
+    os.rmdir(os.path.join(site, "poetry-1.8.2.dist-info"))
+    os.mkdir(os.path.join(site, "poetry-1.8.3.dist-info"))
+    script = os.path.join(venv, "bin", "poetry")
+    os.unlink(script)
+    with open(script, "w") as f:
+        f.write(f"#!{venv}/bin/python\n")
+
+
+@patch("poem.upgrade.subprocess.run", side_effect=_fake_pip)
+def test_upgrade_clones_and_swaps(mock_run, home, tmp_path):
+    """Test that only changed distributions move and pins follow the upgrade."""
+    old_module = home / "venv" / "1.8.2" / "venv" / "lib" / "python3.11" \
+        / "site-packages" / "packaging.py"
+    old_inode = os.stat(old_module).st_ino
+
+    result = upgrade_version("1.8.2", "1.8.3", compile_bytecode=False)
+
+    new_dir = home / "venv" / "1.8.3"
+    assert mock_run.call_args.args[0][-1] == "poetry==1.8.3"
+    assert result["changed"] == {"poetry": ["1.8.2", "1.8.3"]}
+    assert result["removed"] is True
+    assert _get_installed_versions() == ["1.8.3"]
+    assert not (new_dir / INSTALLING_MARKER).exists()
+
+    # Unchanged files are shared with the old install rather than copied
+    new_module = new_dir / "venv" / "lib" / "python3.11" / "site-packages" / "packaging.py"
+    assert os.stat(new_module).st_ino == old_inode
+    assert (new_dir / "venv" / "bin" / "poetry").read_text() == \
+        f"#!{new_dir}/venv/bin/python\n"
+    assert os.readlink(new_dir / "bin" / "poetry") == str(new_dir / "venv" / "bin" / "poetry")
+
+    manifest = json.loads((new_dir / "poem-manifest.json").read_text())
+    assert manifest["version"] == "1.8.3"
+    assert manifest["upgraded_from"] == "1.8.2"
+    assert (tmp_path / ".config" / "poem" / "global-version").read_text() == "1.8.3"
+    assert [d for d in os.listdir(home / "venv") if not d.endswith(".lock")] == ["1.8.3"]
+
+
+@patch("poem.upgrade.subprocess.run", side_effect=_fake_pip)
+def test_upgrade_keep_leaves_old_version_untouched(mock_run, home):
+    """Test that --keep and --no-pin leave the old install and its pins alone."""
+    old_script = home / "venv" / "1.8.2" / "venv" / "bin" / "poetry"
+    before = old_script.read_text()
+
+    result = upgrade_version("1.8.2", "1.8.3", keep=True, update_pins=False,
+                             compile_bytecode=False)
+
+    assert result["pins"] == []
+    assert sorted(_get_installed_versions()) == ["1.8.2", "1.8.3"]
+    assert old_script.read_text() == before
+    assert (home / "venv" / "1.8.2" / "venv" / "lib" / "python3.11" / "site-packages"
+            / "poetry-1.8.2.dist-info").is_dir()
+
+
+def test_upgrade_no_pin_requires_keep(home):
+    """Test that the old version is not removed while pins still name it."""
+    with pytest.raises(PoemError, match="--keep"):
+        upgrade_version("1.8.2", "1.8.3", update_pins=False, compile_bytecode=False)
+
+    assert [d for d in os.listdir(home / "venv") if not d.endswith(".lock")] == ["1.8.2"]
+
+
+def test_upgrade_failure_leaves_no_partial_install(home):
+    """Test that a failed pip run removes the staging directory."""
+    with patch("poem.upgrade.subprocess.run", side_effect=OSError("no pip")):
+        with pytest.raises(PoemError, match="no pip"):
+            upgrade_version("1.8.2", "1.8.3", compile_bytecode=False)
+
+    assert [d for d in os.listdir(home / "venv") if not d.endswith(".lock")] == ["1.8.2"]
+
+
+def test_upgrade_checks_the_venv_python_first(home):
+    """Test that a release the venv's Python cannot run is refused before staging."""
+    (home / "venv" / "1.8.2" / "venv" / "pyvenv.cfg").write_text(
+        "home = /usr/bin\nversion = 3.7.17\n")
+    releases = [{"version": "1.8.3", "requires_python": ">=3.8,<4.0",
+                 "prerelease": False, "uploaded": None}]
+
+    with patch("poem.upgrade.load_release_index", return_value=releases), \
+            patch("poem.upgrade.subprocess.run") as mock_run:
+        with pytest.raises(PoemError, match="runs on Python 3.7.17"):
+            upgrade_version("1.8.2", "1.8.3", compile_bytecode=False)
+
+    mock_run.assert_not_called()
+    assert [d for d in os.listdir(home / "venv") if not d.endswith(".lock")] == ["1.8.2"]
+
+
+@patch("poem.upgrade.subprocess.run", side_effect=_fake_pip)
+def test_upgrade_finalize_failure_removes_the_new_version(mock_run, home):
+    """Test that a failure after the swap leaves only the old version."""
+    with patch("poem.upgrade._finalize_install", side_effect=OSError("disk full")):
+        with pytest.raises(PoemError, match="disk full"):
+            upgrade_version("1.8.2", "1.8.3", compile_bytecode=False)
+
+    assert [d for d in os.listdir(home / "venv") if not d.endswith(".lock")] == ["1.8.2"]
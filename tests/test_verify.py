@@ -0,0 +1,73 @@
+"""Tests for poem verify."""
+
+import base64
+import hashlib
+from unittest.mock import patch
+
+import pytest
+
+from poem.cli import main
+from poem.verify import has_problems, verify_versions
+
+FILES = {
+    "demo/__init__.py": b"VALUE = 1\n",
+    "demo/core.py": b"def run():\n    return 'ok'\n",
+}
+
+
+def _record_hash(data):
+    digest = hashlib.sha256(data).digest()
+    return "sha256=" + base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+@pytest.fixture
+def site_packages(tmp_path, monkeypatch):
+    """Install a fake distribution into a fake poetry 1.8.3 venv."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.delenv("POEM_STORE", raising=False)
+    venv = tmp_path / ".poetry" / "venv" / "1.8.3" / "venv"
+    site = venv / "lib" / "python3.11" / "site-packages"
+    dist_info = site / "demo-1.0.dist-info"
+    dist_info.mkdir(parents=True)
+    (venv / "bin").mkdir()
+    (venv / "bin" / "demo").write_text("#!/elsewhere/python\n")
+
+    rows = []
+    for name, data in FILES.items():
+        (site / name).parent.mkdir(parents=True, exist_ok=True)
+        (site / name).write_bytes(data)
+        rows.append(f"{name},{_record_hash(data)},{len(data)}")
+    rows.append(f"../../../bin/demo,{_record_hash(b'#!/original/python')},18")
+    rows.append("demo/__pycache__/core.cpython-311.pyc,,")
+    rows.append("demo-1.0.dist-info/RECORD,,")
+    (dist_info / "RECORD").write_text("\n".join(rows) + "\n")
+    return site
+
+
+def test_verify_clean_install(site_packages, capsys):
+    """Test that an intact install passes, including relocated scripts."""
+    results = verify_versions([], jobs=2)
+
+    assert not has_problems(results)
+    assert results[0]["checked"] == 5
+    assert main(["verify", "--jobs", "2"]) == 0
+    assert "poetry 1.8.3: OK (5 files)" in capsys.readouterr().out
+
+
+@patch("poem.verify.subprocess.run")
+def test_verify_reports_and_repairs(mock_run, site_packages):
+    """Test that damaged files are reported and their distribution reinstalled."""
+    (site_packages / "demo" / "core.py").write_text("tampered\n")
+    (site_packages / "demo" / "__init__.py").unlink()
+
+    results = verify_versions(["1.8.3"], repair=True, jobs=2)
+
+    assert has_problems(results)
+    assert [p["path"] for p in results[0]["corrupt"]] == [
+        str(site_packages / "demo" / "core.py")]
+    assert [p["path"] for p in results[0]["missing"]] == [
+        str(site_packages / "demo" / "__init__.py")]
+    command = mock_run.call_args.args[0]
+    assert command[1:] == ["-m", "pip", "install", "--quiet", "--force-reinstall",
+                           "--no-deps", "demo==1.0"]
+    assert results[0]["repair"] == {"distributions": ["demo==1.0"], "error": None}